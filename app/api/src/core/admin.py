@@ -0,0 +1,32 @@
+# Proteção das rotas administrativas por token
+import hmac
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException, status
+
+load_dotenv()
+# Token exigido no cabeçalho 'X-Admin-Token'; sem ele as rotas de admin ficam desligadas
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+def token_valido(token: Optional[str]) -> bool:
+    """Compara o token recebido com ADMIN_TOKEN em tempo constante."""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def exigir_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Dependência das rotas de admin.
+
+    Raises:
+        HTTPException: 404 se ADMIN_TOKEN não estiver configurado (rotas
+            desligadas) e 403 se o token enviado for inválido.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not token_valido(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administrador inválido.")
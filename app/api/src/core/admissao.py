@@ -0,0 +1,270 @@
+# Controle de admissão: limita as requisições simultâneas que chegam ao Supabase
+"""
+Quando o Supabase fica lento, cada rota síncrona prende uma thread do
+threadpool por até 15 s e, com o threadpool esgotado, a API inteira para
+(inclusive '/'). O controle de admissão decide na entrada, antes de ocupar
+uma thread, se a requisição pode rodar agora, esperar um pouco numa fila
+curta ou ser recusada na hora com 503 e 'Retry-After'.
+
+As requisições são divididas em classes de operação:
+
+- 'escrita': POST/PATCH/PUT/DELETE (vendas, cobranças, estoque...);
+- 'leitura': GETs comuns;
+- 'relatorio': rotas pesadas (relatórios, exportação, dashboard, importação).
+
+Cada classe tem seu limite de concorrência e sua fila, e todas dividem um
+limite global. Quando uma vaga abre, as filas são atendidas por prioridade
+(escrita > leitura > relatorio); como os relatórios têm um limite próprio
+pequeno, sempre sobra espaço para as escritas.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core import prazo
+
+load_dotenv()
+# Requisições simultâneas no total (deixe abaixo do threadpool do AnyIO, 40 por padrão)
+ADMISSAO_CONCORRENCIA = int(os.environ.get("ADMISSAO_CONCORRENCIA", "32"))
+# Limite por classe no formato "classe=limite,..."
+ADMISSAO_LIMITES = os.environ.get("ADMISSAO_LIMITES", "escrita=32,leitura=24,relatorio=4")
+# Tamanho máximo da fila de espera de cada classe
+ADMISSAO_FILA = int(os.environ.get("ADMISSAO_FILA", "16"))
+# Tempo máximo (s) que uma requisição espera na fila antes do 503
+ADMISSAO_ESPERA = float(os.environ.get("ADMISSAO_ESPERA", "2"))
+# Rotas da classe 'relatorio' (prefixos do caminho, sem o '/api/v1')
+ADMISSAO_ROTAS_RELATORIO = os.environ.get(
+    "ADMISSAO_ROTAS_RELATORIO", "/relatorios,/exportar,/dashboard,/importar,/cobranca/aging,/extratos"
+)
+# Rotas com POST que só leem dados (também podem ler das réplicas, core/replicas.py)
+ADMISSAO_ROTAS_LEITURA = os.environ.get(
+    "ADMISSAO_ROTAS_LEITURA", "/historico,/estoque/estoque_atual,/estoque/preco_unitario"
+)
+# Rotas fora do controle: streams longos sem Supabase, o batch (cujas
+# operações passam de novo pelo controle uma a uma), as métricas e o admin
+ADMISSAO_ROTAS_LIVRES = os.environ.get("ADMISSAO_ROTAS_LIVRES", "/eventos,/batch,/metricas,/admin")
+PREFIXO_API = "/api/v1"
+
+# Ordem de prioridade no atendimento das filas
+CLASSES = ("escrita", "leitura", "relatorio")
+_METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def _prefixos(texto: str) -> Tuple[str, ...]:
+    return tuple(p.strip().rstrip("/") for p in texto.split(",") if p.strip())
+
+
+def limites_de_texto(texto: str) -> Dict[str, int]:
+    """
+    Converte "escrita=32,leitura=24" em {"escrita": 32, "leitura": 24}.
+
+    Raises:
+        ValueError: Se a classe for desconhecida ou o limite não for um inteiro positivo.
+    """
+    limites = {}
+    for parte in texto.split(","):
+        if not parte.strip():
+            continue
+        classe, _, valor = parte.partition("=")
+        classe = classe.strip()
+        if classe not in CLASSES or not valor.strip().isdigit() or int(valor) <= 0:
+            raise ValueError(f"Limite de admissão inválido: '{parte.strip()}'")
+        limites[classe] = int(valor)
+    return limites
+
+
+def _casa(caminho: str, prefixos: Tuple[str, ...]) -> bool:
+    return any(caminho == p or caminho.startswith(p + "/") for p in prefixos)
+
+
+ROTAS_LEITURA = _prefixos(ADMISSAO_ROTAS_LEITURA)
+
+
+def somente_leitura(metodo: str, caminho: str, rotas_leitura: Tuple[str, ...] = ROTAS_LEITURA) -> bool:
+    """True se a requisição só lê: GET/HEAD/OPTIONS ou POST de uma rota de leitura (caminho sem o '/api/v1')."""
+    return metodo in _METODOS_LEITURA or _casa(caminho, rotas_leitura)
+
+
+class _Espera:
+    """Uma requisição na fila: o future é resolvido no loop dela quando ganha a vaga."""
+    __slots__ = ("future", "loop", "concedida")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future: asyncio.Future = loop.create_future()
+        self.concedida = False
+
+
+class ControleAdmissao:
+    """
+    Vagas de execução por classe de operação, com filas curtas e prioridade.
+
+    O estado é protegido por um lock comum (não pelo event loop), então a
+    mesma instância atende mais de um loop, como nos testes com TestClient.
+    """
+
+    def __init__(self, concorrencia: int = ADMISSAO_CONCORRENCIA,
+                 limites: Optional[Dict[str, int]] = None,
+                 fila: int = ADMISSAO_FILA, espera: float = ADMISSAO_ESPERA):
+        self.concorrencia = concorrencia
+        limites = limites if limites is not None else limites_de_texto(ADMISSAO_LIMITES)
+        self.limites = {classe: limites.get(classe, concorrencia) for classe in CLASSES}
+        self.fila = fila
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._ativas = {classe: 0 for classe in CLASSES}
+        self._filas: Dict[str, Deque[_Espera]] = {classe: deque() for classe in CLASSES}
+        # Duração média (s) de uma requisição de cada classe, para o Retry-After
+        self._duracao = {classe: 0.5 for classe in CLASSES}
+        self.recusadas = {classe: 0 for classe in CLASSES}
+
+    def _cabe(self, classe: str) -> bool:
+        return (
+            sum(self._ativas.values()) < self.concorrencia
+            and self._ativas[classe] < self.limites[classe]
+        )
+
+    def _liberar_filas(self) -> None:
+        """Entrega as vagas livres às filas, por ordem de prioridade (com o lock)."""
+        for classe in CLASSES:
+            fila = self._filas[classe]
+            while fila and self._cabe(classe):
+                espera = fila.popleft()
+                espera.concedida = True
+                self._ativas[classe] += 1
+                espera.loop.call_soon_threadsafe(_entregar, espera.future)
+
+    def retry_after(self, classe: str) -> int:
+        """Segundos sugeridos até tentar de novo: o tempo para esvaziar a fila da classe."""
+        vagas = max(1, min(self.limites[classe], self.concorrencia))
+        return max(1, math.ceil(self._duracao[classe] * (len(self._filas[classe]) + 1) / vagas))
+
+    async def entrar(self, classe: str) -> bool:
+        """Ocupa uma vaga da classe, esperando até 'espera' segundos. False = recusada."""
+        with self._lock:
+            if self._cabe(classe) and not self._filas[classe]:
+                self._ativas[classe] += 1
+                return True
+            if len(self._filas[classe]) >= self.fila:
+                self.recusadas[classe] += 1
+                return False
+            espera = _Espera(asyncio.get_running_loop())
+            self._filas[classe].append(espera)
+
+        # Não espera na fila além do prazo da requisição
+        resta = prazo.restante()
+        limite = self.espera if resta is None else max(0.0, min(self.espera, resta))
+        try:
+            await asyncio.wait_for(asyncio.shield(espera.future), timeout=limite)
+            return True
+        except asyncio.TimeoutError:
+            with self._lock:
+                # A vaga pode ter sido concedida junto com o timeout
+                if espera.concedida:
+                    return True
+                self._filas[classe].remove(espera)
+                self.recusadas[classe] += 1
+                return False
+        except asyncio.CancelledError:
+            # Cliente desconectou enquanto esperava: devolve a vaga ou sai da fila
+            with self._lock:
+                if espera.concedida:
+                    self._ativas[classe] -= 1
+                    self._liberar_filas()
+                else:
+                    self._filas[classe].remove(espera)
+            raise
+
+    def sair(self, classe: str, duracao: float) -> None:
+        with self._lock:
+            self._ativas[classe] -= 1
+            self._duracao[classe] = 0.8 * self._duracao[classe] + 0.2 * duracao
+            self._liberar_filas()
+
+    def estado(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                classe: {
+                    "ativas": self._ativas[classe],
+                    "na_fila": len(self._filas[classe]),
+                    "limite": self.limites[classe],
+                    "recusadas": self.recusadas[classe],
+                }
+                for classe in CLASSES
+            }
+
+
+def _entregar(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class MiddlewareAdmissao:
+    """Middleware ASGI que passa cada requisição da API pelo controle de admissão."""
+
+    def __init__(self, app, controle: Optional["ControleAdmissao"] = None):
+        self.app = app
+        self.controle = controle or controle_admissao
+        self.rotas_relatorio = _prefixos(ADMISSAO_ROTAS_RELATORIO)
+        self.rotas_leitura = ROTAS_LEITURA
+        self.rotas_livres = _prefixos(ADMISSAO_ROTAS_LIVRES)
+
+    def classificar(self, metodo: str, caminho: str) -> Optional[str]:
+        """Classe da requisição, ou None se ela não passa pelo controle."""
+        if not caminho.startswith(PREFIXO_API + "/"):
+            return None
+        caminho = caminho[len(PREFIXO_API):]
+        if _casa(caminho, self.rotas_livres):
+            return None
+        if _casa(caminho, self.rotas_relatorio):
+            return "relatorio"
+        if somente_leitura(metodo, caminho, self.rotas_leitura):
+            return "leitura"
+        return "escrita"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        classe = self.classificar(scope["method"], scope["path"])
+        if classe is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controle.entrar(classe):
+            if prazo.esgotado():
+                await prazo.responder_prazo_esgotado(send)
+            else:
+                await self._recusar(classe, send)
+            return
+        if prazo.esgotado():
+            self.controle.sair(classe, 0.0)
+            await prazo.responder_prazo_esgotado(send)
+            return
+        inicio = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controle.sair(classe, time.monotonic() - inicio)
+
+    async def _recusar(self, classe: str, send) -> None:
+        corpo = json.dumps({
+            "detail": f"Servidor sobrecarregado: a fila de requisições '{classe}' está cheia. Tente novamente."
+        }).encode("utf-8")
+        headers: List[Tuple[bytes, bytes]] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+            (b"retry-after", str(self.controle.retry_after(classe)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": corpo})
+
+
+controle_admissao = ControleAdmissao()
@@ -0,0 +1,183 @@
+# Relatório de aging de recebíveis calculado em lote com NumPy
+"""
+Classifica as cobranças não pagas por dias de atraso (ex.: 0-30, 31-60, 61-90,
+90+) e por cliente. As datas e os valores são convertidos de uma vez para
+arrays (datetime64/float64) e as faixas são calculadas em operações
+vetorizadas, sem o laço com 'datetime.fromisoformat' por linha.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Limites superiores (em dias de atraso) de cada faixa, exceto a última
+AGING_FAIXAS = os.environ.get("AGING_FAIXAS", "30,60,90")
+
+FAIXA_A_VENCER = "a_vencer"
+_SEGUNDOS_POR_DIA = 86400
+
+
+def limites_de_texto(texto: str) -> List[int]:
+    """
+    Converte "30,60,90" em [30, 60, 90].
+
+    Raises:
+        ValueError: Se os limites não forem inteiros positivos e crescentes.
+    """
+    limites = [int(parte) for parte in texto.split(",") if parte.strip()]
+    if not limites or limites[0] <= 0 or any(a >= b for a, b in zip(limites, limites[1:])):
+        raise ValueError("Os limites das faixas devem ser inteiros positivos em ordem crescente (ex.: 30,60,90).")
+    return limites
+
+
+def nomes_faixas(limites: Sequence[int]) -> List[str]:
+    """Rótulos das faixas: [30, 60, 90] -> ['0-30', '31-60', '61-90', '90+']."""
+    nomes, inicio = [], 0
+    for limite in limites:
+        nomes.append(f"{inicio}-{limite}")
+        inicio = limite + 1
+    nomes.append(f"{limites[-1]}+")
+    return nomes
+
+
+def _digitos(codigos: np.ndarray, inicio: int, fim: int) -> np.ndarray:
+    """Converte as colunas [inicio, fim) de códigos Unicode de dígitos em inteiros."""
+    valor = np.zeros(len(codigos), dtype=np.int64)
+    for coluna in range(inicio, fim):
+        valor = valor * 10 + (codigos[:, coluna].astype(np.int64) - ord("0"))
+    return valor
+
+
+def converter_datas(datas: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Converte datas ISO 8601 ('AAAA-MM-DDTHH:MM:SS...') para datetime64[s] em UTC.
+
+    As strings viram uma matriz de códigos Unicode e ano, mês, dia e hora são
+    calculados por coluna, de uma vez para todas as linhas. O PostgREST
+    devolve 'timestamptz' em UTC ('+00:00'); as poucas datas com outro fuso ou
+    em outro formato são convertidas individualmente. Datas vazias viram NaT.
+    """
+    textos = np.asarray([d or "" for d in datas], dtype=str)
+    n = len(textos)
+    if n == 0 or textos.itemsize // 4 < 19:
+        return np.array([_converter_uma(t) for t in textos], dtype="datetime64[s]")
+
+    codigos = textos.view(np.uint32).reshape(n, -1)
+    formato_ok = (
+        (codigos[:, 4] == ord("-")) & (codigos[:, 7] == ord("-"))
+        & ((codigos[:, 10] == ord("T")) | (codigos[:, 10] == ord(" ")))
+        & (codigos[:, 13] == ord(":")) & (codigos[:, 16] == ord(":"))
+    )
+    em_utc = (
+        (np.char.str_len(textos) == 19)
+        | np.char.endswith(textos, "+00:00")
+        | np.char.endswith(textos, "Z")
+    )
+
+    meses = (_digitos(codigos, 0, 4) - 1970) * 12 + _digitos(codigos, 5, 7) - 1
+    dias = _digitos(codigos, 8, 10) - 1
+    segundos = _digitos(codigos, 11, 13) * 3600 + _digitos(codigos, 14, 16) * 60 + _digitos(codigos, 17, 19)
+    resultado = np.where(formato_ok, meses, 0).astype("datetime64[M]").astype("datetime64[s]")
+    resultado += np.where(formato_ok, dias * 86400 + segundos, 0).astype("timedelta64[s]")
+
+    for i in np.flatnonzero(~(formato_ok & em_utc)):
+        resultado[i] = _converter_uma(textos[i])
+    return resultado
+
+
+def _converter_uma(texto: str) -> np.datetime64:
+    if not texto:
+        return np.datetime64("NaT", "s")
+    momento = datetime.fromisoformat(texto)
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(momento, "s")
+
+
+def calcular_aging(
+    clientes: Sequence[str],
+    vencimentos: Sequence[str],
+    valores: Sequence[float],
+    agora: datetime,
+    limites: Sequence[int],
+) -> Dict[str, Any]:
+    """
+    Monta o aging a partir de colunas paralelas (cliente, vencimento, valor).
+
+    Cobranças com vencimento no futuro ficam em 'a_vencer'; as demais entram na
+    faixa dos dias completos de atraso (vencida hoje = 0 dias). Cobranças sem
+    vencimento não têm atraso: ficam fora das faixas e dos totais e são
+    contadas à parte, em 'sem_vencimento'.
+    """
+    faixas = [FAIXA_A_VENCER] + nomes_faixas(limites)
+    n_faixas = len(faixas)
+
+    venc = converter_datas(vencimentos)
+    valor = np.asarray(valores, dtype=np.float64)
+    agora_np = np.datetime64(agora.astimezone(timezone.utc).replace(tzinfo=None), "s")
+
+    # NaT viraria um int64 negativo e cairia em 'a_vencer'
+    sem_vencimento = np.isnat(venc)
+    if sem_vencimento.any():
+        valor_sem_vencimento = float(valor[sem_vencimento].sum())
+        validas = np.flatnonzero(~sem_vencimento)
+        clientes = [clientes[i] for i in validas]
+        venc, valor = venc[validas], valor[validas]
+    else:
+        valor_sem_vencimento = 0.0
+
+    atraso_s = (agora_np - venc).astype(np.int64)
+    dias = atraso_s // _SEGUNDOS_POR_DIA
+    # Faixa 0 = a vencer; 1.. = searchsorted nos limites (30 cai em '0-30')
+    faixa = np.where(atraso_s < 0, 0, np.searchsorted(np.asarray(limites), dias, side="left") + 1)
+
+    # Códigos categóricos por dicionário: bem mais rápido que np.unique em strings
+    nomes_clientes = list(dict.fromkeys(clientes))
+    codigos = {cliente: i for i, cliente in enumerate(nomes_clientes)}
+    codigo = np.fromiter(map(codigos.__getitem__, clientes), dtype=np.int64, count=len(clientes))
+    celula = codigo * n_faixas + faixa
+    tamanho = len(nomes_clientes) * n_faixas
+    quantidade = np.bincount(celula, minlength=tamanho).reshape(-1, n_faixas)
+    soma = np.bincount(celula, weights=valor, minlength=tamanho).reshape(-1, n_faixas)
+
+    def resumo(qtd: np.ndarray, total: np.ndarray) -> Dict[str, Dict[str, float]]:
+        return {
+            nome: {"quantidade": int(q), "valor_total": round(float(v), 2)}
+            for nome, q, v in zip(faixas, qtd, total)
+        }
+
+    total_cliente = soma.sum(axis=1)
+    ordem = sorted(range(len(nomes_clientes)), key=lambda i: (-total_cliente[i], nomes_clientes[i]))
+    return {
+        "faixas": faixas,
+        "gerado_em": agora,
+        "totais": resumo(quantidade.sum(axis=0), soma.sum(axis=0)),
+        "total_a_receber": round(float(valor.sum()), 2),
+        "sem_vencimento": {
+            "quantidade": int(sem_vencimento.sum()),
+            "valor_total": round(valor_sem_vencimento, 2),
+        },
+        "clientes": [
+            {
+                "cliente": nomes_clientes[i],
+                "faixas": resumo(quantidade[i], soma[i]),
+                "total_a_receber": round(float(total_cliente[i]), 2),
+            }
+            for i in ordem
+        ],
+    }
+
+
+def aging_de_cobrancas(cobrancas: List[Dict[str, Any]], agora: Optional[datetime] = None,
+                       limites: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """Aging das linhas da tabela 'Cobranca' (campos 'cliente', 'vencimento' e 'valor')."""
+    agora = agora or datetime.now(timezone.utc)
+    limites = limites or limites_de_texto(AGING_FAIXAS)
+    return calcular_aging(
+        [c["cliente"] for c in cobrancas],
+        [c["vencimento"] for c in cobrancas],
+        [c["valor"] for c in cobrancas],
+        agora,
+        limites,
+    )
@@ -0,0 +1,178 @@
+# Agregados de vendas (unidades e receita) por dia, semana e mês
+"""
+Totais de vendas pré-agregados por categoria e por cliente, mantidos em
+memória. Cada venda registrada pela API soma nos agregados na hora; a
+reconstrução completa a partir da réplica local de 'Venda'
+(core/replica_vendas.py) acontece na primeira consulta e depois a cada
+AGREGADOS_TTL segundos (em segundo plano), o que traz também as vendas feitas
+por outros workers.
+
+Os períodos usam a data (em UTC) de 'data_venda', convertida de outros
+fusos; sem fuso, a data já é tratada como UTC. A semana começa na
+segunda-feira e o mês no dia 1.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core.replica_vendas import replica_vendas
+from app.api.src.core.registro import obter_logger
+
+load_dotenv()
+logger = obter_logger("agregados")
+# Intervalo da reconstrução completa a partir da tabela 'Venda'
+AGREGADOS_TTL = float(os.environ.get("AGREGADOS_TTL", "3600"))
+
+GRANULARIDADES = ("dia", "semana", "mes")
+DIMENSOES = {"categoria": "categoria_produto", "cliente": "cliente"}
+
+
+def inicio_periodo(dia: date, granularidade: str) -> date:
+    """Primeiro dia do período (dia, semana ou mês) que contém 'dia'."""
+    if granularidade == "dia":
+        return dia
+    if granularidade == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "mes":
+        return dia.replace(day=1)
+    raise ValueError(f"Granularidade inválida: '{granularidade}'. Use uma de: {', '.join(GRANULARIDADES)}")
+
+
+def _dia_da_venda(valor: Any) -> date:
+    """Dia (em UTC) da venda; datas sem fuso já são tratadas como UTC."""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc)
+        return valor.date()
+    return valor
+
+
+class _Serie:
+    """Totais de uma chave por período, com os períodos ordenados para consultas por intervalo."""
+    __slots__ = ("periodos", "totais")
+
+    def __init__(self):
+        self.periodos: List[date] = []
+        self.totais: Dict[date, List] = {}
+
+    def somar(self, periodo: date, unidades: int, receita: float) -> None:
+        total = self.totais.get(periodo)
+        if total is None:
+            insort(self.periodos, periodo)
+            total = self.totais[periodo] = [0, 0.0]
+        total[0] += unidades
+        total[1] += receita
+
+    def intervalo(self, inicio: Optional[date], fim: Optional[date]) -> List[Tuple[date, int, float]]:
+        i = bisect_left(self.periodos, inicio) if inicio is not None else 0
+        j = bisect_right(self.periodos, fim) if fim is not None else len(self.periodos)
+        return [(p, *self.totais[p]) for p in self.periodos[i:j]]
+
+
+class AgregadosVendas:
+    """Séries de (unidades, receita) por granularidade, dimensão e chave."""
+
+    def __init__(self, ttl: float = AGREGADOS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], _Serie] = {}
+        self._carregado_em: Optional[float] = None
+        self._recarregando = False
+
+    @staticmethod
+    def _somar(series: Dict[Tuple[str, str, str], _Serie], venda: Dict[str, Any]) -> None:
+        dia = _dia_da_venda(venda["data_venda"])
+        unidades = int(venda.get("qtd_unidades") or 0)
+        receita = float(venda.get("valor_total") or 0.0)
+        for dimensao, coluna in DIMENSOES.items():
+            chave = venda.get(coluna)
+            if chave is None:
+                continue
+            for granularidade in GRANULARIDADES:
+                serie = series.get((granularidade, dimensao, chave))
+                if serie is None:
+                    serie = series[(granularidade, dimensao, chave)] = _Serie()
+                serie.somar(inicio_periodo(dia, granularidade), unidades, receita)
+
+    def registrar(self, venda: Dict[str, Any]) -> None:
+        """Soma uma venda recém-criada nos agregados."""
+        with self._lock:
+            self._somar(self._series, venda)
+
+    def substituir(self, vendas: Iterable[Dict[str, Any]]) -> None:
+        """Reconstrói todos os agregados a partir das linhas de 'Venda'."""
+        series: Dict[Tuple[str, str, str], _Serie] = {}
+        for venda in vendas:
+            self._somar(series, venda)
+        with self._lock:
+            self._series = series
+            self._carregado_em = time.monotonic()
+
+    def consultar(self, granularidade: str, dimensao: str, chave: Optional[str] = None,
+                  inicio: Optional[date] = None, fim: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Totais por período entre 'inicio' e 'fim' (inclusive), de uma chave ou de
+        todas as chaves da dimensão.
+        """
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade inválida: '{granularidade}'. Use uma de: {', '.join(GRANULARIDADES)}")
+        if dimensao not in DIMENSOES:
+            raise ValueError(f"Dimensão inválida: '{dimensao}'. Use uma de: {', '.join(DIMENSOES)}")
+        if inicio is not None:
+            # Inclui o período que contém 'inicio'
+            inicio = inicio_periodo(inicio, granularidade)
+
+        with self._lock:
+            if chave is not None:
+                series = [(chave, self._series.get((granularidade, dimensao, chave)))]
+            else:
+                series = sorted(
+                    (k[2], s) for k, s in self._series.items() if k[0] == granularidade and k[1] == dimensao
+                )
+            return [
+                {"chave": nome, "periodo": periodo, "unidades": unidades, "receita": round(receita, 2)}
+                for nome, serie in series if serie is not None
+                for periodo, unidades, receita in serie.intervalo(inicio, fim)
+            ]
+
+    def garantir_carregado(self) -> None:
+        """
+        Reconstrói os agregados na primeira chamada. Depois disso, quando o TTL
+        expira, reconstrói em uma thread de fundo e continua respondendo com os atuais.
+        """
+        if self._carregado_em is None:
+            self.substituir(carregar_vendas())
+            return
+
+        if time.monotonic() - self._carregado_em < self.ttl:
+            return
+        with self._lock:
+            if self._recarregando:
+                return
+            self._recarregando = True
+
+        def recarregar():
+            try:
+                self.substituir(carregar_vendas())
+            except Exception as e:
+                logger.warning("Falha ao reconstruir os agregados de vendas: %s", e)
+            finally:
+                self._recarregando = False
+
+        threading.Thread(target=recarregar, name="reconstruir-agregados", daemon=True).start()
+
+
+def carregar_vendas() -> List[Dict[str, Any]]:
+    """Lê todas as vendas da réplica local de 'Venda', sincronizando-a antes."""
+    replica_vendas.garantir_atualizada()
+    return [linha.como_dict() for linha in replica_vendas.linhas()]
+
+
+agregados_vendas = AgregadosVendas()
@@ -0,0 +1,257 @@
+# Índice em memória para autocomplete (prefixo + tolerância a erros de digitação)
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.api.src.core.registro import obter_logger
+
+logger = obter_logger("busca")
+
+
+def normalizar(texto: str) -> str:
+    """Remove acentos, ignora maiúsculas/minúsculas e junta espaços repetidos."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def erros_permitidos(consulta: str) -> int:
+    """Quantos erros de digitação tolerar, de acordo com o tamanho da consulta."""
+    if len(consulta) < 4:
+        return 0
+    if len(consulta) <= 7:
+        return 1
+    return 2
+
+
+class _No:
+    """Nó da trie: filhos por caractere e ids das entradas cujas chaves terminam aqui."""
+    __slots__ = ("filhos", "ids")
+
+    def __init__(self):
+        self.filhos: Dict[str, "_No"] = {}
+        self.ids: Dict[Hashable, None] = {}
+
+
+class IndiceBusca:
+    """
+    Índice de busca por prefixo baseado em uma trie de chaves normalizadas.
+
+    Cada entrada é indexada pelo texto completo e também a partir de cada
+    palavra, para que "central" encontre "Padaria Central". A busca por prefixo
+    desce a trie pelos caracteres da consulta; se nada for encontrado, a trie
+    é percorrida calculando a distância de edição linha a
+    linha (autômato de Levenshtein), podando os ramos com mais erros que o
+    permitido, o que encontra nomes digitados com erro sem varrer o índice todo.
+
+    O índice pode ser atualizado incrementalmente ('adicionar'/'remover'),
+    normalmente a partir do consumidor de mudanças, e recarregado por completo
+    quando o TTL expira. As mudanças que chegam durante uma carga são
+    guardadas e reaplicadas sobre o índice novo, que pode ter sido lido antes
+    delas.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas: Dict[Hashable, Tuple[List[str], Any]] = {}
+        self._raiz = _No()
+        self._carregado_em: Optional[float] = None
+        self._recarregando = False
+        # Só uma requisição faz a primeira carga; as outras esperam por ela
+        self._lock_primeira_carga = threading.Lock()
+        # Mudanças (id, chaves, valor) recebidas durante uma carga; chaves None = remoção
+        self._pendentes: Optional[List[Tuple[Hashable, Optional[List[str]], Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    @staticmethod
+    def _chaves_de(texto: str) -> List[str]:
+        palavras = normalizar(texto).split(" ")
+        return list(dict.fromkeys(" ".join(palavras[i:]) for i in range(len(palavras)) if palavras[i]))
+
+    @staticmethod
+    def _inserir_chave(raiz: _No, chave: str, id_entrada: Hashable) -> None:
+        no = raiz
+        for caractere in chave:
+            filho = no.filhos.get(caractere)
+            if filho is None:
+                filho = no.filhos[caractere] = _No()
+            no = filho
+        no.ids[id_entrada] = None
+
+    def _remover_sem_lock(self, id_entrada: Hashable) -> None:
+        entrada = self._entradas.pop(id_entrada, None)
+        if entrada is None:
+            return
+        for chave in entrada[0]:
+            caminho = [self._raiz]
+            for caractere in chave:
+                caminho.append(caminho[-1].filhos[caractere])
+            caminho[-1].ids.pop(id_entrada, None)
+            # Poda os nós que ficaram vazios
+            for profundidade in range(len(chave), 0, -1):
+                no = caminho[profundidade]
+                if no.ids or no.filhos:
+                    break
+                del caminho[profundidade - 1].filhos[chave[profundidade - 1]]
+
+    def _adicionar_sem_lock(self, id_entrada: Hashable, chaves: List[str], valor: Any) -> None:
+        self._remover_sem_lock(id_entrada)
+        self._entradas[id_entrada] = (chaves, valor)
+        for chave in chaves:
+            self._inserir_chave(self._raiz, chave, id_entrada)
+
+    def adicionar(self, id_entrada: Hashable, texto: str, valor: Any) -> None:
+        """Adiciona ou substitui uma entrada."""
+        chaves = self._chaves_de(texto)
+        with self._lock:
+            self._adicionar_sem_lock(id_entrada, chaves, valor)
+            if self._pendentes is not None:
+                self._pendentes.append((id_entrada, chaves, valor))
+
+    def remover(self, id_entrada: Hashable) -> None:
+        with self._lock:
+            self._remover_sem_lock(id_entrada)
+            if self._pendentes is not None:
+                self._pendentes.append((id_entrada, None, None))
+
+    def substituir(self, itens: Iterable[Tuple[Hashable, str, Any]]) -> None:
+        """Reconstrói o índice inteiro a partir de tuplas (id, texto, valor)."""
+        entradas = {}
+        raiz = _No()
+        for id_entrada, texto, valor in itens:
+            chaves = self._chaves_de(texto)
+            entradas[id_entrada] = (chaves, valor)
+            for chave in chaves:
+                self._inserir_chave(raiz, chave, id_entrada)
+        with self._lock:
+            self._entradas = entradas
+            self._raiz = raiz
+            # Reaplica, em ordem, as mudanças que chegaram enquanto os itens eram lidos
+            for id_entrada, chaves, valor in self._pendentes or ():
+                if chaves is None:
+                    self._remover_sem_lock(id_entrada)
+                else:
+                    self._adicionar_sem_lock(id_entrada, chaves, valor)
+            self._pendentes = None
+            self._carregado_em = time.monotonic()
+
+    def _carregar(self, carregar: Callable[[], Iterable[Tuple[Hashable, str, Any]]]) -> None:
+        """Recarrega o índice guardando as mudanças que chegarem durante a leitura."""
+        with self._lock:
+            self._pendentes = []
+        try:
+            self.substituir(carregar())
+        finally:
+            with self._lock:
+                self._pendentes = None
+
+    def garantir_carregado(self, carregar: Callable[[], Iterable[Tuple[Hashable, str, Any]]]) -> None:
+        """
+        Carrega o índice na primeira chamada. Depois disso, quando o TTL expira,
+        recarrega em uma thread de fundo e continua respondendo com o índice atual.
+        """
+        if self._carregado_em is None:
+            with self._lock_primeira_carga:
+                if self._carregado_em is None:
+                    self._carregar(carregar)
+            return
+
+        if time.monotonic() - self._carregado_em < self.ttl:
+            return
+        with self._lock:
+            if self._recarregando:
+                return
+            self._recarregando = True
+
+        def recarregar():
+            try:
+                self._carregar(carregar)
+            except Exception as e:
+                logger.warning("Falha ao recarregar o índice de busca: %s", e)
+            finally:
+                self._recarregando = False
+
+        threading.Thread(target=recarregar, name="recarregar-indice", daemon=True).start()
+
+    @staticmethod
+    def _coletar(no: _No, encontrados: Dict[Hashable, None], limite: int) -> None:
+        """Adiciona os ids da subárvore, das chaves mais curtas para as mais longas."""
+        fila = deque([no])
+        while fila and len(encontrados) < limite:
+            atual = fila.popleft()
+            for id_entrada in atual.ids:
+                encontrados.setdefault(id_entrada)
+                if len(encontrados) >= limite:
+                    return
+            fila.extend(atual.filhos[c] for c in sorted(atual.filhos))
+
+    def _aproximados(self, termo: str, max_erros: int) -> List[Tuple[int, int, _No]]:
+        """
+        Percorre a trie calculando a distância de edição entre o termo e cada
+        prefixo. Retorna (distância, profundidade, nó) dos nós cujo prefixo
+        está a no máximo 'max_erros' edições do termo.
+
+        A primeira letra precisa coincidir: erros nela são raros e exigir isso
+        reduz drasticamente os ramos percorridos.
+        """
+        inicio = self._raiz.filhos.get(termo[0])
+        if inicio is None:
+            return []
+        termo = termo[1:]
+        m = len(termo)
+        resultados = []
+        # (nó, linha atual, linha anterior, caractere anterior, profundidade)
+        pilha = [(inicio, list(range(m + 1)), None, "", 1)]
+        while pilha:
+            no, linha, linha_anterior, anterior, profundidade = pilha.pop()
+            if linha[m] <= max_erros:
+                # Toda a subárvore tem um prefixo próximo o bastante do termo
+                resultados.append((linha[m], profundidade, no))
+                continue
+            if min(linha) > max_erros:
+                continue
+            for caractere, filho in no.filhos.items():
+                nova = [linha[0] + 1]
+                for i in range(1, m + 1):
+                    custo = 0 if termo[i - 1] == caractere else 1
+                    valor = min(linha[i] + 1, nova[i - 1] + 1, linha[i - 1] + custo)
+                    # Troca de duas letras vizinhas conta como um único erro
+                    if (linha_anterior is not None and i > 1 and termo[i - 1] == anterior
+                            and termo[i - 2] == caractere):
+                        valor = min(valor, linha_anterior[i - 2] + 1)
+                    nova.append(valor)
+                pilha.append((filho, nova, linha, caractere, profundidade + 1))
+        resultados.sort(key=lambda r: (r[0], r[1]))
+        return resultados
+
+    def buscar(self, consulta: str, limite: int = 10) -> List[Any]:
+        """Retorna até 'limite' valores cujo texto começa com a consulta (ou quase)."""
+        termo = normalizar(consulta)
+        if not termo or limite <= 0:
+            return []
+
+        encontrados: Dict[Hashable, None] = {}
+        with self._lock:
+            # 1. Prefixo exato
+            no = self._raiz
+            for caractere in termo:
+                no = no.filhos.get(caractere)
+                if no is None:
+                    break
+            if no is not None:
+                self._coletar(no, encontrados, limite)
+
+            # 2. Tolerância a erros de digitação, só quando não há prefixo exato
+            max_erros = erros_permitidos(termo)
+            if not encontrados and max_erros:
+                for _, _, no_aproximado in self._aproximados(termo, max_erros):
+                    if len(encontrados) >= limite:
+                        break
+                    self._coletar(no_aproximado, encontrados, limite)
+
+            return [self._entradas[id_entrada][1] for id_entrada in encontrados]
@@ -0,0 +1,118 @@
+# Cache em memória com expiração (TTL)
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core import replicas
+
+load_dotenv()
+# TTL máximo (s) de um valor lido enquanto a requisição lê das réplicas (que podem estar atrasadas)
+CACHE_TTL_REPLICA = float(os.environ.get("CACHE_TTL_REPLICA", "2"))
+
+# Marcador para distinguir "não está no cache" de um valor None guardado
+AUSENTE = object()
+
+
+class CacheTTL:
+    """
+    Cache simples, seguro para uso entre threads, em que cada entrada expira
+    após 'ttl' segundos.
+
+    As entradas são endereçadas por chave (normalmente a chave da linha no
+    Supabase, como a categoria do Estoque), o que permite que o consumidor de
+    mudanças atualize ou invalide apenas o que mudou.
+
+    Entradas expiradas continuam guardadas até serem substituídas ou
+    invalidadas, para que 'obter_vencido' possa servi-las enquanto o Supabase
+    estiver indisponível. Por isso as chaves devem formar um conjunto limitado.
+
+    Quem lê do Supabase para guardar o resultado pega 'geracao()' antes da
+    leitura e a passa a 'definir': se uma invalidação ou atualização chegou
+    no meio, a leitura pode ser anterior a ela e não é guardada. Valores
+    guardados durante uma requisição que lê das réplicas (core/replicas.py)
+    expiram em no máximo CACHE_TTL_REPLICA segundos, já que a réplica pode
+    estar atrás do primário.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas: Dict[Hashable, Tuple[float, Any]] = {}
+        # Sobe a cada invalidação ou atualização
+        self._geracao = 0
+
+    def geracao(self) -> int:
+        """Geração atual do cache, para passar a 'definir' depois de uma leitura."""
+        with self._lock:
+            return self._geracao
+
+    def obter(self, chave: Hashable) -> Any:
+        """Retorna o valor guardado ou AUSENTE se não existir ou tiver expirado."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return AUSENTE
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                return AUSENTE
+            return valor
+
+    def obter_vencido(self, chave: Hashable) -> Any:
+        """Retorna o valor guardado mesmo que tenha expirado (AUSENTE se não houver)."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            return AUSENTE if entrada is None else entrada[1]
+
+    def definir(self, chave: Hashable, valor: Any, ttl: Optional[float] = None,
+                geracao: Optional[int] = None) -> None:
+        """
+        Guarda um valor, renovando a expiração. Com 'geracao' (de antes da
+        leitura), não guarda nada se o cache foi invalidado ou atualizado depois.
+        Sem ela, o valor vale como uma atualização (ex.: vindo do consumidor de
+        mudanças) e descarta as leituras em andamento.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if replicas.pode_ler_de_replica():
+            ttl = min(ttl, CACHE_TTL_REPLICA)
+        expira_em = time.monotonic() + ttl
+        with self._lock:
+            if geracao is None:
+                self._geracao += 1
+            elif geracao != self._geracao:
+                return
+            self._entradas[chave] = (expira_em, valor)
+
+    def atualizar(self, chave: Hashable, funcao: Callable[[Any], Any]) -> None:
+        """
+        Aplica 'funcao' ao valor guardado, mantendo a expiração original.
+        Não faz nada se a chave não estiver no cache.
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return
+            expira_em, valor = entrada
+            self._entradas[chave] = (expira_em, funcao(valor))
+            self._geracao += 1
+
+    def obter_ou_carregar(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        """Retorna o valor do cache ou chama 'carregar' e guarda o resultado."""
+        valor = self.obter(chave)
+        if valor is AUSENTE:
+            geracao = self.geracao()
+            valor = carregar()
+            self.definir(chave, valor, geracao=geracao)
+        return valor
+
+    def invalidar(self, chave: Hashable) -> None:
+        with self._lock:
+            self._entradas.pop(chave, None)
+            self._geracao += 1
+
+    def invalidar_tudo(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._geracao += 1
@@ -0,0 +1,96 @@
+# Coalescência de escritas concorrentes por chave (ex.: deltas de estoque por categoria)
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.api.src.core import idempotencia, prazo
+
+
+class _Lote:
+    """Deltas acumulados para uma chave e o resultado compartilhado pelos chamadores."""
+    __slots__ = ("deltas", "prazos", "marcas", "pronto", "resultado", "erro")
+
+    def __init__(self):
+        self.deltas: List[int] = []
+        # Prazo de cada chamador (None = sem prazo)
+        self.prazos: List[Optional[float]] = []
+        # Marcas de escrita dos chamadores (core/idempotencia.py)
+        self.marcas: List[Optional[idempotencia.MarcaEscritas]] = []
+        self.pronto = threading.Event()
+        self.resultado: Any = None
+        self.erro: Optional[BaseException] = None
+
+
+class CoalescedorEscritas:
+    """
+    Junta escritas concorrentes para a mesma chave em uma única escrita.
+
+    O primeiro chamador de uma chave vira o "líder": espera 'janela' segundos
+    para que outros deltas cheguem, fecha o lote e chama 'aplicar(chave, deltas)'
+    uma única vez. Todos os chamadores do lote recebem o mesmo resultado (ou a
+    mesma exceção). Lotes da mesma chave são aplicados em série, então as
+    leituras-modificações-escritas de um worker nunca se sobrepõem.
+
+    'aplicar' roda num contexto vazio: ela não participa da unidade de trabalho
+    da requisição do líder, já que escreve em nome de várias requisições. O
+    prazo desse contexto é o maior entre os dos chamadores do lote, pois a
+    escrita serve enquanto algum deles ainda espera. A marca de escrita do
+    contexto agrega as dos chamadores: todos eles ficam marcados quando a
+    escrita do lote é enviada.
+    """
+
+    def __init__(self, aplicar: Callable[[Hashable, List[int]], Any], janela: float):
+        self._aplicar = aplicar
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._lotes: Dict[Hashable, _Lote] = {}
+        self._locks_chave: Dict[Hashable, threading.Lock] = {}
+
+    def _lock_da_chave(self, chave: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._locks_chave.setdefault(chave, threading.Lock())
+
+    def adicionar(self, chave: Hashable, delta: int) -> Any:
+        """Soma 'delta' à chave e retorna o resultado da escrita que o incluiu."""
+        if self.janela <= 0:
+            with self._lock_da_chave(chave):
+                return self._executar(chave, [delta], [prazo.atual()], [idempotencia.marca_atual()])
+
+        with self._lock:
+            lote = self._lotes.get(chave)
+            lider = lote is None
+            if lider:
+                lote = self._lotes[chave] = _Lote()
+            lote.deltas.append(delta)
+            lote.prazos.append(prazo.atual())
+            lote.marcas.append(idempotencia.marca_atual())
+
+        if not lider:
+            lote.pronto.wait()
+            if lote.erro is not None:
+                raise lote.erro
+            return lote.resultado
+
+        time.sleep(self.janela)
+        with self._lock:
+            # Fecha o lote: quem chegar agora começa um novo
+            del self._lotes[chave]
+
+        try:
+            with self._lock_da_chave(chave):
+                lote.resultado = self._executar(chave, list(lote.deltas), list(lote.prazos), list(lote.marcas))
+        except BaseException as e:
+            lote.erro = e
+            raise
+        finally:
+            lote.pronto.set()
+        return lote.resultado
+
+    def _executar(self, chave: Hashable, deltas: List[int], prazos: List[Optional[float]],
+                  marcas: List[Optional[idempotencia.MarcaEscritas]]) -> Any:
+        contexto = contextvars.Context()
+        maior_prazo = None if None in prazos else max(prazos)
+        contexto.run(prazo.definir_absoluto, maior_prazo)
+        contexto.run(idempotencia.definir_marca, idempotencia.MarcaEscritas(m for m in marcas if m is not None))
+        return contexto.run(self._aplicar, chave, deltas)
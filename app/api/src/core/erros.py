@@ -0,0 +1,17 @@
+# Conversão das falhas de comunicação com o Supabase em respostas HTTP
+import requests
+from fastapi import HTTPException, status
+
+
+def erro_supabase(e: requests.exceptions.RequestException) -> HTTPException:
+    """Converte uma falha do 'requests' na HTTPException equivalente."""
+    if isinstance(e, requests.exceptions.HTTPError):
+        error_detail = e.response.text if e.response is not None else str(e)
+        return HTTPException(
+            status_code=e.response.status_code if e.response is not None else 500,
+            detail=f"Erro do Supabase: {error_detail}"
+        )
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Erro de comunicação com o Supabase: {e}"
+    )
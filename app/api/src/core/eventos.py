@@ -0,0 +1,185 @@
+# Barramento de eventos em memória (estoque e cobranças)
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Quantos eventos ficam guardados para permitir retomada via Last-Event-ID
+EVENTOS_CAPACIDADE = int(os.environ.get("EVENTOS_CAPACIDADE", "1000"))
+# Limite de assinantes simultâneos por worker
+EVENTOS_MAX_ASSINANTES = int(os.environ.get("EVENTOS_MAX_ASSINANTES", "200"))
+# Máximo de eventos entregues de uma vez a um assinante antes de ceder o loop
+EVENTOS_MAX_LOTE = int(os.environ.get("EVENTOS_MAX_LOTE", "100"))
+
+
+@dataclass(frozen=True)
+class Evento:
+    """Um evento publicado no barramento, identificado por um id crescente."""
+    id: int
+    tipo: str
+    dados: Dict[str, Any] = field(default_factory=dict)
+
+    def formatar_sse(self) -> str:
+        """Serializa o evento no formato 'text/event-stream'."""
+        dados = json.dumps(self.dados, ensure_ascii=False, default=str)
+        return f"id: {self.id}\nevent: {self.tipo}\ndata: {dados}\n\n"
+
+
+class LimiteAssinantesExcedido(Exception):
+    """Lançada quando o número máximo de assinantes já foi atingido."""
+
+
+class BarramentoEventos:
+    """
+    Guarda os últimos eventos em um buffer circular e acorda os assinantes
+    quando algo novo é publicado.
+
+    - A publicação nunca bloqueia: quem escreve (rotas síncronas, rodando no
+      threadpool) só adiciona o evento ao buffer e sinaliza os loops.
+    - Cada assinante lê o buffer a partir do último id que recebeu, então um
+      cliente lento não segura ninguém (backpressure). Se ele ficar tão
+      atrasado que os eventos saiam do buffer, recebe um evento 'reset' e deve
+      recarregar o estado completo pelas rotas normais.
+    """
+
+    def __init__(self, capacidade: int = EVENTOS_CAPACIDADE, max_assinantes: int = EVENTOS_MAX_ASSINANTES):
+        self._lock = threading.Lock()
+        self._eventos: deque = deque(maxlen=capacidade)
+        self._ultimo_id = 0
+        self._max_assinantes = max_assinantes
+        self._assinantes: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    def publicar(self, tipo: str, dados: Dict[str, Any]) -> int:
+        """Publica um evento e retorna o id atribuído."""
+        with self._lock:
+            self._ultimo_id += 1
+            evento = Evento(id=self._ultimo_id, tipo=tipo, dados=dados)
+            self._eventos.append(evento)
+            assinantes = list(self._assinantes)
+
+        for loop, sinal in assinantes:
+            try:
+                loop.call_soon_threadsafe(sinal.set)
+            except RuntimeError:
+                # O loop do assinante já foi encerrado
+                pass
+        return evento.id
+
+    def eventos_desde(self, ultimo_id: int, limite: Optional[int] = None) -> Tuple[List[Evento], bool]:
+        """
+        Retorna os eventos com id maior que 'ultimo_id'.
+
+        O segundo valor indica se houve perda: eventos que o assinante deveria
+        ter recebido já saíram do buffer (ou o id não pertence a este processo).
+        """
+        with self._lock:
+            if ultimo_id > self._ultimo_id:
+                return [], True
+            if not self._eventos:
+                return [], ultimo_id < self._ultimo_id
+            primeiro = self._eventos[0].id
+            if ultimo_id < primeiro - 1:
+                return [], True
+            inicio = ultimo_id - primeiro + 1
+            fim = None if limite is None else inicio + limite
+            return list(itertools.islice(self._eventos, inicio, fim)), False
+
+    def assinar(
+        self,
+        ultimo_id: Optional[int] = None,
+        tipos: Optional[Iterable[str]] = None,
+        intervalo_heartbeat: float = 15.0,
+    ) -> "Assinatura":
+        """
+        Registra um assinante no loop atual e retorna um iterador assíncrono
+        dos eventos publicados a partir de 'ultimo_id' (ou a partir de agora).
+
+        Deve ser chamado de dentro de um loop asyncio em execução.
+        """
+        assinatura = Assinatura(self, asyncio.get_running_loop(), tipos, intervalo_heartbeat)
+        with self._lock:
+            if len(self._assinantes) >= self._max_assinantes:
+                raise LimiteAssinantesExcedido(
+                    f"Limite de {self._max_assinantes} assinantes simultâneos atingido."
+                )
+            self._assinantes.add(assinatura._chave)
+            assinatura.ultimo_id = self._ultimo_id if ultimo_id is None else ultimo_id
+        return assinatura
+
+    def _remover(self, chave: Tuple[asyncio.AbstractEventLoop, asyncio.Event]) -> None:
+        with self._lock:
+            self._assinantes.discard(chave)
+
+
+class Assinatura:
+    """
+    Iterador assíncrono de um assinante do barramento.
+
+    Produz None quando nada acontece por 'intervalo_heartbeat' segundos, para
+    que a rota envie um comentário de keep-alive. Chame 'fechar' ao terminar.
+    """
+
+    def __init__(
+        self,
+        barramento: BarramentoEventos,
+        loop: asyncio.AbstractEventLoop,
+        tipos: Optional[Iterable[str]],
+        intervalo_heartbeat: float,
+    ):
+        self._barramento = barramento
+        self._sinal = asyncio.Event()
+        self._chave = (loop, self._sinal)
+        self._filtro = set(tipos) if tipos else None
+        self._intervalo_heartbeat = intervalo_heartbeat
+        self._pendentes: deque = deque()
+        self.ultimo_id = 0
+
+    def __aiter__(self) -> "Assinatura":
+        return self
+
+    async def __anext__(self) -> Optional[Evento]:
+        while True:
+            if self._pendentes:
+                return self._pendentes.popleft()
+
+            self._sinal.clear()
+            eventos, perdidos = self._barramento.eventos_desde(self.ultimo_id, limite=EVENTOS_MAX_LOTE)
+
+            if perdidos:
+                self.ultimo_id = self._barramento.ultimo_id
+                return Evento(id=self.ultimo_id, tipo="reset", dados={
+                    "message": "Eventos perdidos; recarregue o estado completo."
+                })
+
+            if eventos:
+                self.ultimo_id = eventos[-1].id
+                self._pendentes.extend(
+                    e for e in eventos if self._filtro is None or e.tipo in self._filtro
+                )
+                # Cede o loop entre lotes para não monopolizá-lo
+                await asyncio.sleep(0)
+                continue
+
+            try:
+                await asyncio.wait_for(self._sinal.wait(), timeout=self._intervalo_heartbeat)
+            except asyncio.TimeoutError:
+                return None
+
+    def fechar(self) -> None:
+        """Remove a assinatura do barramento."""
+        self._barramento._remover(self._chave)
+
+
+# Instância única usada pelas rotas de escrita e pela rota de streaming
+barramento = BarramentoEventos()
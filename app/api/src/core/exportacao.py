@@ -0,0 +1,173 @@
+# Exportação em streaming (CSV e Parquet) de tabelas do Supabase
+"""
+As linhas são lidas do PostgREST em páginas com o cabeçalho 'Range' e
+escritas na resposta página a página, de modo que a memória usada não depende
+do tamanho da tabela.
+
+O Parquet é opcional e depende do 'pyarrow'; cada página vira um row group.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.core import postgrest
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+load_dotenv()
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Linhas por página lida do Supabase (e por row group no Parquet)
+EXPORTACAO_LOTE = int(os.environ.get("EXPORTACAO_LOTE", "1000"))
+
+# Nome público -> tabela, coluna usada no filtro de datas e colunas exportadas (com o tipo)
+TABELAS_EXPORTAVEIS: Dict[str, Dict[str, Any]] = {
+    "vendas": {
+        "tabela": "Venda",
+        "coluna_data": "data_venda",
+        "colunas": [
+            ("id", "int"), ("created_at", "timestamp"), ("cliente", "str"), ("categoria_produto", "str"),
+            ("qtd_unidades", "int"), ("valor_unitario", "float"), ("status_pagamento", "bool"),
+            ("data_venda", "timestamp"), ("data_vencimento", "timestamp"), ("valor_total", "float"),
+        ],
+    },
+    "cobrancas": {
+        "tabela": "Cobranca",
+        "coluna_data": "vencimento",
+        "colunas": [
+            ("id", "int"), ("created_at", "timestamp"), ("cliente", "str"), ("status_pagamento", "bool"),
+            ("vencimento", "timestamp"), ("data_venda", "timestamp"), ("valor", "float"),
+        ],
+    },
+}
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Accept": "application/json",
+    }
+
+
+def parquet_disponivel() -> bool:
+    return pq is not None
+
+
+def filtros_de_data(coluna: str, inicio: Optional[date], fim: Optional[date]) -> List[postgrest.Condicao]:
+    """Filtros do PostgREST para 'inicio <= coluna < fim + 1 dia'."""
+    filtros = []
+    if inicio is not None:
+        filtros.append(postgrest.gte(coluna, inicio))
+    if fim is not None:
+        filtros.append(postgrest.lt(coluna, fim + timedelta(days=1)))
+    return filtros
+
+
+def paginar(tabela: str, colunas: List[str], filtros: List[postgrest.Condicao],
+            lote: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Gera as linhas da tabela em páginas de até 'lote' linhas, ordenadas por id,
+    usando 'Range: inicio-fim' como o PostgREST recomenda para paginação.
+
+    Raises:
+        requests.exceptions.RequestException: Se alguma página falhar.
+    """
+    lote = lote or EXPORTACAO_LOTE
+    consulta = postgrest.Consulta(tabela).select(*colunas).onde(*filtros).order("id")
+    url, params = consulta.url, consulta.params()
+    inicio = 0
+    while True:
+        headers = _get_headers()
+        headers["Range-Unit"] = "items"
+        headers["Range"] = f"{inicio}-{inicio + lote - 1}"
+        response = resiliencia.get(url, headers=headers, params=params, timeout=30.0)
+        response.raise_for_status()
+        pagina = response.json()
+        if pagina:
+            yield pagina
+        if len(pagina) < lote:
+            return
+        inicio += lote
+
+
+def gerar_csv(paginas: Iterator[List[Dict[str, Any]]], colunas: List[str]) -> Iterator[bytes]:
+    """Escreve o cabeçalho e depois um bloco de CSV por página."""
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=colunas, extrasaction="ignore")
+    escritor.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    for pagina in paginas:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(pagina)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _SaidaStreaming(io.RawIOBase):
+    """Destino do ParquetWriter que acumula os bytes até o próximo 'retirar'."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def retirar(self) -> bytes:
+        dados, self._partes = b"".join(self._partes), []
+        return dados
+
+
+def _esquema_arrow(colunas: List[Tuple[str, str]]):
+    tipos = {
+        "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "str": pa.string(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(nome, tipos[tipo]) for nome, tipo in colunas])
+
+
+def _converter_para_arrow(pagina: List[Dict[str, Any]], colunas: List[Tuple[str, str]]) -> Dict[str, list]:
+    """Monta as colunas de uma página, convertendo os textos ISO em datetime."""
+    dados: Dict[str, list] = {}
+    for nome, tipo in colunas:
+        valores = [linha.get(nome) for linha in pagina]
+        if tipo == "timestamp":
+            valores = [datetime.fromisoformat(v) if v else None for v in valores]
+        dados[nome] = valores
+    return dados
+
+
+def gerar_parquet(paginas: Iterator[List[Dict[str, Any]]], colunas: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """Escreve um row group por página e entrega os bytes conforme são gerados."""
+    esquema = _esquema_arrow(colunas)
+    saida = _SaidaStreaming()
+    with pq.ParquetWriter(saida, esquema, compression="snappy") as escritor:
+        for pagina in paginas:
+            escritor.write_table(pa.table(_converter_para_arrow(pagina, colunas), schema=esquema))
+            yield saida.retirar()
+    yield saida.retirar()
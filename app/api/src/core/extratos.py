@@ -0,0 +1,336 @@
+# Extratos mensais por cliente (HTML, CSV ou PDF) gerados em paralelo
+"""
+O fechamento do mês gera um extrato por cliente com as vendas do mês e as
+cobranças (pagas e em aberto). Em vez de uma chamada à API por cliente:
+
+1. 'carregar_mes' lê o mês inteiro de uma vez: as vendas com 'data_venda' no
+   mês e as cobranças que vencem no mês ou que seguem em aberto de meses
+   anteriores (duas leituras paginadas, nas réplicas quando possível), e
+   separa as linhas por cliente.
+2. 'GeradorExtratos' renderiza os extratos em lotes de clientes num pool de
+   processos (a renderização é CPU pura, presa ao GIL em threads), então o
+   tempo total cai com o número de núcleos.
+3. 'gerar_zip' junta os arquivos num ZIP escrito em streaming, na ordem dos
+   clientes, conforme os lotes ficam prontos.
+
+O PDF é opcional e depende do 'reportlab'.
+"""
+import csv
+import html
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core import exportacao, postgrest
+from app.api.src.core.busca import normalizar
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+
+load_dotenv()
+# Processos que renderizam os extratos; 0 usa todos os núcleos
+EXTRATOS_PROCESSOS = int(os.environ.get("EXTRATOS_PROCESSOS", "0"))
+# Máximo de clientes por tarefa enviada ao pool
+EXTRATOS_LOTE = int(os.environ.get("EXTRATOS_LOTE", "25"))
+
+FORMATOS = ("html", "csv", "pdf")
+COLUNAS_VENDA = [c for c, _ in exportacao.TABELAS_EXPORTAVEIS["vendas"]["colunas"]]
+COLUNAS_COBRANCA = [c for c, _ in exportacao.TABELAS_EXPORTAVEIS["cobrancas"]["colunas"]]
+COLUNAS_CSV = ["tipo", "data", "descricao", "quantidade", "valor_unitario", "valor", "situacao"]
+
+Extrato = Dict[str, List[Dict[str, Any]]]
+
+
+def pdf_disponivel() -> bool:
+    return SimpleDocTemplate is not None
+
+
+def periodo_do_mes(ano: int, mes: int) -> Tuple[date, date]:
+    """Primeiro e último dia do mês."""
+    inicio = date(ano, mes, 1)
+    proximo = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, date.fromordinal(proximo.toordinal() - 1)
+
+
+# --- Leitura em lote ---
+
+def carregar_mes(ano: int, mes: int, clientes: Optional[List[str]] = None) -> Dict[str, Extrato]:
+    """
+    Lê as vendas e cobranças do mês e as separa por cliente (em ordem alfabética).
+
+    Raises:
+        requests.exceptions.RequestException: Se alguma leitura do Supabase falhar.
+    """
+    inicio, fim = periodo_do_mes(ano, mes)
+    filtro_clientes = [postgrest.em("cliente", clientes)] if clientes else []
+
+    filtros_vendas = exportacao.filtros_de_data("data_venda", inicio, fim) + filtro_clientes
+    # Vencem até o fim do mês e são do mês ou continuam em aberto
+    filtros_cobrancas = [
+        *exportacao.filtros_de_data("vencimento", None, fim),
+        postgrest.ou(postgrest.gte("vencimento", inicio), postgrest.eq("status_pagamento", False)),
+    ] + filtro_clientes
+
+    extratos: Dict[str, Extrato] = {}
+    for pagina in exportacao.paginar("Venda", COLUNAS_VENDA, filtros_vendas):
+        for venda in pagina:
+            extratos.setdefault(venda["cliente"], {"vendas": [], "cobrancas": []})["vendas"].append(venda)
+    for pagina in exportacao.paginar("Cobranca", COLUNAS_COBRANCA, filtros_cobrancas):
+        for cobranca in pagina:
+            extratos.setdefault(cobranca["cliente"], {"vendas": [], "cobrancas": []})["cobrancas"].append(cobranca)
+    return dict(sorted(extratos.items(), key=lambda item: normalizar(item[0])))
+
+
+# --- Renderização (roda nos processos do pool) ---
+
+def _data(valor: Optional[str]) -> Optional[date]:
+    return datetime.fromisoformat(valor).date() if valor else None
+
+
+def _data_br(valor: Optional[str]) -> str:
+    dia = _data(valor)
+    return dia.strftime("%d/%m/%Y") if dia else ""
+
+
+def _reais(valor: Optional[float]) -> str:
+    if valor is None:
+        return ""
+    texto = f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"R$ {texto}"
+
+
+def _situacao(cobranca: Dict[str, Any], hoje: date) -> str:
+    if cobranca.get("status_pagamento"):
+        return "Pago"
+    vencimento = _data(cobranca.get("vencimento"))
+    return "Vencido" if vencimento is not None and vencimento < hoje else "Pendente"
+
+
+def _resumo(extrato: Extrato, inicio: date, hoje: date) -> Dict[str, Any]:
+    """Linhas e totais do extrato, já no formato de exibição."""
+    vendas = sorted(extrato["vendas"], key=lambda v: (v.get("data_venda") or "", v.get("id") or 0))
+    cobrancas = sorted(extrato["cobrancas"], key=lambda c: (c.get("vencimento") or "", c.get("id") or 0))
+    do_mes = [c for c in cobrancas if (_data(c.get("vencimento")) or inicio) >= inicio]
+    anteriores = [c for c in cobrancas if (_data(c.get("vencimento")) or inicio) < inicio]
+    return {
+        "vendas": vendas,
+        "cobrancas": do_mes,
+        "anteriores": anteriores,
+        "total_vendido": sum(v.get("valor_total") or 0.0 for v in vendas),
+        "total_pago": sum(c.get("valor") or 0.0 for c in do_mes if c.get("status_pagamento")),
+        "total_em_aberto": sum(c.get("valor") or 0.0 for c in cobrancas if not c.get("status_pagamento")),
+        "hoje": hoje,
+    }
+
+
+def _renderizar_csv(cliente: str, resumo: Dict[str, Any], inicio: date) -> bytes:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_CSV)
+    for venda in resumo["vendas"]:
+        escritor.writerow([
+            "venda", _data(venda.get("data_venda")), venda.get("categoria_produto"), venda.get("qtd_unidades"),
+            venda.get("valor_unitario"), venda.get("valor_total"), "Pago" if venda.get("status_pagamento") else "A pagar",
+        ])
+    for chave, descricao in (("anteriores", "Cobrança em aberto de mês anterior"), ("cobrancas", "Cobrança")):
+        for cobranca in resumo[chave]:
+            escritor.writerow([
+                "cobranca", _data(cobranca.get("vencimento")), descricao, "", "", cobranca.get("valor"),
+                _situacao(cobranca, resumo["hoje"]),
+            ])
+    # Com BOM, para o Excel abrir os acentos corretamente
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def _tabela_html(titulo: str, cabecalho: List[str], linhas: List[List[str]]) -> str:
+    if not linhas:
+        return f"<h2>{html.escape(titulo)}</h2><p>Nenhum lançamento.</p>"
+    th = "".join(f"<th>{html.escape(c)}</th>" for c in cabecalho)
+    trs = "".join("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in linha) + "</tr>" for linha in linhas)
+    return f"<h2>{html.escape(titulo)}</h2><table><thead><tr>{th}</tr></thead><tbody>{trs}</tbody></table>"
+
+
+def _secoes(resumo: Dict[str, Any]) -> List[Tuple[str, List[str], List[List[str]]]]:
+    """Título, cabeçalho e linhas de cada tabela do extrato (HTML e PDF)."""
+    hoje = resumo["hoje"]
+    secoes = [
+        ("Vendas do mês", ["Data", "Produto", "Unidades", "Valor unitário", "Total"], [
+            [_data_br(v.get("data_venda")), v.get("categoria_produto") or "", v.get("qtd_unidades") or "",
+             _reais(v.get("valor_unitario")), _reais(v.get("valor_total"))]
+            for v in resumo["vendas"]
+        ]),
+        ("Cobranças do mês", ["Vencimento", "Valor", "Situação"], [
+            [_data_br(c.get("vencimento")), _reais(c.get("valor")), _situacao(c, hoje)] for c in resumo["cobrancas"]
+        ]),
+    ]
+    if resumo["anteriores"]:
+        secoes.append(("Em aberto de meses anteriores", ["Vencimento", "Valor", "Situação"], [
+            [_data_br(c.get("vencimento")), _reais(c.get("valor")), _situacao(c, hoje)] for c in resumo["anteriores"]
+        ]))
+    return secoes
+
+
+def _totais(resumo: Dict[str, Any]) -> List[Tuple[str, str]]:
+    return [
+        ("Total vendido no mês", _reais(resumo["total_vendido"])),
+        ("Pago no mês", _reais(resumo["total_pago"])),
+        ("Total em aberto", _reais(resumo["total_em_aberto"])),
+    ]
+
+
+def _renderizar_html(cliente: str, resumo: Dict[str, Any], inicio: date) -> bytes:
+    titulo = f"Extrato {inicio.strftime('%m/%Y')} - {cliente}"
+    tabelas = "".join(_tabela_html(*secao) for secao in _secoes(resumo))
+    totais = "".join(f"<tr><th>{html.escape(r)}</th><td>{v}</td></tr>" for r, v in _totais(resumo))
+    return (
+        "<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(titulo)}</title><style>"
+        "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}th{background:#f3f3f3}"
+        "</style></head><body>"
+        f"<h1>{html.escape(titulo)}</h1>{tabelas}<h2>Resumo</h2><table>{totais}</table>"
+        f"<p>Gerado em {resumo['hoje'].strftime('%d/%m/%Y')}.</p></body></html>"
+    ).encode("utf-8")
+
+
+def _renderizar_pdf(cliente: str, resumo: Dict[str, Any], inicio: date) -> bytes:
+    estilos = getSampleStyleSheet()
+    estilo_tabela = TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ])
+    elementos = [Paragraph(html.escape(f"Extrato {inicio.strftime('%m/%Y')} - {cliente}"), estilos["Title"])]
+    for titulo, cabecalho, linhas in _secoes(resumo):
+        elementos.append(Paragraph(titulo, estilos["Heading2"]))
+        if linhas:
+            elementos.append(Table([cabecalho] + [[str(c) for c in linha] for linha in linhas], style=estilo_tabela))
+        else:
+            elementos.append(Paragraph("Nenhum lançamento.", estilos["Normal"]))
+        elementos.append(Spacer(0, 12))
+    elementos.append(Paragraph("Resumo", estilos["Heading2"]))
+    elementos.append(Table([list(t) for t in _totais(resumo)], style=estilo_tabela))
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title=f"Extrato {cliente}").build(elementos)
+    return buffer.getvalue()
+
+
+_RENDERIZADORES = {"html": _renderizar_html, "csv": _renderizar_csv, "pdf": _renderizar_pdf}
+
+
+def _renderizar_lote(formato: str, inicio: date, hoje: date,
+                     lote: List[Tuple[str, Extrato]]) -> List[Tuple[str, bytes]]:
+    """Tarefa do pool: (cliente, conteúdo) de cada extrato do lote."""
+    renderizar = _RENDERIZADORES[formato]
+    return [(cliente, renderizar(cliente, _resumo(extrato, inicio, hoje), inicio)) for cliente, extrato in lote]
+
+
+# --- Pool de processos ---
+
+class GeradorExtratos:
+    """Renderiza extratos num pool de processos criado no primeiro uso."""
+
+    def __init__(self, processos: int = EXTRATOS_PROCESSOS, lote: int = EXTRATOS_LOTE):
+        self.processos = processos or os.cpu_count() or 1
+        self.lote = lote
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # 'spawn': o processo da API tem threads (logs, réplicas, hedge) e um fork as copiaria no meio do trabalho
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _lotes(self, itens: List[Tuple[str, Extrato]]) -> List[List[Tuple[str, Extrato]]]:
+        # Lotes pequenos o bastante para uns 4 por processo, equilibrando clientes grandes e pequenos
+        tamanho = max(1, min(self.lote, -(-len(itens) // (self.processos * 4))))
+        return [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+
+    def renderizar(self, extratos: Dict[str, Extrato], formato: str, ano: int, mes: int,
+                   hoje: Optional[date] = None) -> Iterator[Tuple[str, bytes]]:
+        """
+        Gera (cliente, conteúdo) na ordem de 'extratos'. Até 2 lotes por
+        processo ficam em andamento, para não acumular extratos prontos
+        enquanto o consumidor (ex.: o download) está lento.
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido: '{formato}'")
+        inicio, _ = periodo_do_mes(ano, mes)
+        hoje = hoje or date.today()
+        lotes = self._lotes(list(extratos.items()))
+        if self.processos <= 1 or len(lotes) <= 1:
+            for lote in lotes:
+                yield from _renderizar_lote(formato, inicio, hoje, lote)
+            return
+
+        pool = self._executor()
+        pendentes: Deque[Future] = deque()
+        proximos = iter(lotes)
+        try:
+            for lote in proximos:
+                pendentes.append(pool.submit(_renderizar_lote, formato, inicio, hoje, lote))
+                if len(pendentes) >= 2 * self.processos:
+                    break
+            while pendentes:
+                prontos = pendentes.popleft().result()
+                lote = next(proximos, None)
+                if lote is not None:
+                    pendentes.append(pool.submit(_renderizar_lote, formato, inicio, hoje, lote))
+                yield from prontos
+        finally:
+            # Download interrompido: descarta os lotes que ainda não começaram
+            for futuro in pendentes:
+                futuro.cancel()
+
+    def parar(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+gerador_extratos = GeradorExtratos()
+
+
+# --- Saída ---
+
+def nome_arquivo(cliente: str, ano: int, mes: int, formato: str) -> str:
+    nome = re.sub(r"[^a-z0-9]+", "_", normalizar(cliente)).strip("_") or "cliente"
+    return f"extrato_{ano}-{mes:02d}_{nome}.{formato}"
+
+
+def gerar_zip(arquivos: Iterator[Tuple[str, bytes]], ano: int, mes: int, formato: str) -> Iterator[bytes]:
+    """Escreve um ZIP com um arquivo por cliente, entregando os bytes a cada extrato."""
+    saida = exportacao._SaidaStreaming()
+    usados: Dict[str, int] = {}
+    # PDF já vem comprimido
+    compressao = zipfile.ZIP_STORED if formato == "pdf" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(saida, "w", compression=compressao) as arquivo_zip:
+        for cliente, conteudo in arquivos:
+            nome = nome_arquivo(cliente, ano, mes, formato)
+            # Clientes cujos nomes só diferem em acentos ou pontuação
+            usados[nome] = usados.get(nome, 0) + 1
+            if usados[nome] > 1:
+                base, extensao = nome.rsplit(".", 1)
+                nome = f"{base}_{usados[nome]}.{extensao}"
+            arquivo_zip.writestr(nome, conteudo)
+            yield saida.retirar()
+    yield saida.retirar()
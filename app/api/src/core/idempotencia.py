@@ -0,0 +1,303 @@
+# Chaves de idempotência ('Idempotency-Key') para as rotas de escrita
+"""
+Clientes de PDV reenviam '/vendas/vender' depois de um timeout, o que
+duplicava as linhas de 'Venda' e da 'Cobranca' criada junto com a venda. Com
+o cabeçalho 'Idempotency-Key', a primeira requisição com a chave executa a
+rota e a resposta fica guardada por IDEMPOTENCIA_TTL segundos:
+
+- uma repetição com a chave já concluída recebe a resposta guardada, sem
+  chamar o Supabase (cabeçalho 'Idempotency-Replayed: true');
+- uma repetição enquanto a original ainda roda espera por ela e recebe a
+  mesma resposta;
+- a mesma chave com outro corpo é recusada com 422.
+
+Respostas 5xx só deixam de ser guardadas quando nenhuma escrita chegou a
+ser enviada ao Supabase (ex.: prazo esgotado antes das escritas): aí a
+próxima tentativa executa a rota de novo. Se alguma escrita saiu, a resposta
+(ou um 500 sintético, se a rota levantou uma exceção) fica guardada, para a
+repetição não duplicar o que já foi gravado. 'MarcaEscritas' registra isso:
+'resiliencia.executar' marca a requisição antes de cada escrita.
+
+O registro é local ao processo e limitado a IDEMPOTENCIA_MAX_CHAVES chaves
+(as mais antigas saem primeiro).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core import prazo
+
+load_dotenv()
+# Por quanto tempo (s) uma resposta fica guardada
+IDEMPOTENCIA_TTL = float(os.environ.get("IDEMPOTENCIA_TTL", "86400"))
+# Máximo de chaves guardadas
+IDEMPOTENCIA_MAX_CHAVES = int(os.environ.get("IDEMPOTENCIA_MAX_CHAVES", "10000"))
+# Espera máxima (s) por uma requisição original ainda em andamento
+IDEMPOTENCIA_ESPERA = float(os.environ.get("IDEMPOTENCIA_ESPERA", "30"))
+# Rotas (POST) que aceitam a chave, sem o '/api/v1'
+IDEMPOTENCIA_ROTAS = os.environ.get("IDEMPOTENCIA_ROTAS", "/vendas/vender")
+CABECALHO_CHAVE = "idempotency-key"
+TAMANHO_MAXIMO_CHAVE = 255
+PREFIXO_API = "/api/v1"
+
+
+class MarcaEscritas:
+    """
+    Diz se a requisição já enviou alguma escrita ao Supabase. Marcar uma
+    marca também marca as que ela agrega (ex.: a escrita do coalescedor,
+    feita em nome de várias requisições).
+    """
+    __slots__ = ("enviada", "_agregadas")
+
+    def __init__(self, agregadas: Iterable["MarcaEscritas"] = ()):
+        self.enviada = False
+        self._agregadas = list(agregadas)
+
+    def marcar(self) -> None:
+        self.enviada = True
+        for marca in self._agregadas:
+            marca.marcar()
+
+
+# Mutável de propósito: a thread da rota recebe uma cópia do contexto, mas a mesma marca
+_marca_atual: ContextVar[Optional[MarcaEscritas]] = ContextVar("marca_escritas", default=None)
+
+
+def marca_atual() -> Optional[MarcaEscritas]:
+    return _marca_atual.get()
+
+
+def definir_marca(marca: Optional[MarcaEscritas]):
+    """Define a marca do contexto atual; retorna o token para o 'reset'."""
+    return _marca_atual.set(marca)
+
+
+def marcar_escrita_enviada() -> None:
+    """Chamada antes de cada escrita no Supabase."""
+    marca = _marca_atual.get()
+    if marca is not None:
+        marca.marcar()
+
+
+class _Entrada:
+    """Estado de uma chave: em andamento (sem resposta) ou concluída."""
+    __slots__ = ("impressao", "resposta", "expira_em", "esperando")
+
+    def __init__(self, impressao: str):
+        self.impressao = impressao
+        # (status, headers, corpo) quando concluída
+        self.resposta: Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes]] = None
+        self.expira_em = float("inf")
+        self.esperando: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class RegistroIdempotencia:
+    """Respostas por chave, com TTL e limite de tamanho (saem primeiro as mais antigas)."""
+
+    def __init__(self, ttl: float = IDEMPOTENCIA_TTL, max_chaves: int = IDEMPOTENCIA_MAX_CHAVES):
+        self.ttl = ttl
+        self.max_chaves = max_chaves
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Tuple[str, str], _Entrada]" = OrderedDict()
+
+    def _limpar(self) -> None:
+        """Acima do limite, remove as expiradas e depois as concluídas mais antigas (com o lock)."""
+        if len(self._entradas) <= self.max_chaves:
+            return
+        agora = time.monotonic()
+        for chave in [c for c, e in self._entradas.items() if e.expira_em < agora]:
+            del self._entradas[chave]
+        excesso = len(self._entradas) - self.max_chaves
+        if excesso > 0:
+            # Nunca descarta uma em andamento; ela sai quando concluir
+            concluidas = [c for c, e in self._entradas.items() if e.resposta is not None]
+            for chave in concluidas[:excesso]:
+                del self._entradas[chave]
+
+    def reservar(self, chave: Tuple[str, str], impressao: str) -> Tuple[str, Optional[_Entrada]]:
+        """
+        Retorna ('nova', entrada) se esta requisição deve executar a rota,
+        ('concluida', entrada) ou ('em_andamento', entrada) se a chave já
+        existe, ou ('divergente', entrada) se o corpo for outro.
+        """
+        with self._lock:
+            self._limpar()
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada.expira_em < time.monotonic():
+                del self._entradas[chave]
+                entrada = None
+            if entrada is None:
+                entrada = self._entradas[chave] = _Entrada(impressao)
+                return "nova", entrada
+            if entrada.impressao != impressao:
+                return "divergente", entrada
+            return ("concluida" if entrada.resposta is not None else "em_andamento"), entrada
+
+    def esperar(self, entrada: _Entrada) -> Optional[asyncio.Future]:
+        """Future resolvido quando a entrada em andamento terminar (None se já terminou)."""
+        with self._lock:
+            if entrada.resposta is not None:
+                return None
+            loop = asyncio.get_running_loop()
+            futuro = loop.create_future()
+            entrada.esperando.append((loop, futuro))
+            return futuro
+
+    def concluir(self, chave: Tuple[str, str], entrada: _Entrada,
+                 resposta: Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes]]) -> None:
+        """Guarda a resposta (ou descarta a chave, com None) e acorda quem espera."""
+        with self._lock:
+            if resposta is None:
+                if self._entradas.get(chave) is entrada:
+                    del self._entradas[chave]
+            else:
+                entrada.resposta = resposta
+                entrada.expira_em = time.monotonic() + self.ttl
+            esperando, entrada.esperando = entrada.esperando, []
+        for loop, futuro in esperando:
+            loop.call_soon_threadsafe(_acordar, futuro)
+
+
+def _acordar(futuro: asyncio.Future) -> None:
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+async def _responder(send, status_code: int, headers: List[Tuple[bytes, bytes]], corpo: bytes) -> None:
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def _responder_erro(send, status_code: int, mensagem: str) -> None:
+    corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+    await _responder(send, status_code, [
+        (b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode()),
+    ], corpo)
+
+
+class MiddlewareIdempotencia:
+    """Middleware ASGI que aplica o 'Idempotency-Key' às rotas configuradas."""
+
+    def __init__(self, app, registro: Optional[RegistroIdempotencia] = None):
+        self.app = app
+        self.registro = registro or registro_idempotencia
+        self.rotas = {
+            PREFIXO_API + p.strip().rstrip("/") for p in IDEMPOTENCIA_ROTAS.split(",") if p.strip()
+        }
+
+    @staticmethod
+    def _chave_do_cabecalho(headers) -> Optional[str]:
+        for nome, valor in headers:
+            if nome.decode("latin-1").lower() == CABECALHO_CHAVE:
+                return valor.decode("latin-1").strip()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in self.rotas:
+            await self.app(scope, receive, send)
+            return
+        chave_cliente = self._chave_do_cabecalho(scope.get("headers", []))
+        if chave_cliente is None:
+            await self.app(scope, receive, send)
+            return
+        if not chave_cliente or len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            await _responder_erro(send, 400, f"'Idempotency-Key' deve ter de 1 a {TAMANHO_MAXIMO_CHAVE} caracteres.")
+            return
+
+        # O corpo é lido inteiro para comparar repetições e depois reentregue à rota
+        partes: List[bytes] = []
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "http.disconnect":
+                return
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body", False):
+                break
+        corpo = b"".join(partes)
+        impressao = hashlib.sha256(corpo).hexdigest()
+        chave = (scope["path"].rstrip("/"), chave_cliente)
+
+        while True:
+            situacao, entrada = self.registro.reservar(chave, impressao)
+            if situacao == "divergente":
+                await _responder_erro(
+                    send, 422, "Esta 'Idempotency-Key' já foi usada com outro corpo de requisição."
+                )
+                return
+            if situacao == "concluida":
+                status_code, headers, corpo_resposta = entrada.resposta
+                await _responder(send, status_code, headers + [(b"idempotency-replayed", b"true")], corpo_resposta)
+                return
+            if situacao == "nova":
+                break
+            # Em andamento: espera a original e consulta de novo (se ela falhou, esta executa)
+            futuro = self.registro.esperar(entrada)
+            if futuro is None:
+                continue
+            resta = prazo.restante()
+            limite = IDEMPOTENCIA_ESPERA if resta is None else max(0.0, min(IDEMPOTENCIA_ESPERA, resta))
+            try:
+                await asyncio.wait_for(futuro, timeout=limite)
+            except asyncio.TimeoutError:
+                await _responder_erro(
+                    send, 409, "Uma requisição com esta 'Idempotency-Key' ainda está em andamento."
+                )
+                return
+
+        await self._executar(scope, receive, send, corpo, chave, entrada)
+
+    async def _executar(self, scope, receive, send, corpo: bytes, chave: Tuple[str, str],
+                        entrada: _Entrada) -> None:
+        entregue = False
+
+        async def receber():
+            nonlocal entregue
+            if entregue:
+                return await receive()
+            entregue = True
+            return {"type": "http.request", "body": corpo, "more_body": False}
+
+        status_code = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        partes: List[bytes] = []
+
+        async def enviar(mensagem):
+            nonlocal status_code, headers
+            if mensagem["type"] == "http.response.start":
+                status_code = mensagem["status"]
+                headers = list(mensagem.get("headers", []))
+            elif mensagem["type"] == "http.response.body":
+                partes.append(mensagem.get("body", b""))
+            await send(mensagem)
+
+        marca = MarcaEscritas()
+        token = definir_marca(marca)
+        resposta = None
+        try:
+            await self.app(scope, receber, enviar)
+            if status_code < 500 or marca.enviada:
+                resposta = (status_code, headers, b"".join(partes))
+        except Exception:
+            if marca.enviada:
+                corpo_erro = json.dumps({
+                    "detail": "A requisição falhou depois de enviar escritas ao Supabase; "
+                              "confira o que foi gravado antes de repetir com outra chave."
+                }).encode("utf-8")
+                resposta = (500, [
+                    (b"content-type", b"application/json"), (b"content-length", str(len(corpo_erro)).encode()),
+                ], corpo_erro)
+            raise
+        finally:
+            _marca_atual.reset(token)
+            self.registro.concluir(chave, entrada, resposta)
+
+
+registro_idempotencia = RegistroIdempotencia()
@@ -0,0 +1,317 @@
+# Importação em massa de CSV (vendas, clientes e estoque) com upserts em lotes
+"""
+Lê um CSV linha a linha, valida cada linha com o schema da rota equivalente
+('Venda', 'ClienteCreate' ou 'AtualizarEstoqueRequest') e envia as linhas
+válidas ao Supabase em lotes de IMPORTACAO_LOTE, em uma requisição por lote.
+Linhas inválidas são relatadas com o número da linha no arquivo e não
+impedem a importação das demais.
+
+O cabeçalho do CSV usa os nomes dos campos dos schemas. Vendas importadas são
+registros históricos: não geram cobrança nem baixam o estoque, ao contrário
+de '/vendas/vender'.
+
+Clientes são inseridos com 'on_conflict=name' e ignoram nomes já existentes,
+o que pede um índice único:
+
+    create unique index on "Cliente" (name);
+
+Vendas não têm chave natural; cada linha importada recebe uma
+'chave_importacao' derivada do seu conteúdo no CSV e de quantas linhas
+idênticas vieram antes dela no mesmo arquivo. Reimportar o mesmo arquivo (ou
+um que só acrescente linhas) gera as mesmas chaves, e as vendas já gravadas
+são ignoradas em vez de duplicadas. Vendas feitas pela API ficam com a chave
+nula, que o índice único não restringe:
+
+    alter table "Venda" add column chave_importacao text;
+    create unique index on "Venda" (chave_importacao);
+"""
+import csv
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+import requests
+from dotenv import load_dotenv
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.api.src.core import movimentos
+from app.api.src.core.agregados import agregados_vendas
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.core.precos import preco_vigente
+from app.api.src.core.replica_vendas import replica_vendas
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.schemas.cliente import ClienteCreate
+from app.api.src.schemas.produto import AtualizarEstoqueRequest
+from app.api.src.schemas.venda import Venda
+
+load_dotenv()
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Linhas por requisição de upsert
+IMPORTACAO_LOTE = int(os.environ.get("IMPORTACAO_LOTE", "500"))
+# Quantos erros de linha entram no relatório (os demais só são contados)
+IMPORTACAO_MAX_ERROS = int(os.environ.get("IMPORTACAO_MAX_ERROS", "1000"))
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Prefer": "return=representation",
+    }
+
+
+# --- Conversão das linhas validadas em linhas das tabelas ---
+
+def _linhas_venda(vendas: List[Venda]) -> List[Dict[str, Any]]:
+    linhas = []
+    for venda in vendas:
+        if not venda.valor_unitario:
+            venda.valor_unitario = preco_vigente(venda.categoria_produto, venda.data_venda)
+        linhas.append(venda.model_dump(mode="json"))
+    return linhas
+
+
+def _linhas_cliente(clientes: List[ClienteCreate]) -> List[Dict[str, Any]]:
+    return [{"name": cliente.nome, "status": True} for cliente in clientes]
+
+
+def _linhas_estoque(itens: List[AtualizarEstoqueRequest]) -> List[Dict[str, Any]]:
+    """Mantém o preço atual de cada categoria, como '/estoque/atualizar_estoque'."""
+    categorias = list(dict.fromkeys(item.categoria for item in itens))
+    precos = {categoria: preco_vigente(categoria) for categoria in categorias}
+    faltando = [c for c, p in precos.items() if p is None]
+    if faltando:
+        consulta = Consulta("Estoque").select("categoria", "preco_unitario").em("categoria", faltando)
+        response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+        response.raise_for_status()
+        precos.update({linha["categoria"]: linha["preco_unitario"] for linha in response.json()})
+    return [
+        {
+            "categoria": item.categoria,
+            "quantidade": item.quantidade,
+            "preco_unitario": precos.get(item.categoria) or 0.0,
+            "observacao": "Importacao de estoque",
+        }
+        for item in itens
+    ]
+
+
+# --- Efeitos colaterais depois de cada lote gravado ---
+
+def _apos_vendas(enviadas: List[Dict[str, Any]], gravadas: List[Dict[str, Any]]) -> None:
+    # Com 'ignore-duplicates' o PostgREST devolve só as vendas inseridas
+    for venda in gravadas:
+        agregados_vendas.registrar(venda)
+    replica_vendas.marcar_desatualizada()
+
+
+def _apos_clientes(enviadas: List[Dict[str, Any]], gravadas: List[Dict[str, Any]]) -> None:
+    # Com 'ignore-duplicates' o PostgREST devolve só as linhas inseridas
+    for cliente in gravadas:
+        consumidor.aplicar(Mudanca(tabela="Cliente", tipo="INSERT", registro=cliente))
+
+
+def _apos_estoque(enviadas: List[Dict[str, Any]], gravadas: List[Dict[str, Any]]) -> None:
+    for linha in enviadas:
+        if movimentos.ativo():
+            # O livro é a fonte da verdade: registra a diferença como ajuste
+            atual = movimentos.saldo(linha["categoria"])["quantidade"]
+            if linha["quantidade"] != atual:
+                movimentos.registrar_movimento(
+                    linha["categoria"], "ajuste", linha["quantidade"] - atual, "Importacao de estoque"
+                )
+        consumidor.aplicar(Mudanca(tabela="Estoque", tipo="UPDATE", registro=linha))
+
+
+class TipoImportacao:
+    """Como validar, converter e gravar as linhas de um tipo de importação."""
+
+    def __init__(self, schema: type, tabela: str, converter: Callable[[list], List[Dict[str, Any]]],
+                 apos_gravar: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None],
+                 on_conflict: Optional[str] = None, resolucao: Optional[str] = None,
+                 coluna_chave: Optional[str] = None):
+        self.schema = schema
+        self.validador = TypeAdapter(schema)
+        self.tabela = tabela
+        self.converter = converter
+        self.apos_gravar = apos_gravar
+        self.on_conflict = on_conflict
+        self.resolucao = resolucao
+        # Coluna que recebe a chave derivada do conteúdo da linha (ver docstring do módulo)
+        self.coluna_chave = coluna_chave
+
+    @property
+    def campos_obrigatorios(self) -> List[str]:
+        return [nome for nome, campo in self.schema.model_fields.items() if campo.is_required()]
+
+
+TIPOS_IMPORTACAO: Dict[str, TipoImportacao] = {
+    "vendas": TipoImportacao(
+        Venda, "Venda", _linhas_venda, _apos_vendas,
+        on_conflict="chave_importacao", resolucao="ignore-duplicates", coluna_chave="chave_importacao",
+    ),
+    "clientes": TipoImportacao(
+        ClienteCreate, "Cliente", _linhas_cliente, _apos_clientes,
+        on_conflict="name", resolucao="ignore-duplicates",
+    ),
+    "estoque": TipoImportacao(
+        AtualizarEstoqueRequest, "Estoque", _linhas_estoque, _apos_estoque,
+        on_conflict="categoria", resolucao="merge-duplicates",
+    ),
+}
+
+
+class Importador:
+    """Acumula linhas validadas e as grava em lotes, registrando os erros por linha."""
+
+    def __init__(self, tipo: str, lote: Optional[int] = None, validar_apenas: bool = False):
+        if tipo not in TIPOS_IMPORTACAO:
+            raise ValueError(f"Tipo de importação inválido: '{tipo}'. Use um de: {', '.join(TIPOS_IMPORTACAO)}")
+        self.nome_tipo = tipo
+        self.tipo = TIPOS_IMPORTACAO[tipo]
+        self.lote = lote or IMPORTACAO_LOTE
+        self.validar_apenas = validar_apenas
+        self.total_linhas = 0
+        self.importadas = 0
+        self.rejeitadas = 0
+        self.duplicadas = 0
+        self.erros: List[Dict[str, Any]] = []
+        self._pendentes: List[Tuple[int, BaseModel]] = []
+        # Resumo do conteúdo -> quantas linhas idênticas já apareceram no arquivo
+        self._ocorrencias: Dict[str, int] = {}
+
+    def _erro(self, linha: int, mensagens: List[str]) -> None:
+        self.rejeitadas += 1
+        if len(self.erros) < IMPORTACAO_MAX_ERROS:
+            self.erros.append({"linha": linha, "erros": mensagens})
+
+    def adicionar(self, numero_linha: int, valores: Dict[str, Any]) -> None:
+        """Valida uma linha do CSV; campos vazios contam como ausentes."""
+        self.total_linhas += 1
+        dados = {campo: valor for campo, valor in valores.items() if campo and valor not in ("", None)}
+        try:
+            modelo = self.tipo.validador.validate_python(dados)
+        except ValidationError as e:
+            self._erro(numero_linha, [
+                f"{'.'.join(str(p) for p in erro['loc']) or 'linha'}: {erro['msg']}" for erro in e.errors()
+            ])
+            return
+        self._pendentes.append((numero_linha, modelo))
+        if len(self._pendentes) >= self.lote:
+            self.gravar_pendentes()
+
+    def _chave(self, modelo: BaseModel) -> str:
+        """Chave estável da linha: resumo dos valores do CSV mais a ordem entre linhas idênticas."""
+        conteudo = json.dumps(modelo.model_dump(mode="json"), sort_keys=True)
+        resumo = hashlib.sha256(conteudo.encode()).hexdigest()
+        ocorrencia = self._ocorrencias.get(resumo, 0)
+        self._ocorrencias[resumo] = ocorrencia + 1
+        return f"{resumo}:{ocorrencia}"
+
+    def _contar_gravadas(self, enviadas: List[Dict[str, Any]], gravadas: List[Dict[str, Any]]) -> None:
+        if self.tipo.resolucao == "ignore-duplicates":
+            self.importadas += len(gravadas)
+            self.duplicadas += len(enviadas) - len(gravadas)
+        else:
+            self.importadas += len(enviadas)
+
+    def _enviar(self, linhas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Com várias linhas, o PostgREST exige as mesmas colunas em todas ('columns')
+        consulta = Consulta(self.tipo.tabela).colunas(linhas).retorno("representation")
+        if self.tipo.on_conflict:
+            consulta.upsert(*self.tipo.on_conflict.split(","), resolucao=self.tipo.resolucao)
+        response = resiliencia.executar(
+            consulta.url, requests.post, headers=consulta.headers(_get_headers()), params=consulta.params(),
+            json=linhas, timeout=60.0
+        )
+        response.raise_for_status()
+        return response.json() if response.content else []
+
+    def gravar_pendentes(self) -> None:
+        """
+        Grava o lote pendente em uma requisição. Se o Supabase recusar o lote
+        (4xx), as linhas são reenviadas uma a uma para apontar quais falharam.
+
+        Raises:
+            requests.exceptions.RequestException: Em falhas de comunicação ou erros 5xx.
+        """
+        pendentes, self._pendentes = self._pendentes, []
+        if not pendentes:
+            return
+        if self.validar_apenas:
+            self.importadas += len(pendentes)
+            return
+
+        numeros = [numero for numero, _ in pendentes]
+        # A chave sai dos valores do CSV, antes de o conversor completar campos (ex.: preço vigente)
+        chaves = [self._chave(modelo) for _, modelo in pendentes] if self.tipo.coluna_chave else None
+        linhas = self.tipo.converter([modelo for _, modelo in pendentes])
+        if chaves:
+            for linha, chave in zip(linhas, chaves):
+                linha[self.tipo.coluna_chave] = chave
+        try:
+            gravadas = self._enviar(linhas)
+            self.tipo.apos_gravar(linhas, gravadas)
+            self._contar_gravadas(linhas, gravadas)
+            return
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code >= 500:
+                raise
+            if len(linhas) == 1:
+                self._erro(numeros[0], [f"Supabase: {e.response.text}"])
+                return
+
+        # O lote foi recusado: reenvia linha a linha para isolar as inválidas
+        for numero, linha in zip(numeros, linhas):
+            try:
+                gravadas = self._enviar([linha])
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code >= 500:
+                    raise
+                self._erro(numero, [f"Supabase: {e.response.text}"])
+                continue
+            self.tipo.apos_gravar([linha], gravadas)
+            self._contar_gravadas([linha], gravadas)
+
+    def resultado(self) -> Dict[str, Any]:
+        return {
+            "tipo": self.nome_tipo,
+            "validar_apenas": self.validar_apenas,
+            "total_linhas": self.total_linhas,
+            "importadas": self.importadas,
+            "rejeitadas": self.rejeitadas,
+            "duplicadas": self.duplicadas,
+            "erros": self.erros,
+            "erros_omitidos": self.rejeitadas - len(self.erros),
+        }
+
+
+def importar_csv(tipo: str, arquivo: TextIO, lote: Optional[int] = None, validar_apenas: bool = False) -> Dict[str, Any]:
+    """
+    Importa um CSV (com cabeçalho) lido de 'arquivo', sem carregá-lo inteiro em memória.
+
+    Raises:
+        ValueError: Se o tipo for desconhecido ou faltarem colunas obrigatórias no cabeçalho.
+        requests.exceptions.RequestException: Se a comunicação com o Supabase falhar.
+    """
+    importador = Importador(tipo, lote=lote, validar_apenas=validar_apenas)
+    leitor = csv.DictReader(arquivo)
+    cabecalho = [c.strip() for c in (leitor.fieldnames or [])]
+    leitor.fieldnames = cabecalho
+    faltando = [c for c in importador.tipo.campos_obrigatorios if c not in cabecalho]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no cabeçalho do CSV: {', '.join(faltando)}")
+
+    for valores in leitor:
+        importador.adicionar(leitor.line_num, valores)
+    importador.gravar_pendentes()
+    return importador.resultado()
@@ -0,0 +1,101 @@
+# Diferença de snapshots do tracemalloc, para achar crescimento de memória
+"""
+O tracemalloc custa memória e CPU enquanto está ligado, então ele só é
+ligado no primeiro snapshot pedido pela rota de admin e desligado por ela.
+O fluxo é: tirar um snapshot de base, deixar o worker trabalhar e pedir a
+diferença, que lista os pontos de alocação que mais cresceram desde a base.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Quadros de pilha guardados por alocação (mais quadros = mais custo)
+MEMORIA_QUADROS = int(os.environ.get("MEMORIA_QUADROS", "10"))
+
+AGRUPAMENTOS = ("lineno", "filename", "traceback")
+
+_FILTROS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class RastreadorMemoria:
+    """Guarda o snapshot de base e calcula as diferenças em relação a ele."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base: Optional[tracemalloc.Snapshot] = None
+        self._base_em: Optional[float] = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_FILTROS)
+
+    def tirar_base(self) -> Dict[str, Any]:
+        """Liga o tracemalloc (se preciso) e guarda um snapshot de base."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORIA_QUADROS)
+            self._base = self._snapshot()
+            self._base_em = time.time()
+            return self.estado()
+
+    def diferenca(self, limite: int = 20, agrupar: str = "lineno",
+                  atualizar_base: bool = False) -> Dict[str, Any]:
+        """
+        Compara um snapshot novo com a base.
+
+        Raises:
+            ValueError: Se não houver base ou o agrupamento for inválido.
+        """
+        if agrupar not in AGRUPAMENTOS:
+            raise ValueError(f"Agrupamento inválido: '{agrupar}'. Use um de: {', '.join(AGRUPAMENTOS)}")
+        with self._lock:
+            if self._base is None or not tracemalloc.is_tracing():
+                raise ValueError("Tire um snapshot de base antes de pedir a diferença.")
+            atual = self._snapshot()
+            estatisticas = atual.compare_to(self._base, agrupar)
+            base_em = self._base_em
+            if atualizar_base:
+                self._base, self._base_em = atual, time.time()
+
+        itens: List[Dict[str, Any]] = []
+        for estatistica in estatisticas[:limite]:
+            itens.append({
+                "local": [f"{quadro.filename}:{quadro.lineno}" for quadro in estatistica.traceback],
+                "diferenca_bytes": estatistica.size_diff,
+                "total_bytes": estatistica.size,
+                "diferenca_blocos": estatistica.count_diff,
+                "total_blocos": estatistica.count,
+            })
+        return {
+            "base_em": base_em,
+            "segundos_desde_a_base": round(time.time() - base_em, 1),
+            "diferenca_total_bytes": sum(e.size_diff for e in estatisticas),
+            "itens": itens,
+        }
+
+    def parar(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._base = None
+            self._base_em = None
+
+    def estado(self) -> Dict[str, Any]:
+        atual, pico = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "rastreando": tracemalloc.is_tracing(),
+            "base_em": self._base_em,
+            "memoria_rastreada_bytes": atual,
+            "pico_bytes": pico,
+        }
+
+
+rastreador_memoria = RastreadorMemoria()
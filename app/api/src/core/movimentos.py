@@ -0,0 +1,282 @@
+# Livro de movimentos de estoque (append-only) com snapshots periódicos
+"""
+O estoque de uma categoria é o último snapshot mais a soma dos movimentos
+registrados depois dele. Vendas, reposições e ajustes viram INSERTs em
+'MovimentoEstoque', que não disputam a mesma linha como o UPSERT em 'Estoque'.
+
+Tabelas esperadas no Supabase:
+
+    create table "MovimentoEstoque" (
+        id bigint generated by default as identity primary key,
+        created_at timestamptz not null default now(),
+        categoria text not null,
+        tipo text not null,            -- 'venda' | 'reposicao' | 'ajuste'
+        quantidade bigint not null,    -- delta (negativo para saídas)
+        observacao text
+    );
+    create index on "MovimentoEstoque" (categoria, id);
+
+    create table "SnapshotEstoque" (
+        id bigint generated by default as identity primary key,
+        created_at timestamptz not null default now(),
+        categoria text not null,
+        quantidade bigint not null,
+        ultimo_movimento_id bigint not null
+    );
+    create unique index on "SnapshotEstoque" (categoria, ultimo_movimento_id desc);
+
+O livro só vale com ESTOQUE_MODO=movimentos. No primeiro uso de uma categoria
+(sem snapshot), a quantidade atual do 'Estoque' vira um snapshot com
+ultimo_movimento_id 0, para o saldo partir do estoque que já existia e não de
+zero. O índice único faz requisições simultâneas gravarem uma só semente. Para
+semear todas as categorias de uma vez ao trocar de modo:
+
+    insert into "SnapshotEstoque" (categoria, quantidade, ultimo_movimento_id)
+    select categoria, coalesce(quantidade, 0), 0 from "Estoque"
+    on conflict do nothing;
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core import unidade_trabalho
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.registro import obter_logger
+from app.api.src.core.resiliencia import resiliencia
+
+load_dotenv()
+logger = obter_logger("movimentos")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Intervalo da compactação em segundos; 0 desliga a tarefa de fundo
+MOVIMENTOS_COMPACTACAO_INTERVALO = float(os.environ.get("MOVIMENTOS_COMPACTACAO_INTERVALO", "0"))
+# Só movimentos mais antigos que isto entram no snapshot. Ids são atribuídos no
+# INSERT mas confirmados em outra ordem; a margem evita pular um movimento
+# com id menor que ainda não estava visível.
+MOVIMENTOS_MARGEM_SEGUNDOS = float(os.environ.get("MOVIMENTOS_MARGEM_SEGUNDOS", "60"))
+# "upsert" (padrão): a linha do 'Estoque' é sobrescrita a cada escrita.
+# "movimentos": as escritas viram INSERTs no livro, que passa a ser a fonte do saldo.
+ESTOQUE_MODO = os.environ.get("ESTOQUE_MODO", "upsert")
+
+TABELA_MOVIMENTOS = "MovimentoEstoque"
+TABELA_SNAPSHOTS = "SnapshotEstoque"
+TIPOS_MOVIMENTO = ("venda", "reposicao", "ajuste")
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Prefer": "return=representation",
+    }
+
+
+def ativo() -> bool:
+    """Indica se o livro é a fonte da verdade do estoque (ESTOQUE_MODO=movimentos)."""
+    return ESTOQUE_MODO == "movimentos"
+
+
+def registrar_movimento(categoria: str, tipo: str, quantidade: int, observacao: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Insere um movimento no livro e retorna a linha gravada (com id e
+    created_at). Dentro de uma unidade de trabalho, as escritas pendentes são
+    enviadas antes e o INSERT vai na hora, não ao final da requisição.
+
+    Raises:
+        ValueError: Se o tipo for desconhecido.
+        requests.exceptions.RequestException: Se a requisição ao Supabase falhar.
+    """
+    if tipo not in TIPOS_MOVIMENTO:
+        raise ValueError(f"Tipo de movimento inválido: '{tipo}'. Use um de: {', '.join(TIPOS_MOVIMENTO)}")
+
+    payload = {
+        "categoria": categoria,
+        "tipo": tipo,
+        "quantidade": quantidade,
+        "observacao": observacao,
+    }
+    url = Consulta(TABELA_MOVIMENTOS).url
+    response = unidade_trabalho.post(url, headers=_get_headers(), json=payload, timeout=15.0, imediato=True)
+    response.raise_for_status()
+    return response.json()[0]
+
+
+def ultimo_snapshot(categoria: str) -> Dict[str, Any]:
+    """
+    Retorna o snapshot mais recente da categoria. Sem nenhum, semeia um com a
+    quantidade atual do 'Estoque' (ou zerado, se a categoria não existir).
+    """
+    consulta = (
+        Consulta(TABELA_SNAPSHOTS)
+        .select("quantidade", "ultimo_movimento_id")
+        .eq("categoria", categoria)
+        .order("ultimo_movimento_id", desc=True)
+        .limit(1)
+    )
+    response = unidade_trabalho.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    data = response.json()
+    return data[0] if data else _semear_snapshot(categoria, consulta)
+
+
+def _semear_snapshot(categoria: str, consulta_snapshot: Consulta) -> Dict[str, Any]:
+    """
+    Grava o snapshot inicial da categoria (ultimo_movimento_id 0) com a
+    quantidade do 'Estoque', para os movimentos somarem ao estoque existente.
+    """
+    consulta = Consulta("Estoque").select("quantidade").eq("categoria", categoria)
+    response = unidade_trabalho.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    data = response.json()
+    if not data:
+        return {"quantidade": 0, "ultimo_movimento_id": 0}
+
+    semente = {"categoria": categoria, "quantidade": data[0]["quantidade"] or 0, "ultimo_movimento_id": 0}
+    consulta = Consulta(TABELA_SNAPSHOTS).upsert("categoria", "ultimo_movimento_id", resolucao="ignore-duplicates")
+    response = unidade_trabalho.post(
+        consulta.url_completa(), headers=consulta.headers(_get_headers()), json=semente, timeout=15.0, imediato=True
+    )
+    response.raise_for_status()
+    if response.json():
+        return {"quantidade": semente["quantidade"], "ultimo_movimento_id": 0}
+
+    # Outra requisição semeou antes: vale a semente dela
+    response = unidade_trabalho.get(
+        consulta_snapshot.url, headers=_get_headers(), params=consulta_snapshot.params(), timeout=15.0
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data[0] if data else {"quantidade": semente["quantidade"], "ultimo_movimento_id": 0}
+
+
+def movimentos_desde(categoria: str, ultimo_movimento_id: int, limite: Optional[int] = None,
+                     ate: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Lista os movimentos da categoria com id maior que 'ultimo_movimento_id', em ordem."""
+    consulta = (
+        Consulta(TABELA_MOVIMENTOS)
+        .select("*")
+        .eq("categoria", categoria)
+        .gt("id", ultimo_movimento_id)
+        .entre("created_at", fim=ate)
+        .order("id")
+    )
+    if limite is not None:
+        consulta.limit(limite)
+    response = unidade_trabalho.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    return response.json()
+
+
+def saldo(categoria: str) -> Dict[str, Any]:
+    """
+    Calcula o estoque atual: último snapshot + movimentos posteriores a ele.
+    """
+    snapshot = ultimo_snapshot(categoria)
+    movimentos = movimentos_desde(categoria, snapshot["ultimo_movimento_id"])
+    return {
+        "categoria": categoria,
+        "quantidade": snapshot["quantidade"] + sum(m["quantidade"] for m in movimentos),
+        "snapshot": snapshot,
+        "movimentos_pendentes": len(movimentos),
+    }
+
+
+def _categorias_estoque() -> List[str]:
+    consulta = Consulta("Estoque").select("categoria")
+    response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    return [linha["categoria"] for linha in response.json()]
+
+
+def compactar(categoria: str) -> Optional[Dict[str, Any]]:
+    """
+    Grava um novo snapshot da categoria somando os movimentos mais antigos que
+    a margem de segurança e, com ESTOQUE_MODO=movimentos, atualiza a
+    quantidade no 'Estoque'. Retorna o snapshot criado, ou None se não havia
+    movimentos a compactar.
+    """
+    snapshot = ultimo_snapshot(categoria)
+    limite_tempo = datetime.now(timezone.utc) - timedelta(seconds=MOVIMENTOS_MARGEM_SEGUNDOS)
+    movimentos = movimentos_desde(categoria, snapshot["ultimo_movimento_id"], ate=limite_tempo)
+    if not movimentos:
+        return None
+
+    novo = {
+        "categoria": categoria,
+        "quantidade": snapshot["quantidade"] + sum(m["quantidade"] for m in movimentos),
+        "ultimo_movimento_id": movimentos[-1]["id"],
+    }
+    consulta = Consulta(TABELA_SNAPSHOTS).upsert("categoria", "ultimo_movimento_id", resolucao="ignore-duplicates")
+    response = resiliencia.executar(
+        consulta.url, requests.post, headers=consulta.headers(_get_headers()), params=consulta.params(),
+        json=novo, timeout=15.0
+    )
+    response.raise_for_status()
+
+    if not ativo():
+        # No modo upsert a linha do 'Estoque' é a fonte da verdade: o livro não a sobrescreve
+        return novo
+
+    # Mantém a coluna 'quantidade' do 'Estoque' próxima do saldo (defasagem de até um intervalo)
+    atual = saldo(categoria)["quantidade"]
+    consulta = Consulta("Estoque").eq("categoria", categoria)
+    response = resiliencia.executar(
+        consulta.url, requests.patch, headers=_get_headers(), params=consulta.params(),
+        json={"quantidade": atual}, timeout=15.0
+    )
+    response.raise_for_status()
+    consumidor.aplicar(Mudanca(tabela="Estoque", tipo="UPDATE", registro={"categoria": categoria, "quantidade": atual}))
+    return novo
+
+
+def compactar_todas() -> int:
+    """Compacta todas as categorias do estoque. Retorna quantos snapshots foram criados."""
+    criados = 0
+    for categoria in _categorias_estoque():
+        if compactar(categoria) is not None:
+            criados += 1
+    return criados
+
+
+class CompactadorMovimentos:
+    """Executa 'compactar_todas' periodicamente em uma thread de fundo."""
+
+    def __init__(self):
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _loop(self, intervalo: float) -> None:
+        while not self._parar.wait(intervalo):
+            try:
+                compactar_todas()
+            except Exception as e:
+                logger.warning("Falha na compactação dos movimentos de estoque: %s", e)
+
+    def iniciar(self, intervalo: float = MOVIMENTOS_COMPACTACAO_INTERVALO) -> None:
+        if intervalo <= 0 or self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(intervalo,), name="compactar-movimentos", daemon=True
+        )
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+
+compactador = CompactadorMovimentos()
@@ -0,0 +1,211 @@
+# Consumidor de mudanças (change feed) para manter os caches coerentes
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core.eventos import barramento
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.registro import obter_logger
+
+load_dotenv()
+logger = obter_logger("mudancas")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Intervalo do polling em segundos; 0 desliga o polling
+MUDANCAS_POLLING_INTERVALO = float(os.environ.get("MUDANCAS_POLLING_INTERVALO", "0"))
+# Coluna usada como marca d'água. Com 'created_at' só inserções são vistas;
+# use 'updated_at' (mantida por trigger) para enxergar também as edições.
+MUDANCAS_COLUNA_WATERMARK = os.environ.get("MUDANCAS_COLUNA_WATERMARK", "created_at")
+MUDANCAS_LOTE = int(os.environ.get("MUDANCAS_LOTE", "1000"))
+# Segredo do Database Webhook do Supabase (routes/mudancas.py); sem ele o webhook fica desligado
+MUDANCAS_WEBHOOK_SEGREDO = os.environ.get("MUDANCAS_WEBHOOK_SEGREDO")
+# Ponto de partida quando a tabela ainda está vazia
+WATERMARK_INICIAL = "1970-01-01T00:00:00+00:00"
+
+# TTL (s) dos caches mantidos pelo consumidor quando nenhuma fonte entrega as edições
+CACHE_TTL_SEM_MUDANCAS = 10.0
+# ... e quando alguma entrega: as mudanças chegam antes do TTL
+CACHE_TTL_COM_MUDANCAS = 300.0
+
+TIPOS_MUDANCA = {"INSERT", "UPDATE", "DELETE"}
+# Tabelas cujas mudanças externas também viram eventos no stream SSE
+TIPO_EVENTO_POR_TABELA = {"Estoque": "estoque", "Cobranca": "cobranca"}
+
+
+def edicoes_chegam() -> bool:
+    """
+    True se alguma fonte de mudanças entrega as edições (UPDATE) de linhas:
+    o webhook configurado ou o polling ligado com uma marca d'água que muda
+    na edição (ex.: 'updated_at' mantida por trigger). O polling por
+    'created_at' só vê inserções.
+    """
+    if MUDANCAS_WEBHOOK_SEGREDO:
+        return True
+    return MUDANCAS_POLLING_INTERVALO > 0 and MUDANCAS_COLUNA_WATERMARK != "created_at"
+
+
+def cache_ttl_padrao() -> float:
+    """
+    TTL padrão dos caches mantidos pelo consumidor: longo só quando as
+    edições chegam por alguma fonte; senão curto, para que uma edição feita
+    direto no banco (ex.: no painel do Supabase) apareça em segundos.
+    """
+    return CACHE_TTL_COM_MUDANCAS if edicoes_chegam() else CACHE_TTL_SEM_MUDANCAS
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Accept": "application/json",
+    }
+
+
+@dataclass
+class Mudanca:
+    """Uma alteração em uma linha de uma tabela do Supabase."""
+    tabela: str
+    tipo: str
+    registro: Dict[str, Any] = field(default_factory=dict)
+    antigo: Dict[str, Any] = field(default_factory=dict)
+
+
+def mudanca_de_payload(payload: Dict[str, Any]) -> Mudanca:
+    """
+    Converte o payload de um Database Webhook do Supabase
+    ({"type", "table", "record", "old_record"}) ou de uma mensagem do Realtime
+    ({"eventType", "table", "new", "old"}) em uma Mudanca.
+    """
+    tipo = (payload.get("type") or payload.get("eventType") or "").upper()
+    tabela = payload.get("table")
+    if tipo not in TIPOS_MUDANCA or not tabela:
+        raise ValueError("Payload de mudança inválido: 'type' e 'table' são obrigatórios.")
+
+    registro = payload.get("record", payload.get("new")) or {}
+    antigo = payload.get("old_record", payload.get("old")) or {}
+    return Mudanca(tabela=tabela, tipo=tipo, registro=registro, antigo=antigo)
+
+
+class ConsumidorMudancas:
+    """
+    Distribui mudanças de linhas para os caches interessados em cada tabela.
+
+    As mudanças chegam por três caminhos:
+    - escritas feitas pela própria API (chamadas diretas a 'aplicar');
+    - o webhook '/mudancas/webhook', ligado a um Database Webhook do Supabase;
+    - o polling por marca d'água, para quando o webhook não estiver disponível
+      (ou quando houver vários workers, já que o webhook chega a apenas um).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinantes: Dict[str, List[Callable[[Mudanca], None]]] = {}
+        self._watermarks: Dict[str, Optional[str]] = {}
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def registrar(self, tabela: str, callback: Callable[[Mudanca], None]) -> None:
+        """Registra uma função chamada a cada mudança na tabela."""
+        with self._lock:
+            self._assinantes.setdefault(tabela, []).append(callback)
+
+    def aplicar(self, mudanca: Mudanca, externa: bool = False) -> None:
+        """
+        Entrega a mudança aos caches registrados para a tabela.
+
+        Mudanças externas (feitas fora da API, ex.: pelo painel do Supabase)
+        também são publicadas no stream de eventos.
+        """
+        with self._lock:
+            callbacks = list(self._assinantes.get(mudanca.tabela, []))
+        for callback in callbacks:
+            try:
+                callback(mudanca)
+            except Exception as e:
+                logger.warning("Falha ao aplicar mudança em '%s': %s", mudanca.tabela, e)
+
+        tipo_evento = TIPO_EVENTO_POR_TABELA.get(mudanca.tabela)
+        if externa and tipo_evento:
+            barramento.publicar(tipo_evento, {
+                "acao": mudanca.tipo.lower(),
+                "registro": mudanca.registro or mudanca.antigo,
+                "origem": "externa",
+            })
+
+    # --- Polling por marca d'água ---
+
+    def _buscar_desde(self, tabela: str, watermark: Optional[str]) -> List[Dict[str, Any]]:
+        coluna = MUDANCAS_COLUNA_WATERMARK
+        if watermark is None:
+            # Primeira passada: só descobre o ponto de partida, sem reprocessar a tabela
+            consulta = Consulta(tabela).select(coluna).order(coluna, desc=True).limit(1)
+        else:
+            consulta = Consulta(tabela).select("*").gt(coluna, watermark).order(coluna).limit(MUDANCAS_LOTE)
+        response = requests.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+        response.raise_for_status()
+        return response.json()
+
+    def sincronizar(self) -> int:
+        """
+        Executa uma passada de polling em todas as tabelas registradas.
+
+        Retorna quantas mudanças foram aplicadas.
+        """
+        coluna = MUDANCAS_COLUNA_WATERMARK
+        tipo = "INSERT" if coluna == "created_at" else "UPDATE"
+        with self._lock:
+            tabelas = list(self._assinantes)
+
+        aplicadas = 0
+        for tabela in tabelas:
+            watermark = self._watermarks.get(tabela)
+            linhas = self._buscar_desde(tabela, watermark)
+            if watermark is None:
+                self._watermarks[tabela] = (linhas[0].get(coluna) if linhas else None) or WATERMARK_INICIAL
+                continue
+            for linha in linhas:
+                self.aplicar(Mudanca(tabela=tabela, tipo=tipo, registro=linha), externa=True)
+                aplicadas += 1
+            if linhas:
+                self._watermarks[tabela] = linhas[-1].get(coluna) or watermark
+        return aplicadas
+
+    def _loop_polling(self, intervalo: float) -> None:
+        while not self._parar.wait(intervalo):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                logger.warning("Falha no polling de mudanças: %s", e)
+
+    def iniciar_polling(self, intervalo: float = MUDANCAS_POLLING_INTERVALO) -> None:
+        """Inicia o polling em uma thread de fundo (se 'intervalo' > 0)."""
+        if intervalo <= 0 or self._thread is not None:
+            return
+        if MUDANCAS_COLUNA_WATERMARK == "created_at":
+            logger.warning(
+                "Polling de mudanças por 'created_at': só inserções são vistas. Para ver as edições, "
+                "crie uma coluna 'updated_at' mantida por trigger e use MUDANCAS_COLUNA_WATERMARK=updated_at."
+            )
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop_polling, args=(intervalo,), name="polling-mudancas", daemon=True
+        )
+        self._thread.start()
+
+    def parar_polling(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+
+# Instância única compartilhada pelas rotas
+consumidor = ConsumidorMudancas()
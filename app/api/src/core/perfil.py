@@ -0,0 +1,254 @@
+# Profiler por amostragem, com as amostras agrupadas por rota
+"""
+Uma thread tira, a cada PERFIL_INTERVALO_MS, a pilha de todas as threads
+('sys._current_frames') e atribui cada pilha à rota cuja função está nela
+(o middleware aprende a função de cada rota pelo scope do ASGI).
+Assim dá para ver, por rota, quanto do tempo vai para o parse do JSON, a
+validação do Pydantic ou a espera pela rede (as threads paradas em
+'resiliencia.get' ou no socket).
+
+A amostragem só roda enquanto há algo a medir:
+- uma fração PERFIL_AMOSTRAGEM das requisições (0 = nenhuma), ou as que
+  trazem 'X-Perfil: 1' com um 'X-Admin-Token' válido;
+- uma sessão sob demanda, aberta pela rota de admin por alguns segundos.
+
+Enquanto a amostragem roda, as outras requisições em andamento também são
+amostradas. Pilhas sem função de rota (ex.: a validação da resposta, que o
+FastAPI faz noutra chamada ao threadpool) entram como "(fastapi: <função>)".
+A saída é o formato de pilhas colapsadas (flamegraph.pl) ou o JSON do
+speedscope (https://www.speedscope.app).
+"""
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.api.src.core.admin import token_valido
+
+load_dotenv()
+# Fração das requisições que liga a amostragem (0 a 1)
+PERFIL_AMOSTRAGEM = float(os.environ.get("PERFIL_AMOSTRAGEM", "0"))
+# Intervalo entre amostras (ms)
+PERFIL_INTERVALO_MS = float(os.environ.get("PERFIL_INTERVALO_MS", "5"))
+# Máximo de pilhas distintas guardadas (as novas além disso são descartadas)
+PERFIL_MAX_PILHAS = int(os.environ.get("PERFIL_MAX_PILHAS", "20000"))
+PREFIXO_API = "/api/v1"
+
+Pilha = Tuple[CodeType, ...]
+
+
+def _nome_frame(codigo: CodeType) -> str:
+    arquivo = codigo.co_filename
+    for marcador in ("/site-packages/", "/app/"):
+        if marcador in arquivo:
+            arquivo = arquivo.split(marcador, 1)[1]
+            break
+    return f"{codigo.co_name} ({arquivo}:{codigo.co_firstlineno})"
+
+
+class Amostrador:
+    """Thread de amostragem e as pilhas contadas por rota."""
+
+    def __init__(self, intervalo: float = PERFIL_INTERVALO_MS / 1000):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        # Pilhas brutas; a rota de cada uma é resolvida na leitura, pois o nome
+        # da rota só é conhecido quando a primeira requisição dela termina
+        self._pilhas: Counter = Counter()
+        self._rotas_por_codigo: Dict[CodeType, str] = {}
+        self._ativos = 0
+        self._sessao_ate = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.amostras = 0
+
+    # --- Rotas ---
+
+    def aprender_rota(self, endpoint, rota: str) -> None:
+        """Associa o código da função de rota ao nome da rota (vindo do scope do ASGI)."""
+        codigo = getattr(inspect.unwrap(endpoint), "__code__", None)
+        if codigo is not None and codigo not in self._rotas_por_codigo:
+            with self._lock:
+                self._rotas_por_codigo[codigo] = rota
+
+    # --- Liga/desliga ---
+
+    def _precisa_rodar(self) -> bool:
+        return self._ativos > 0 or time.monotonic() < self._sessao_ate
+
+    def _garantir_thread(self) -> None:
+        """Inicia a thread de amostragem se ela não estiver rodando (com o lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="perfil-amostrador", daemon=True)
+            self._thread.start()
+
+    def entrar(self) -> None:
+        with self._lock:
+            self._ativos += 1
+            self._garantir_thread()
+
+    def sair(self) -> None:
+        with self._lock:
+            self._ativos -= 1
+
+    def iniciar_sessao(self, segundos: float) -> None:
+        """Amostra todas as requisições pelos próximos 'segundos'."""
+        with self._lock:
+            self._sessao_ate = max(self._sessao_ate, time.monotonic() + segundos)
+            self._garantir_thread()
+
+    def sessao_restante(self) -> float:
+        return max(0.0, self._sessao_ate - time.monotonic())
+
+    # --- Amostragem ---
+
+    def _loop(self) -> None:
+        propria = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._precisa_rodar():
+                    self._thread = None
+                    return
+            self._amostrar(propria)
+            time.sleep(self.intervalo)
+
+    def _rota_da_pilha(self, pilha: Pilha) -> Optional[str]:
+        for codigo in reversed(pilha):
+            rota = self._rotas_por_codigo.get(codigo)
+            if rota is not None:
+                return rota
+        # Sem função de rota: trabalho do FastAPI (ex.: validação da resposta)
+        for codigo in reversed(pilha):
+            if "/fastapi/" in codigo.co_filename:
+                return f"(fastapi: {codigo.co_name})"
+        return None
+
+    def _amostrar(self, propria: int) -> None:
+        frames = sys._current_frames()
+        amostras = []
+        for ident, frame in frames.items():
+            if ident == propria:
+                continue
+            pilha = []
+            relevante = False
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(codigo)
+                # Só interessam threads rodando código da API ou do FastAPI
+                relevante = relevante or "/app/api/" in codigo.co_filename or "/fastapi/" in codigo.co_filename
+                frame = frame.f_back
+            if relevante:
+                pilha.reverse()
+                amostras.append(tuple(pilha))
+        with self._lock:
+            self.amostras += 1
+            for pilha in amostras:
+                if pilha in self._pilhas or len(self._pilhas) < PERFIL_MAX_PILHAS:
+                    self._pilhas[pilha] += 1
+
+    def _por_rota(self) -> Dict[str, Dict[Pilha, int]]:
+        with self._lock:
+            pilhas = dict(self._pilhas)
+        por_rota: Dict[str, Dict[Pilha, int]] = {}
+        for pilha, contagem in pilhas.items():
+            rota = self._rota_da_pilha(pilha)
+            if rota is not None:
+                por_rota.setdefault(rota, {})[pilha] = contagem
+        return por_rota
+
+    def resumo(self) -> List[Dict[str, Any]]:
+        pilhas = self._por_rota()
+        ms = self.intervalo * 1000
+        resumo = [
+            {"rota": rota, "amostras": sum(contagem.values()), "tempo_amostrado_ms": round(sum(contagem.values()) * ms, 1)}
+            for rota, contagem in pilhas.items()
+        ]
+        return sorted(resumo, key=lambda r: -r["amostras"])
+
+    def _pilhas_da_rota(self, rota: str) -> Dict[Pilha, int]:
+        return self._por_rota().get(rota, {})
+
+    def colapsado(self, rota: str) -> str:
+        """Pilhas no formato 'f1;f2;f3 contagem' (flamegraph.pl, speedscope, inferno)."""
+        linhas = [
+            ";".join(_nome_frame(c) for c in pilha) + f" {contagem}"
+            for pilha, contagem in self._pilhas_da_rota(rota).items()
+        ]
+        return "\n".join(sorted(linhas)) + "\n"
+
+    def speedscope(self, rota: str) -> Dict[str, Any]:
+        """Perfil no formato de arquivo do speedscope (tipo 'sampled')."""
+        frames: List[Dict[str, Any]] = []
+        indices: Dict[CodeType, int] = {}
+        amostras, pesos = [], []
+        ms = self.intervalo * 1000
+        for pilha, contagem in self._pilhas_da_rota(rota).items():
+            caminho = []
+            for codigo in pilha:
+                indice = indices.get(codigo)
+                if indice is None:
+                    indice = indices[codigo] = len(frames)
+                    frames.append({"name": codigo.co_name, "file": codigo.co_filename, "line": codigo.co_firstlineno})
+                caminho.append(indice)
+            amostras.append(caminho)
+            pesos.append(round(contagem * ms, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": rota,
+            "exporter": "bonobrownie",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": rota,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(pesos), 3),
+                "samples": amostras,
+                "weights": pesos,
+            }],
+        }
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._pilhas.clear()
+            self.amostras = 0
+
+
+class MiddlewarePerfil:
+    """Liga a amostragem durante uma fração das requisições (ou quando pedido)."""
+
+    def __init__(self, app, amostrador: Optional[Amostrador] = None):
+        self.app = app
+        self.amostrador = amostrador or amostrador_perfil
+
+    @staticmethod
+    def _pedido_explicito(headers) -> bool:
+        valores = {nome.decode("latin-1").lower(): valor.decode("latin-1") for nome, valor in headers}
+        return valores.get("x-perfil") == "1" and token_valido(valores.get("x-admin-token"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PREFIXO_API + "/"):
+            await self.app(scope, receive, send)
+            return
+        amostrar = (PERFIL_AMOSTRAGEM > 0 and random.random() < PERFIL_AMOSTRAGEM) \
+            or self._pedido_explicito(scope.get("headers", []))
+        if amostrar:
+            self.amostrador.entrar()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if amostrar:
+                self.amostrador.sair()
+            # O roteamento deixa no scope a função e o caminho da rota atendida
+            endpoint, rota = scope.get("endpoint"), scope.get("route")
+            if endpoint is not None and rota is not None:
+                self.amostrador.aprender_rota(endpoint, f"{scope['method']} {scope.get('root_path', '')}{rota.path}")
+
+
+amostrador_perfil = Amostrador()
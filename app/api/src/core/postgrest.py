@@ -0,0 +1,312 @@
+# Montagem tipada das consultas ao PostgREST (filtros, ordenação, paginação e Prefer)
+"""
+Em vez de concatenar strings ('?categoria=eq.{categoria}') ou montar
+dicionários de params à mão, as rotas descrevem a consulta:
+
+    consulta = (
+        Consulta("Cobranca")
+        .select("cliente", "valor", "vencimento")
+        .eq("status_pagamento", False)
+        .entre("vencimento", inicio, fim)
+        .order("vencimento")
+        .limit(100)
+    )
+    response = resiliencia.get(consulta.url, params=consulta.params(),
+                               headers=consulta.headers(_get_headers()), timeout=15.0)
+
+- Os params saem como lista de pares, então dois filtros na mesma coluna
+  (ex.: 'gte' e 'lt' de um intervalo) chegam os dois ao PostgREST; com um
+  dicionário o segundo apagava o primeiro.
+- Os valores são formatados (bool -> true/false, None -> null, datas em
+  ISO 8601) e, dentro de 'in.(...)', 'or=(...)' e 'and=(...)', postos entre
+  aspas quando têm caracteres reservados. A codificação para a URL fica com
+  o 'requests'.
+- Count, return e upsert (on_conflict + resolution) viram o cabeçalho
+  'Prefer' de 'headers()'.
+"""
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+
+OPERADORES = ("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is", "in")
+CONTAGENS = ("exact", "planned", "estimated")
+RETORNOS = ("representation", "minimal", "headers-only")
+RESOLUCOES = ("merge-duplicates", "ignore-duplicates")
+
+# Caracteres com significado nas listas do PostgREST ('in', 'or', 'and')
+_RESERVADOS = re.compile(r'[,.:()"\\\s]')
+_NOME_VALIDO = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(->>?[A-Za-z0-9_]+)*$")
+
+Params = List[Tuple[str, str]]
+
+
+def formatar_valor(valor: Any) -> str:
+    """Valor de um filtro no formato do PostgREST."""
+    if valor is None:
+        return "null"
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _citar(valor: Any) -> str:
+    """Valor dentro de uma lista: entre aspas (com escape) se tiver caracteres reservados."""
+    texto = formatar_valor(valor)
+    if _RESERVADOS.search(texto) or texto == "":
+        return '"' + texto.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return texto
+
+
+def _validar_coluna(coluna: str) -> str:
+    """
+    Raises:
+        ValueError: Se o nome da coluna tiver caracteres fora do esperado.
+    """
+    if not _NOME_VALIDO.match(coluna):
+        raise ValueError(f"Nome de coluna inválido: '{coluna}'")
+    return coluna
+
+
+class Condicao:
+    """Um filtro 'coluna.operador.valor' ou um grupo 'or'/'and' de condições."""
+
+    def __init__(self, coluna: Optional[str], operador: str, valor: Any = None,
+                 condicoes: Sequence["Condicao"] = ()):
+        if operador not in OPERADORES + ("or", "and"):
+            raise ValueError(f"Operador inválido: '{operador}'")
+        self.coluna = _validar_coluna(coluna) if coluna is not None else None
+        self.operador = operador
+        self.valor = valor
+        self.condicoes = list(condicoes)
+
+    def _valor(self, dentro_de_lista: bool) -> str:
+        if self.operador == "in":
+            return "(" + ",".join(_citar(v) for v in self.valor) + ")"
+        if self.operador == "is":
+            return formatar_valor(self.valor)
+        return _citar(self.valor) if dentro_de_lista else formatar_valor(self.valor)
+
+    def _grupo(self) -> str:
+        return "(" + ",".join(c.como_item() for c in self.condicoes) + ")"
+
+    def como_item(self) -> str:
+        """Forma usada dentro de 'or=(...)'/'and=(...)'."""
+        if self.operador in ("or", "and"):
+            return f"{self.operador}{self._grupo()}"
+        return f"{self.coluna}.{self.operador}.{self._valor(dentro_de_lista=True)}"
+
+    def como_param(self) -> Tuple[str, str]:
+        """Forma usada na query string: ('coluna', 'operador.valor') ou ('or', '(...)')."""
+        if self.operador in ("or", "and"):
+            return self.operador, self._grupo()
+        return self.coluna, f"{self.operador}.{self._valor(dentro_de_lista=False)}"
+
+
+# Atalhos para montar condições de 'ou'/'e'
+def eq(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "eq", valor)
+
+
+def neq(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "neq", valor)
+
+
+def gt(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "gt", valor)
+
+
+def gte(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "gte", valor)
+
+
+def lt(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "lt", valor)
+
+
+def lte(coluna: str, valor: Any) -> Condicao:
+    return Condicao(coluna, "lte", valor)
+
+
+def em(coluna: str, valores: Iterable[Any]) -> Condicao:
+    return Condicao(coluna, "in", list(valores))
+
+
+def ou(*condicoes: Condicao) -> Condicao:
+    return Condicao(None, "or", condicoes=condicoes)
+
+
+def e(*condicoes: Condicao) -> Condicao:
+    return Condicao(None, "and", condicoes=condicoes)
+
+
+class Consulta:
+    """Consulta a uma tabela do PostgREST, montada por encadeamento."""
+
+    def __init__(self, tabela: str, base: Optional[str] = None):
+        self.tabela = tabela
+        self.base = (base or SUPABASE_URL or "").rstrip("/")
+        self._select: Optional[str] = None
+        self._condicoes: List[Condicao] = []
+        self._ordem: List[str] = []
+        self._limite: Optional[int] = None
+        self._deslocamento: Optional[int] = None
+        self._on_conflict: Optional[str] = None
+        self._colunas: Optional[str] = None
+        self._prefer: Dict[str, str] = {}
+
+    @property
+    def url(self) -> str:
+        return f"{self.base}/rest/v1/{self.tabela}"
+
+    # --- Colunas ---
+
+    def select(self, *colunas: str) -> "Consulta":
+        self._select = ",".join(colunas) if colunas else "*"
+        return self
+
+    def colunas(self, linhas: Sequence[Dict[str, Any]]) -> "Consulta":
+        """'columns' para inserção em lote: a união das chaves das linhas."""
+        if len(linhas) > 1:
+            self._colunas = ",".join(_validar_coluna(c) for c in dict.fromkeys(c for l in linhas for c in l))
+        return self
+
+    # --- Filtros ---
+
+    def onde(self, *condicoes: Condicao) -> "Consulta":
+        self._condicoes.extend(condicoes)
+        return self
+
+    def eq(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(eq(coluna, valor))
+
+    def neq(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(neq(coluna, valor))
+
+    def gt(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(gt(coluna, valor))
+
+    def gte(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(gte(coluna, valor))
+
+    def lt(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(lt(coluna, valor))
+
+    def lte(self, coluna: str, valor: Any) -> "Consulta":
+        return self.onde(lte(coluna, valor))
+
+    def ilike(self, coluna: str, padrao: str) -> "Consulta":
+        return self.onde(Condicao(coluna, "ilike", padrao))
+
+    def is_(self, coluna: str, valor: Optional[bool]) -> "Consulta":
+        return self.onde(Condicao(coluna, "is", valor))
+
+    def em(self, coluna: str, valores: Iterable[Any]) -> "Consulta":
+        return self.onde(em(coluna, valores))
+
+    def entre(self, coluna: str, inicio: Any = None, fim: Any = None) -> "Consulta":
+        """'inicio <= coluna < fim' (cada lado é opcional): um intervalo que usa o índice da coluna."""
+        if inicio is not None:
+            self.gte(coluna, inicio)
+        if fim is not None:
+            self.lt(coluna, fim)
+        return self
+
+    def ou(self, *condicoes: Condicao) -> "Consulta":
+        return self.onde(ou(*condicoes))
+
+    def e(self, *condicoes: Condicao) -> "Consulta":
+        return self.onde(e(*condicoes))
+
+    # --- Ordenação e paginação ---
+
+    def order(self, coluna: str, desc: bool = False, nulos: Optional[str] = None) -> "Consulta":
+        """Acrescenta um critério de ordenação; 'nulos' é 'first' ou 'last'."""
+        criterio = f"{_validar_coluna(coluna)}.{'desc' if desc else 'asc'}"
+        if nulos is not None:
+            if nulos not in ("first", "last"):
+                raise ValueError(f"'nulos' deve ser 'first' ou 'last', não '{nulos}'")
+            criterio += f".nulls{nulos}"
+        self._ordem.append(criterio)
+        return self
+
+    def limit(self, limite: int) -> "Consulta":
+        self._limite = int(limite)
+        return self
+
+    def offset(self, deslocamento: int) -> "Consulta":
+        self._deslocamento = int(deslocamento)
+        return self
+
+    # --- Prefer ---
+
+    def contar(self, modo: str = "exact") -> "Consulta":
+        """Pede o total no 'Content-Range' da resposta (ver 'total')."""
+        if modo not in CONTAGENS:
+            raise ValueError(f"Contagem inválida: '{modo}'")
+        self._prefer["count"] = modo
+        return self
+
+    def retorno(self, modo: str) -> "Consulta":
+        if modo not in RETORNOS:
+            raise ValueError(f"Retorno inválido: '{modo}'")
+        self._prefer["return"] = modo
+        return self
+
+    def upsert(self, *on_conflict: str, resolucao: str = "merge-duplicates") -> "Consulta":
+        """Inserção que atualiza (ou ignora) as linhas que colidem nas colunas 'on_conflict'."""
+        if resolucao not in RESOLUCOES:
+            raise ValueError(f"Resolução inválida: '{resolucao}'")
+        if on_conflict:
+            self._on_conflict = ",".join(_validar_coluna(c) for c in on_conflict)
+        self._prefer["resolution"] = resolucao
+        return self
+
+    # --- Saída ---
+
+    def params(self) -> Params:
+        params: Params = []
+        if self._select is not None:
+            params.append(("select", self._select))
+        params.extend(condicao.como_param() for condicao in self._condicoes)
+        if self._ordem:
+            params.append(("order", ",".join(self._ordem)))
+        if self._limite is not None:
+            params.append(("limit", str(self._limite)))
+        if self._deslocamento is not None:
+            params.append(("offset", str(self._deslocamento)))
+        if self._on_conflict is not None:
+            params.append(("on_conflict", self._on_conflict))
+        if self._colunas is not None:
+            params.append(("columns", self._colunas))
+        return params
+
+    def url_completa(self) -> str:
+        """URL com a query string já codificada (ex.: para a unidade de trabalho, que agrupa por URL)."""
+        params = self.params()
+        return f"{self.url}?{urlencode(params)}" if params else self.url
+
+    def headers(self, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Cópia de 'base' com o 'Prefer' da consulta (somado a um 'Prefer' já existente)."""
+        headers = dict(base or {})
+        if self._prefer:
+            prefer = [p.strip() for p in headers.get("Prefer", "").split(",") if p.strip()]
+            chaves = {p.split("=", 1)[0] for p in prefer}
+            prefer += [f"{k}={v}" for k, v in self._prefer.items() if k not in chaves]
+            headers["Prefer"] = ",".join(prefer)
+        return headers
+
+
+def total(response: requests.Response) -> Optional[int]:
+    """Total do 'Content-Range' ('0-24/3573'), pedido com 'contar()'; None se ausente."""
+    _, _, total_texto = response.headers.get("Content-Range", "").partition("/")
+    return int(total_texto) if total_texto.isdigit() else None
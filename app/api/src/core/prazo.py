@@ -0,0 +1,210 @@
+# Prazo (deadline) por requisição, propagado a todas as chamadas ao Supabase
+"""
+Cada requisição da API ganha um prazo absoluto: o valor do cabeçalho
+'X-Prazo-Ms' (limitado a PRAZO_MAXIMO_MS) ou o padrão da rota. O prazo fica
+numa ContextVar, que o Starlette copia para a thread da rota, e cada chamada
+ao Supabase usa como timeout o menor valor entre o seu timeout e o tempo que
+resta. Com o prazo esgotado, a próxima chamada nem é feita: levanta
+'PrazoEsgotado' e a rota desiste antes de começar as escritas.
+
+'PrazoEsgotado' herda de 'requests.exceptions.Timeout', então as rotas que
+já tratam erros de comunicação continuam funcionando sem mudanças.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+# Prazo padrão das rotas da API (ms); 0 desliga
+PRAZO_PADRAO_MS = float(os.environ.get("PRAZO_PADRAO_MS", "10000"))
+# Prazos por rota no formato "caminho=ms,..." (caminhos sem o '/api/v1')
+PRAZO_ROTAS = os.environ.get("PRAZO_ROTAS", "/vendas/vender=8000,/estoque/adicionar_ao_estoque=5000")
+# Maior prazo aceito no cabeçalho
+PRAZO_MAXIMO_MS = float(os.environ.get("PRAZO_MAXIMO_MS", "60000"))
+# Rotas sem prazo: streams e trabalhos em lote (o batch aplica o prazo a cada operação)
+PRAZO_ROTAS_LIVRES = os.environ.get("PRAZO_ROTAS_LIVRES", "/eventos,/exportar,/importar,/batch,/extratos")
+CABECALHO_PRAZO = "x-prazo-ms"
+PREFIXO_API = "/api/v1"
+
+_prazo_atual: ContextVar[Optional[float]] = ContextVar("prazo", default=None)
+
+
+class PrazoEsgotado(requests.exceptions.Timeout):
+    """O prazo da requisição acabou antes da chamada ao Supabase."""
+
+
+def _prazos_de_texto(texto: str) -> Dict[str, float]:
+    prazos = {}
+    for parte in texto.split(","):
+        caminho, _, valor = parte.partition("=")
+        if caminho.strip() and valor.strip():
+            prazos[caminho.strip().rstrip("/")] = float(valor)
+    return prazos
+
+
+def _casa(caminho: str, prefixo: str) -> bool:
+    return caminho == prefixo or caminho.startswith(prefixo + "/")
+
+
+def definir(segundos: Optional[float]):
+    """Define o prazo do contexto atual ('segundos' a partir de agora; None = sem prazo)."""
+    return _prazo_atual.set(None if segundos is None else time.monotonic() + segundos)
+
+
+def definir_absoluto(instante: Optional[float]):
+    """Define o prazo do contexto atual como um instante de 'time.monotonic()'."""
+    return _prazo_atual.set(instante)
+
+
+@contextmanager
+def sem_prazo():
+    """
+    Suspende o prazo dentro do bloco: as chamadas usam só o próprio timeout.
+    Para trabalho que, uma vez começado, precisa terminar (ex.: as escritas
+    de uma unidade de trabalho, depois que a primeira foi enviada).
+    """
+    token = _prazo_atual.set(None)
+    try:
+        yield
+    finally:
+        _prazo_atual.reset(token)
+
+
+def atual() -> Optional[float]:
+    """Instante (time.monotonic) em que o prazo acaba, ou None."""
+    return _prazo_atual.get()
+
+
+def restante() -> Optional[float]:
+    """Segundos que restam do prazo (negativo se esgotado), ou None sem prazo."""
+    instante = _prazo_atual.get()
+    return None if instante is None else instante - time.monotonic()
+
+
+def esgotado() -> bool:
+    resta = restante()
+    return resta is not None and resta <= 0
+
+
+def verificar() -> None:
+    """
+    Raises:
+        PrazoEsgotado: Se o prazo da requisição já acabou.
+    """
+    if esgotado():
+        raise PrazoEsgotado("O prazo da requisição se esgotou.")
+
+
+def limitar_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Timeout de uma chamada: o menor entre 'timeout' e o que resta do prazo.
+
+    Raises:
+        PrazoEsgotado: Se o prazo da requisição já acabou.
+    """
+    resta = restante()
+    if resta is None:
+        return timeout
+    if resta <= 0:
+        raise PrazoEsgotado("O prazo da requisição se esgotou.")
+    return resta if timeout is None else min(timeout, resta)
+
+
+class MiddlewarePrazo:
+    """Middleware ASGI que define o prazo de cada requisição da API."""
+
+    def __init__(self, app):
+        self.app = app
+        self.prazos_rotas = _prazos_de_texto(PRAZO_ROTAS)
+        self.rotas_livres = tuple(p.strip().rstrip("/") for p in PRAZO_ROTAS_LIVRES.split(",") if p.strip())
+
+    def prazo_da_rota(self, caminho: str) -> Optional[float]:
+        """Prazo padrão (s) da rota, ou None se ela não tem prazo."""
+        if not caminho.startswith(PREFIXO_API + "/"):
+            return None
+        caminho = caminho[len(PREFIXO_API):].rstrip("/")
+        if any(_casa(caminho, livre) for livre in self.rotas_livres):
+            return None
+        for prefixo, ms in self.prazos_rotas.items():
+            if _casa(caminho, prefixo):
+                return ms / 1000
+        return PRAZO_PADRAO_MS / 1000 if PRAZO_PADRAO_MS > 0 else None
+
+    @staticmethod
+    def _prazo_do_cabecalho(headers) -> Tuple[bool, Optional[float]]:
+        """(presente, segundos) do cabeçalho 'X-Prazo-Ms'; segundos None se inválido."""
+        for nome, valor in headers:
+            if nome.decode("latin-1").lower() == CABECALHO_PRAZO:
+                try:
+                    ms = float(valor.decode("latin-1"))
+                except ValueError:
+                    return True, None
+                if ms <= 0:
+                    return True, None
+                return True, min(ms, PRAZO_MAXIMO_MS) / 1000
+        return False, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        segundos = self.prazo_da_rota(scope["path"])
+        presente, do_cabecalho = self._prazo_do_cabecalho(scope.get("headers", []))
+        if presente and do_cabecalho is None:
+            await _responder(send, 400, "O cabeçalho 'X-Prazo-Ms' deve ser um número positivo de milissegundos.")
+            return
+        if do_cabecalho is not None and scope["path"].startswith(PREFIXO_API + "/"):
+            segundos = do_cabecalho
+
+        instante = None if segundos is None else time.monotonic() + segundos
+        herdado = atual()
+        if herdado is not None and (instante is None or herdado < instante):
+            # Operação de um batch: vale o prazo do batch, se for menor
+            instante = herdado
+        token = definir_absoluto(instante)
+
+        iniciada = False
+
+        def estourou() -> bool:
+            return instante is not None and time.monotonic() >= instante
+
+        async def enviar(mensagem):
+            nonlocal iniciada
+            if mensagem["type"] == "http.response.start":
+                iniciada = True
+                # Erros de comunicação causados pelo prazo viram 504, não 500/503
+                if mensagem["status"] in (500, 503) and estourou():
+                    mensagem = {**mensagem, "status": 504}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            if iniciada or not estourou():
+                raise
+            await responder_prazo_esgotado(send, "O prazo da requisição se esgotou durante o processamento.")
+        finally:
+            _prazo_atual.reset(token)
+
+
+async def _responder(send, status_code: int, mensagem: str) -> None:
+    corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())],
+    })
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def responder_prazo_esgotado(
+    send, mensagem: str = "O prazo da requisição se esgotou antes de ela ser processada."
+) -> None:
+    """Resposta 504 para uma requisição cujo prazo acabou."""
+    await _responder(send, 504, mensagem)
@@ -0,0 +1,237 @@
+# Índice de preços versionado por data de vigência
+"""
+Guarda em memória o histórico de preços de cada categoria, ordenado pela data
+de vigência, e resolve o preço de qualquer instante com busca binária, sem
+consultar o Supabase a cada venda.
+
+Tabela esperada no Supabase:
+
+    create table "HistoricoPreco" (
+        id bigint generated by default as identity primary key,
+        created_at timestamptz not null default now(),
+        categoria text not null,
+        preco_unitario float8 not null,
+        vigente_desde timestamptz not null default now()
+    );
+    create index on "HistoricoPreco" (categoria, vigente_desde);
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.registro import obter_logger
+from app.api.src.core.resiliencia import resiliencia
+
+load_dotenv()
+logger = obter_logger("precos")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Intervalo da recarga completa do índice; as mudanças chegam antes pelo consumidor
+PRECOS_TTL = float(os.environ.get("PRECOS_TTL", "3600"))
+# Espera (s) antes de tentar de novo a primeira carga que falhou
+PRECOS_RETENTATIVA = float(os.environ.get("PRECOS_RETENTATIVA", "30"))
+
+TABELA_PRECOS = "HistoricoPreco"
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Prefer": "return=representation",
+    }
+
+
+def para_utc(momento: datetime) -> datetime:
+    """Datas sem fuso são tratadas como UTC, para poderem ser comparadas."""
+    if momento.tzinfo is None:
+        return momento.replace(tzinfo=timezone.utc)
+    return momento.astimezone(timezone.utc)
+
+
+def _converter_data(valor: Any) -> datetime:
+    return para_utc(valor if isinstance(valor, datetime) else datetime.fromisoformat(valor))
+
+
+class IndicePrecos:
+    """
+    Histórico de preços por categoria em duas listas paralelas (datas de
+    vigência ordenadas e preços), consultadas com 'bisect' em O(log n).
+    """
+
+    def __init__(self, ttl: float = PRECOS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._datas: Dict[str, List[datetime]] = {}
+        self._precos: Dict[str, List[float]] = {}
+        self._carregado_em: Optional[float] = None
+        self._recarregando = False
+        self._falhou_em: Optional[float] = None
+
+    def substituir(self, linhas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Reconstrói o índice a partir de linhas da tabela 'HistoricoPreco'.
+        Linhas incompletas ou com valores inválidos são ignoradas (e contadas no log).
+        """
+        por_categoria: Dict[str, List] = {}
+        invalidas = 0
+        for linha in linhas:
+            try:
+                categoria = linha["categoria"]
+                versao = (_converter_data(linha["vigente_desde"]), float(linha["preco_unitario"]))
+            except (KeyError, TypeError, ValueError) as e:
+                invalidas += 1
+                if invalidas == 1:
+                    logger.warning("Linha de '%s' ignorada no índice de preços: %r (%s)", TABELA_PRECOS, linha, e)
+                continue
+            if not isinstance(categoria, str):
+                invalidas += 1
+                continue
+            por_categoria.setdefault(categoria, []).append(versao)
+        if invalidas > 1:
+            logger.warning("%d linha(s) de '%s' ignoradas no índice de preços", invalidas, TABELA_PRECOS)
+        datas, precos = {}, {}
+        for categoria, versoes in por_categoria.items():
+            versoes.sort(key=lambda v: v[0])
+            datas[categoria] = [v[0] for v in versoes]
+            precos[categoria] = [v[1] for v in versoes]
+        with self._lock:
+            self._datas, self._precos = datas, precos
+            self._carregado_em = time.monotonic()
+
+    def adicionar(self, categoria: str, vigente_desde: Any, preco_unitario: float) -> None:
+        """Insere uma nova versão de preço na posição correta."""
+        momento = _converter_data(vigente_desde)
+        with self._lock:
+            datas = self._datas.setdefault(categoria, [])
+            precos = self._precos.setdefault(categoria, [])
+            posicao = bisect_right(datas, momento)
+            datas.insert(posicao, momento)
+            precos.insert(posicao, float(preco_unitario))
+
+    def invalidar(self) -> None:
+        """Força a recarga completa na próxima consulta."""
+        with self._lock:
+            self._carregado_em = None
+
+    def preco_em(self, categoria: str, momento: Optional[datetime] = None) -> Optional[float]:
+        """Preço vigente da categoria no instante informado (ou agora)."""
+        momento = para_utc(momento) if momento is not None else datetime.now(timezone.utc)
+        with self._lock:
+            datas = self._datas.get(categoria)
+            if not datas:
+                return None
+            posicao = bisect_right(datas, momento) - 1
+            return self._precos[categoria][posicao] if posicao >= 0 else None
+
+    def historico(self, categoria: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"categoria": categoria, "vigente_desde": d, "preco_unitario": p}
+                for d, p in zip(self._datas.get(categoria, []), self._precos.get(categoria, []))
+            ]
+
+    def garantir_carregado(self) -> None:
+        """
+        Carrega o índice na primeira chamada. Depois disso, quando o TTL expira,
+        recarrega em uma thread de fundo e continua respondendo com o índice atual.
+        """
+        if self._carregado_em is None:
+            # Sem a tabela (ou com o Supabase fora), não tenta de novo a cada venda
+            if self._falhou_em is not None and time.monotonic() - self._falhou_em < PRECOS_RETENTATIVA:
+                return
+            try:
+                self.substituir(carregar_historico())
+            except requests.exceptions.RequestException:
+                self._falhou_em = time.monotonic()
+                raise
+            return
+
+        if time.monotonic() - self._carregado_em < self.ttl:
+            return
+        with self._lock:
+            if self._recarregando:
+                return
+            self._recarregando = True
+
+        def recarregar():
+            try:
+                self.substituir(carregar_historico())
+            except Exception as e:
+                logger.warning("Falha ao recarregar o índice de preços: %s", e)
+            finally:
+                self._recarregando = False
+
+        threading.Thread(target=recarregar, name="recarregar-precos", daemon=True).start()
+
+
+def carregar_historico() -> List[Dict[str, Any]]:
+    """Busca todo o histórico de preços no Supabase."""
+    consulta = Consulta(TABELA_PRECOS).select("categoria", "preco_unitario", "vigente_desde").order("vigente_desde")
+    response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    return response.json()
+
+
+indice_precos = IndicePrecos()
+
+
+def _aplicar_mudanca_preco(mudanca: Mudanca) -> None:
+    """Inserções entram direto no índice; edições e remoções forçam a recarga."""
+    registro = mudanca.registro
+    if mudanca.tipo == "INSERT" and {"categoria", "vigente_desde", "preco_unitario"} <= registro.keys():
+        indice_precos.adicionar(registro["categoria"], registro["vigente_desde"], registro["preco_unitario"])
+    else:
+        indice_precos.invalidar()
+
+
+consumidor.registrar(TABELA_PRECOS, _aplicar_mudanca_preco)
+
+
+def preco_vigente(categoria: str, momento: Optional[datetime] = None) -> Optional[float]:
+    """
+    Resolve o preço da categoria localmente. Retorna None se o histórico não
+    puder ser carregado ou não tiver preço para o instante.
+    """
+    try:
+        indice_precos.garantir_carregado()
+    except requests.exceptions.RequestException as e:
+        logger.warning("Falha ao carregar o histórico de preços: %s", e)
+        return None
+    return indice_precos.preco_em(categoria, momento)
+
+
+def registrar_preco(categoria: str, preco_unitario: float, vigente_desde: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Insere uma nova versão de preço e a aplica no índice local.
+
+    Raises:
+        requests.exceptions.RequestException: Se a requisição ao Supabase falhar.
+    """
+    vigente_desde = para_utc(vigente_desde) if vigente_desde is not None else datetime.now(timezone.utc)
+    payload = {
+        "categoria": categoria,
+        "preco_unitario": preco_unitario,
+        "vigente_desde": vigente_desde.isoformat(),
+    }
+    response = resiliencia.executar(
+        Consulta(TABELA_PRECOS).url, requests.post, headers=_get_headers(), json=payload, timeout=15.0
+    )
+    response.raise_for_status()
+    data = response.json() if response.content else [payload]
+    consumidor.aplicar(Mudanca(tabela=TABELA_PRECOS, tipo="INSERT", registro=data[0]))
+    return data[0]
@@ -0,0 +1,223 @@
+# Logs estruturados (JSON) fora do caminho da requisição
+"""
+Os registros vão para uma fila limitada e uma thread de fundo os formata e
+escreve na saída padrão. A thread da requisição só monta o 'LogRecord' e o
+coloca na fila, sem esperar pelo I/O: com a fila cheia, o registro é
+descartado (e contado), em vez de atrasar uma venda.
+
+Cada registro leva o 'id_requisicao' da requisição em andamento (cabeçalho
+'X-Request-Id', ou um gerado pelo middleware), que também volta na resposta.
+Campos extras vão em 'extra={"campos": {...}}'; modelos Pydantic podem ir
+direto, pois só são serializados na thread de escrita.
+
+Registros DEBUG são amostrados (LOG_AMOSTRAGEM_DEBUG), pois são os de maior
+volume; os demais níveis são sempre mantidos.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Nível mínimo dos logs da aplicação
+LOG_NIVEL = os.environ.get("LOG_NIVEL", "INFO").upper()
+# "json" ou "texto"
+LOG_FORMATO = os.environ.get("LOG_FORMATO", "json").lower()
+# Fração dos registros DEBUG que é mantida (0 a 1)
+LOG_AMOSTRAGEM_DEBUG = float(os.environ.get("LOG_AMOSTRAGEM_DEBUG", "0.01"))
+# Máximo de registros esperando a escrita
+LOG_FILA = int(os.environ.get("LOG_FILA", "10000"))
+CABECALHO_ID = "x-request-id"
+LOGGER_RAIZ = "bonobrownie"
+
+_id_requisicao: ContextVar[Optional[str]] = ContextVar("id_requisicao", default=None)
+_ID_VALIDO = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def id_requisicao() -> Optional[str]:
+    """Id da requisição em andamento, ou None fora de uma requisição."""
+    return _id_requisicao.get()
+
+
+class FiltroContexto(logging.Filter):
+    """Copia o id da requisição para o registro (roda na thread de quem loga)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.id_requisicao = _id_requisicao.get()
+        return True
+
+
+class FiltroAmostragem(logging.Filter):
+    """Mantém só uma fração dos registros DEBUG."""
+
+    def __init__(self, fracao: float = LOG_AMOSTRAGEM_DEBUG):
+        super().__init__()
+        self.fracao = fracao
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.fracao >= 1:
+            return True
+        return random.random() < self.fracao
+
+
+class FilaSemBloqueio(logging.handlers.QueueHandler):
+    """QueueHandler que descarta o registro com a fila cheia, sem bloquear nem escrever no stderr."""
+
+    def __init__(self, fila: "queue.Queue"):
+        super().__init__(fila)
+        self._lock_descartes = threading.Lock()
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A formatação fica para a thread de escrita; aqui só se fixa a mensagem
+        # (os argumentos podem mudar depois) e o traceback (os frames não sobrevivem)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_descartes:
+                self.descartados += 1
+
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por registro."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        saida: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "id_requisicao", None):
+            saida["id_requisicao"] = record.id_requisicao
+        campos = getattr(record, "campos", None)
+        if campos:
+            saida.update(campos)
+        if record.exc_text:
+            saida["exc"] = record.exc_text
+        return json.dumps(saida, ensure_ascii=False, default=_serializar)
+
+
+def _serializar(valor: Any) -> Any:
+    """Modelos Pydantic são serializados aqui, na thread de escrita, e não em quem loga."""
+    if hasattr(valor, "model_dump"):
+        return valor.model_dump(mode="json")
+    return str(valor)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível para desenvolvimento local."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(id_requisicao)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "id_requisicao"):
+            record.id_requisicao = None
+        texto = super().format(record)
+        campos = getattr(record, "campos", None)
+        return f"{texto} {json.dumps(campos, ensure_ascii=False, default=_serializar)}" if campos else texto
+
+
+class _Registro:
+    """Liga a fila, o handler e a thread de escrita ao logger 'bonobrownie'."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.handler: Optional[FilaSemBloqueio] = None
+        self._ouvinte: Optional[logging.handlers.QueueListener] = None
+
+    def configurar(self) -> None:
+        """Configura o logger da aplicação (uma vez por processo)."""
+        with self._lock:
+            if self.handler is not None:
+                return
+            saida = logging.StreamHandler(sys.stdout)
+            saida.setFormatter(FormatadorTexto() if LOG_FORMATO == "texto" else FormatadorJson())
+            fila: "queue.Queue" = queue.Queue(maxsize=LOG_FILA)
+            self.handler = FilaSemBloqueio(fila)
+            self.handler.addFilter(FiltroAmostragem())
+            self.handler.addFilter(FiltroContexto())
+            raiz = logging.getLogger(LOGGER_RAIZ)
+            raiz.setLevel(LOG_NIVEL)
+            raiz.addHandler(self.handler)
+            raiz.propagate = False
+            self._ouvinte = logging.handlers.QueueListener(fila, saida)
+            self._ouvinte.start()
+            atexit.register(self.parar)
+
+    def parar(self) -> None:
+        """Escreve o que ainda está na fila e para a thread de escrita."""
+        with self._lock:
+            if self._ouvinte is not None:
+                self._ouvinte.stop()
+                self._ouvinte = None
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "na_fila": self.handler.queue.qsize() if self.handler else 0,
+            "descartados": self.handler.descartados if self.handler else 0,
+        }
+
+
+registro = _Registro()
+
+
+def obter_logger(nome: str) -> logging.Logger:
+    """Logger da aplicação ('bonobrownie.<nome>'), já ligado à fila."""
+    registro.configurar()
+    return logging.getLogger(f"{LOGGER_RAIZ}.{nome}")
+
+
+class MiddlewareIdRequisicao:
+    """Middleware ASGI que define o id da requisição e o devolve no 'X-Request-Id'."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _id_do_cabecalho(headers) -> Optional[str]:
+        for nome, valor in headers:
+            if nome.decode("latin-1").lower() == CABECALHO_ID:
+                valor = valor.decode("latin-1").strip()
+                # Só aceita ids curtos e sem caracteres de controle (vão para os logs)
+                return valor if _ID_VALIDO.match(valor) else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        identificador = self._id_do_cabecalho(scope.get("headers", [])) or uuid.uuid4().hex
+        token = _id_requisicao.set(identificador)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                mensagem = {**mensagem, "headers": [*mensagem.get("headers", []),
+                                                    (CABECALHO_ID.encode(), identificador.encode())]}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _id_requisicao.reset(token)
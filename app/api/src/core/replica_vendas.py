@@ -0,0 +1,329 @@
+# Réplica local e colunar da tabela 'Venda', sincronizada por marca d'água
+"""
+Mantém uma cópia da tabela 'Venda' em arrays NumPy, uma coluna por campo:
+cliente e categoria viram códigos inteiros (com o texto guardado uma só vez),
+números e datas ficam em colunas tipadas. Cada linha ocupa algumas dezenas de
+bytes, contra cerca de 1 KB de um dict com as mesmas chaves.
+
+A sincronização busca só as linhas com 'created_at' a partir da última marca
+d'água. Como a marca só avança com inserções, edições e remoções feitas
+diretamente no banco só aparecem na recarga completa ('recarregar').
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core.aging import converter_datas
+from app.api.src.core.registro import obter_logger
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.core.postgrest import Consulta
+
+load_dotenv()
+logger = obter_logger("replica_vendas")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Idade máxima (s) da réplica antes de uma leitura disparar a sincronização
+REPLICA_VENDAS_INTERVALO = float(os.environ.get("REPLICA_VENDAS_INTERVALO", "5"))
+# Linhas de 'Venda' buscadas por requisição
+REPLICA_VENDAS_LOTE = int(os.environ.get("REPLICA_VENDAS_LOTE", "1000"))
+
+_CAPACIDADE_INICIAL = 1024
+_COLUNAS = {
+    "id": np.int64,
+    "created_at": "datetime64[s]",
+    "cliente": np.int32,
+    "categoria_produto": np.int32,
+    "qtd_unidades": np.int64,
+    "valor_unitario": np.float64,
+    "status_pagamento": np.bool_,
+    "data_venda": "datetime64[s]",
+    "data_vencimento": "datetime64[s]",
+    "valor_total": np.float64,
+}
+
+
+def _get_headers() -> dict:
+    """Cria os cabeçalhos padrão para a autenticação na API do Supabase."""
+    if not SUPABASE_KEY:
+        raise ValueError("A chave do Supabase não foi definida.")
+
+    return {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Accept": "application/json",
+    }
+
+
+def _para_datetime(valor: np.datetime64) -> Optional[datetime]:
+    if np.isnat(valor):
+        return None
+    return valor.astype("datetime64[us]").item().replace(tzinfo=timezone.utc)
+
+
+class Categorias:
+    """
+    Dicionário de códigos para uma coluna de texto (cada texto guardado uma vez).
+    Uma vez publicado numa fotografia não muda mais: textos novos entram numa cópia.
+    """
+    __slots__ = ("textos", "codigos")
+
+    def __init__(self, textos: Optional[List[str]] = None):
+        self.textos: List[str] = list(textos or [])
+        self.codigos: Dict[str, int] = {texto: codigo for codigo, texto in enumerate(self.textos)}
+
+    def com(self, textos: Iterable[str]) -> "Categorias":
+        """A própria instância se já conhece todos os textos; senão, uma cópia com os novos."""
+        novos = [texto for texto in dict.fromkeys(textos) if texto not in self.codigos]
+        if not novos:
+            return self
+        return Categorias(self.textos + novos)
+
+
+class Fotografia:
+    """
+    Estado da réplica num instante: colunas, dicionários de texto e tamanho.
+    A réplica troca a fotografia inteira de uma vez; leitores pegam uma só e
+    leem tudo dela, sem ver colunas de uma versão e tamanho de outra.
+    """
+    __slots__ = ("colunas", "clientes", "categorias", "tamanho")
+
+    def __init__(self, colunas: Dict[str, np.ndarray], clientes: Categorias, categorias: Categorias, tamanho: int):
+        self.colunas = colunas
+        self.clientes = clientes
+        self.categorias = categorias
+        self.tamanho = tamanho
+
+    def indices_categoria(self, categoria: str) -> np.ndarray:
+        """Posições das vendas da categoria, em ordem de criação."""
+        codigo = self.categorias.codigos.get(categoria)
+        if codigo is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.colunas["categoria_produto"][:self.tamanho] == codigo)
+
+    def linha(self, indice: int) -> "LinhaVenda":
+        return LinhaVenda(self, int(indice))
+
+    def linhas(self) -> Iterator["LinhaVenda"]:
+        for indice in range(self.tamanho):
+            yield LinhaVenda(self, indice)
+
+
+def _fotografia_vazia() -> Fotografia:
+    colunas = {nome: np.empty(_CAPACIDADE_INICIAL, dtype=tipo) for nome, tipo in _COLUNAS.items()}
+    return Fotografia(colunas, Categorias(), Categorias(), 0)
+
+
+class LinhaVenda:
+    """Visão de uma linha de uma fotografia da réplica; lê os valores direto das colunas."""
+    __slots__ = ("_fotografia", "_indice")
+
+    def __init__(self, fotografia: Fotografia, indice: int):
+        self._fotografia = fotografia
+        self._indice = indice
+
+    @property
+    def id(self) -> int:
+        return int(self._fotografia.colunas["id"][self._indice])
+
+    @property
+    def cliente(self) -> str:
+        return self._fotografia.clientes.textos[self._fotografia.colunas["cliente"][self._indice]]
+
+    @property
+    def categoria_produto(self) -> str:
+        return self._fotografia.categorias.textos[self._fotografia.colunas["categoria_produto"][self._indice]]
+
+    @property
+    def qtd_unidades(self) -> int:
+        return int(self._fotografia.colunas["qtd_unidades"][self._indice])
+
+    @property
+    def valor_unitario(self) -> Optional[float]:
+        valor = float(self._fotografia.colunas["valor_unitario"][self._indice])
+        return None if np.isnan(valor) else valor
+
+    @property
+    def status_pagamento(self) -> bool:
+        return bool(self._fotografia.colunas["status_pagamento"][self._indice])
+
+    @property
+    def data_venda(self) -> Optional[datetime]:
+        return _para_datetime(self._fotografia.colunas["data_venda"][self._indice])
+
+    @property
+    def data_vencimento(self) -> Optional[datetime]:
+        return _para_datetime(self._fotografia.colunas["data_vencimento"][self._indice])
+
+    @property
+    def valor_total(self) -> float:
+        return float(self._fotografia.colunas["valor_total"][self._indice])
+
+    def como_dict(self) -> Dict[str, Any]:
+        """Campos do schema 'Venda'."""
+        return {
+            "cliente": self.cliente,
+            "categoria_produto": self.categoria_produto,
+            "qtd_unidades": self.qtd_unidades,
+            "valor_unitario": self.valor_unitario,
+            "status_pagamento": self.status_pagamento,
+            "data_venda": self.data_venda,
+            "data_vencimento": self.data_vencimento,
+            "valor_total": self.valor_total,
+        }
+
+
+class ReplicaVendas:
+    """
+    Cópia colunar da tabela 'Venda', em ordem de 'created_at'.
+
+    Só quem escreve (sincronizar e recarregar) toma o lock. Cada lote é
+    gravado além do fim da fotografia atual (ou em colunas novas, se faltar
+    espaço) e só fica visível quando a fotografia nova é publicada, numa
+    única atribuição. Quem lê pega 'fotografia()' uma vez e usa só ela.
+    """
+
+    def __init__(self, intervalo: float = REPLICA_VENDAS_INTERVALO):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._fotografia = _fotografia_vazia()
+        # Última 'created_at' vista (texto do PostgREST) e os ids com esse valor,
+        # para não duplicar linhas quando a busca recomeça com 'gte'
+        self._watermark: Optional[str] = None
+        self._ids_no_watermark: Set[int] = set()
+        self._sincronizado_em: Optional[float] = None
+
+    def fotografia(self) -> Fotografia:
+        """Estado atual e consistente da réplica."""
+        return self._fotografia
+
+    @property
+    def tamanho(self) -> int:
+        return self._fotografia.tamanho
+
+    @property
+    def clientes(self) -> Categorias:
+        return self._fotografia.clientes
+
+    @property
+    def categorias(self) -> Categorias:
+        return self._fotografia.categorias
+
+    def _anexar(self, linhas: List[Dict[str, Any]]) -> None:
+        """Converte um lote de linhas do PostgREST em colunas e publica a fotografia com o lote no final."""
+        novas = [linha for linha in linhas if linha["id"] not in self._ids_no_watermark]
+        if not novas:
+            return
+        atual = self._fotografia
+        inicio, fim = atual.tamanho, atual.tamanho + len(novas)
+        c = atual.colunas
+        capacidade = len(c["id"])
+        if fim > capacidade:
+            while capacidade < fim:
+                capacidade *= 2
+            c = {nome: np.empty(capacidade, dtype=coluna.dtype) for nome, coluna in atual.colunas.items()}
+            for nome, coluna in atual.colunas.items():
+                c[nome][:inicio] = coluna[:inicio]
+        clientes = atual.clientes.com(linha["cliente"] for linha in novas)
+        categorias = atual.categorias.com(linha["categoria_produto"] for linha in novas)
+
+        # As posições [inicio:fim] estão além do fim de qualquer fotografia já publicada
+        c["id"][inicio:fim] = [linha["id"] for linha in novas]
+        c["created_at"][inicio:fim] = converter_datas([linha.get("created_at") for linha in novas])
+        c["cliente"][inicio:fim] = [clientes.codigos[linha["cliente"]] for linha in novas]
+        c["categoria_produto"][inicio:fim] = [categorias.codigos[linha["categoria_produto"]] for linha in novas]
+        c["qtd_unidades"][inicio:fim] = [linha.get("qtd_unidades") or 0 for linha in novas]
+        c["valor_unitario"][inicio:fim] = [
+            np.nan if linha.get("valor_unitario") is None else linha["valor_unitario"] for linha in novas
+        ]
+        c["status_pagamento"][inicio:fim] = [bool(linha.get("status_pagamento")) for linha in novas]
+        c["data_venda"][inicio:fim] = converter_datas([linha.get("data_venda") for linha in novas])
+        c["data_vencimento"][inicio:fim] = converter_datas([linha.get("data_vencimento") for linha in novas])
+        c["valor_total"][inicio:fim] = [linha.get("valor_total") or 0.0 for linha in novas]
+        self._fotografia = Fotografia(c, clientes, categorias, fim)
+
+        ultimo = novas[-1].get("created_at")
+        if ultimo != self._watermark:
+            self._watermark = ultimo
+            self._ids_no_watermark = set()
+        self._ids_no_watermark.update(l["id"] for l in novas if l.get("created_at") == ultimo)
+
+    def sincronizar(self) -> int:
+        """
+        Busca as vendas criadas desde a última marca d'água. Retorna quantas
+        linhas novas entraram na réplica.
+
+        Raises:
+            requests.exceptions.RequestException: Se a requisição ao Supabase falhar.
+        """
+        with self._lock:
+            antes = self.tamanho
+            while True:
+                consulta = (
+                    Consulta("Venda").select("*")
+                    .entre("created_at", self._watermark)
+                    .order("created_at").order("id")
+                    .limit(REPLICA_VENDAS_LOTE)
+                )
+                response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=30.0)
+                response.raise_for_status()
+                linhas = response.json()
+                tamanho_antes = self.tamanho
+                self._anexar(linhas)
+                # Página incompleta, ou só linhas já vistas (muitas com o mesmo created_at)
+                if len(linhas) < REPLICA_VENDAS_LOTE or self.tamanho == tamanho_antes:
+                    break
+            self._sincronizado_em = time.monotonic()
+            return self.tamanho - antes
+
+    def recarregar(self) -> int:
+        """
+        Reconstrói a réplica do zero (enxerga edições e remoções). A cópia nova
+        é montada à parte e só substitui a atual no final, trocando a fotografia
+        inteira. Retorna o total de linhas.
+        """
+        nova = ReplicaVendas(self.intervalo)
+        nova.sincronizar()
+        with self._lock:
+            self._fotografia = nova._fotografia
+            self._watermark, self._ids_no_watermark = nova._watermark, nova._ids_no_watermark
+            self._sincronizado_em = nova._sincronizado_em
+            return self.tamanho
+
+    def marcar_desatualizada(self) -> None:
+        """Faz a próxima leitura sincronizar (ex.: logo após registrar uma venda)."""
+        self._sincronizado_em = None
+
+    def garantir_atualizada(self) -> None:
+        """
+        Sincroniza se a réplica for mais velha que 'intervalo'. Se a
+        sincronização falhar e já houver dados, segue com a réplica atual.
+        """
+        sincronizado_em = self._sincronizado_em
+        if sincronizado_em is not None and time.monotonic() - sincronizado_em < self.intervalo:
+            return
+        try:
+            self.sincronizar()
+        except requests.exceptions.RequestException as e:
+            if self._sincronizado_em is None and self.tamanho == 0:
+                raise
+            logger.warning("Falha ao sincronizar a réplica de vendas; usando a cópia local: %s", e)
+
+    def indices_categoria(self, categoria: str) -> np.ndarray:
+        """Posições das vendas da categoria na fotografia atual (use 'fotografia()' para ler as linhas depois)."""
+        return self._fotografia.indices_categoria(categoria)
+
+    def linhas(self) -> Iterator[LinhaVenda]:
+        return self._fotografia.linhas()
+
+    def bytes_por_linha(self) -> float:
+        """Bytes de cada linha nas colunas (sem contar os textos de cliente e categoria)."""
+        return sum(coluna.dtype.itemsize for coluna in self._fotografia.colunas.values())
+
+
+replica_vendas = ReplicaVendas()
@@ -0,0 +1,227 @@
+# Separação de leituras e escritas entre o Supabase primário e réplicas de leitura
+"""
+Com SUPABASE_REPLICAS configurada, os GETs de rotas de leitura vão para as
+réplicas (em rodízio, só as saudáveis) e o resto fica no primário
+(SUPABASE_URL). As leituras passam por 'resiliencia.get', que chama
+'roteador.ler' quando a requisição permite:
+
+- Rotas de leitura são os GETs e os POSTs que só leem, a mesma lista do
+  controle de admissão (ADMISSAO_ROTAS_LEITURA em core/admissao.py). As
+  demais ficam inteiras no primário, inclusive as leituras que fazem antes
+  de escrever (ex.: o estoque atual antes do PATCH), para não calcular a
+  escrita sobre um dado atrasado.
+- Depois de uma escrita, as leituras da mesma sessão ficam no primário por
+  REPLICAS_APOS_ESCRITA segundos (ler o que acabou de escrever). A sessão é
+  o cabeçalho 'X-Sessao' ou, sem ele, o IP do cliente.
+- Fora de uma requisição (threads de fundo), tudo vai para o primário.
+
+Uma réplica que falha (erro de conexão, timeout ou 5xx) sai do rodízio e a
+leitura é refeita no primário; uma thread de checagem a devolve ao rodízio
+quando ela voltar a responder. Cada tentativa usa só o que resta do prazo da
+requisição (core/prazo.py): a volta ao primário não ganha um timeout inteiro.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core import admissao, prazo
+from app.api.src.core.registro import obter_logger
+
+load_dotenv()
+logger = obter_logger("replicas")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# URLs das réplicas de leitura, separadas por vírgula; vazio desliga a separação
+SUPABASE_REPLICAS = os.environ.get("SUPABASE_REPLICAS", "")
+# Intervalo (s) entre as checagens de saúde das réplicas
+REPLICAS_CHECAGEM = float(os.environ.get("REPLICAS_CHECAGEM", "5"))
+# Por quanto tempo (s) uma sessão lê do primário depois de escrever
+REPLICAS_APOS_ESCRITA = float(os.environ.get("REPLICAS_APOS_ESCRITA", "5"))
+# Máximo de sessões com escrita recente lembradas
+REPLICAS_MAX_SESSOES = int(os.environ.get("REPLICAS_MAX_SESSOES", "10000"))
+CABECALHO_SESSAO = "x-sessao"
+PREFIXO_API = "/api/v1"
+
+# True quando a requisição atual pode ler das réplicas
+_ler_de_replica: ContextVar[bool] = ContextVar("ler_de_replica", default=False)
+
+
+class Replica:
+    """Uma réplica de leitura, com o estado de saúde e contadores."""
+
+    def __init__(self, base: str):
+        self.base = base
+        self.saudavel = True
+        self.leituras = 0
+        self.falhas = 0
+
+
+class Roteador:
+    """Escolhe entre primário e réplicas e lembra as sessões com escrita recente."""
+
+    def __init__(self, primario: Optional[str] = SUPABASE_URL, replicas: str = SUPABASE_REPLICAS):
+        self.primario = (primario or "").rstrip("/")
+        self.replicas: List[Replica] = [
+            Replica(base.strip().rstrip("/")) for base in replicas.split(",") if base.strip()
+        ]
+        self._lock = threading.Lock()
+        self._rodizio = itertools.cycle(self.replicas) if self.replicas else None
+        self._escritas: "OrderedDict[str, float]" = OrderedDict()
+        self._checagem: Optional[threading.Thread] = None
+        self.leituras_primario = 0
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.replicas)
+
+    # --- Sessões ---
+
+    def registrar_escrita(self, sessao: str) -> None:
+        """A sessão lê do primário pelos próximos REPLICAS_APOS_ESCRITA segundos."""
+        with self._lock:
+            self._escritas[sessao] = time.monotonic() + REPLICAS_APOS_ESCRITA
+            self._escritas.move_to_end(sessao)
+            while len(self._escritas) > REPLICAS_MAX_SESSOES:
+                self._escritas.popitem(last=False)
+
+    def escreveu_recentemente(self, sessao: str) -> bool:
+        with self._lock:
+            ate = self._escritas.get(sessao)
+            if ate is None:
+                return False
+            if ate <= time.monotonic():
+                del self._escritas[sessao]
+                return False
+            return True
+
+    # --- Escolha da réplica ---
+
+    def _escolher(self) -> Optional[Replica]:
+        """Próxima réplica saudável do rodízio, ou None se nenhuma estiver."""
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._rodizio)
+                if replica.saudavel:
+                    replica.leituras += 1
+                    return replica
+            self.leituras_primario += 1
+            return None
+
+    def _marcar_falha(self, replica: Replica, motivo: Any) -> None:
+        with self._lock:
+            replica.falhas += 1
+            estava_saudavel, replica.saudavel = replica.saudavel, False
+        if estava_saudavel:
+            logger.warning("Réplica '%s' fora do rodízio: %s", replica.base, motivo)
+        self._garantir_checagem()
+
+    def ler(self, url: str, **kwargs) -> requests.Response:
+        """
+        Como 'requests.get', numa réplica saudável (a URL do primário tem o
+        endereço trocado). Se a réplica falhar, refaz a leitura no primário.
+        O timeout de cada tentativa é limitado pelo que resta do prazo.
+
+        Raises:
+            prazo.PrazoEsgotado: Se o prazo acabar antes de uma tentativa.
+        """
+        timeout = kwargs.pop("timeout", None)
+        replica = self._escolher() if url.startswith(self.primario) else None
+        if replica is None:
+            return requests.get(url, timeout=prazo.limitar_timeout(timeout), **kwargs)
+        try:
+            response = requests.get(
+                replica.base + url[len(self.primario):], timeout=prazo.limitar_timeout(timeout), **kwargs
+            )
+        except prazo.PrazoEsgotado:
+            raise
+        except requests.exceptions.RequestException as e:
+            self._marcar_falha(replica, e)
+        else:
+            if response.status_code < 500:
+                return response
+            self._marcar_falha(replica, f"HTTP {response.status_code}")
+        return requests.get(url, timeout=prazo.limitar_timeout(timeout), **kwargs)
+
+    # --- Checagem de saúde ---
+
+    def _garantir_checagem(self) -> None:
+        with self._lock:
+            if self._checagem is None or not self._checagem.is_alive():
+                self._checagem = threading.Thread(target=self._checar, name="replicas-checagem", daemon=True)
+                self._checagem.start()
+
+    def _checar(self) -> None:
+        """Checa as réplicas fora do rodízio até todas voltarem."""
+        headers = {"apikey": SUPABASE_KEY or "", "Authorization": f"Bearer {SUPABASE_KEY}"}
+        while True:
+            time.sleep(REPLICAS_CHECAGEM)
+            fora = [replica for replica in self.replicas if not replica.saudavel]
+            for replica in fora:
+                try:
+                    response = requests.get(f"{replica.base}/rest/v1/", headers=headers, timeout=REPLICAS_CHECAGEM)
+                    voltou = response.status_code < 500
+                except requests.exceptions.RequestException:
+                    voltou = False
+                if voltou:
+                    replica.saudavel = True
+                    logger.info("Réplica '%s' de volta ao rodízio", replica.base)
+            with self._lock:
+                if all(replica.saudavel for replica in self.replicas):
+                    self._checagem = None
+                    return
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "leituras_primario": self.leituras_primario,
+                "sessoes_no_primario": len(self._escritas),
+                "replicas": {
+                    replica.base: {"saudavel": replica.saudavel, "leituras": replica.leituras, "falhas": replica.falhas}
+                    for replica in self.replicas
+                },
+            }
+
+
+roteador = Roteador()
+
+
+def pode_ler_de_replica() -> bool:
+    """True se a requisição atual é uma leitura sem escrita recente da sessão."""
+    return roteador.ativo and _ler_de_replica.get()
+
+
+class MiddlewareReplicas:
+    """Middleware ASGI que decide, por requisição, se as leituras podem ir às réplicas."""
+
+    def __init__(self, app, roteador_: Optional[Roteador] = None):
+        self.app = app
+        self.roteador = roteador_ or roteador
+
+    @staticmethod
+    def _sessao(scope) -> str:
+        for nome, valor in scope.get("headers", []):
+            if nome.decode("latin-1").lower() == CABECALHO_SESSAO:
+                return "s:" + valor.decode("latin-1")
+        cliente = scope.get("client")
+        return "ip:" + (cliente[0] if cliente else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.roteador.ativo or not scope["path"].startswith(PREFIXO_API + "/"):
+            await self.app(scope, receive, send)
+            return
+        sessao = self._sessao(scope)
+        leitura = admissao.somente_leitura(scope["method"], scope["path"][len(PREFIXO_API):])
+        token = _ler_de_replica.set(leitura and not self.roteador.escreveu_recentemente(sessao))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _ler_de_replica.reset(token)
+            if not leitura:
+                self.roteador.registrar_escrita(sessao)
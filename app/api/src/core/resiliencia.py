@@ -0,0 +1,278 @@
+# Resiliência das chamadas ao Supabase: requisições "hedged" e disjuntor por tabela
+"""
+Duas defesas contra a cauda de latência do PostgREST:
+
+- Hedging: um GET idempotente que ainda não respondeu depois do p95 recente
+  daquela tabela ganha uma segunda tentativa em paralelo; vale a primeira
+  resposta boa. Um orçamento (HEDGE_ORCAMENTO) limita as duplicatas a uma
+  fração das chamadas, para não dobrar a carga justamente quando o Supabase
+  está lento.
+- Disjuntor: depois de DISJUNTOR_FALHAS falhas seguidas (erro de conexão,
+  timeout ou 5xx) numa tabela, as chamadas a ela falham na hora com
+  'CircuitoAberto' por DISJUNTOR_ABERTO segundos. Depois disso uma única
+  chamada de teste decide se o circuito fecha de novo.
+
+'CircuitoAberto' herda de 'requests.exceptions.ConnectionError', então o
+tratamento de erro que as rotas já têm (503) continua valendo; rotas com
+cache podem pegá-la e servir o último valor conhecido.
+
+Nas rotas de leitura, as tentativas do GET vão para as réplicas de leitura,
+quando configuradas (core/replicas.py).
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+
+from app.api.src.core import idempotencia, prazo, replicas
+
+load_dotenv()
+# Atraso do hedge enquanto não há amostras suficientes para o p95 (s)
+HEDGE_ATRASO_INICIAL = float(os.environ.get("HEDGE_ATRASO_INICIAL", "0.5"))
+# Atraso mínimo do hedge (s), para não duplicar chamadas que já são rápidas
+HEDGE_ATRASO_MINIMO = float(os.environ.get("HEDGE_ATRASO_MINIMO", "0.05"))
+# Fração máxima das chamadas que podem ganhar uma segunda tentativa; 0 desliga o hedging
+HEDGE_ORCAMENTO = float(os.environ.get("HEDGE_ORCAMENTO", "0.1"))
+# Threads que executam as tentativas dos GETs com hedge (acima do limite de admissão)
+HEDGE_WORKERS = int(os.environ.get("HEDGE_WORKERS", "64"))
+# Falhas seguidas que abrem o circuito de uma tabela
+DISJUNTOR_FALHAS = int(os.environ.get("DISJUNTOR_FALHAS", "5"))
+# Tempo (s) que o circuito fica aberto antes da chamada de teste
+DISJUNTOR_ABERTO = float(os.environ.get("DISJUNTOR_ABERTO", "10"))
+
+_AMOSTRAS_LATENCIA = 200
+_AMOSTRAS_MINIMAS = 20
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+
+class CircuitoAberto(requests.exceptions.ConnectionError):
+    """O circuito da tabela está aberto: a chamada nem foi feita."""
+
+
+def _tabela_da_url(url: str) -> str:
+    """Extrai o nome da tabela de uma URL do PostgREST ('.../rest/v1/<tabela>?...')."""
+    return urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+def _falhou(resultado: Any) -> bool:
+    """Conta como falha do upstream: exceção do requests ou resposta 5xx."""
+    if isinstance(resultado, BaseException):
+        return True
+    return resultado.status_code >= 500
+
+
+class Upstream:
+    """Latências recentes, disjuntor e contadores de uma tabela do Supabase."""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._latencias: Deque[float] = deque(maxlen=_AMOSTRAS_LATENCIA)
+        self._estado = FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        # Fichas do orçamento de hedge: cada chamada rende HEDGE_ORCAMENTO, cada hedge gasta 1
+        self._fichas = 1.0
+        self.contadores = {
+            "chamadas": 0, "falhas": 0, "recusadas_pelo_disjuntor": 0,
+            "hedges": 0, "hedges_vencedores": 0, "aberturas": 0,
+        }
+
+    # --- Disjuntor ---
+
+    def permitir(self) -> bool:
+        """Decide se a chamada pode ser feita; no meio-aberto só passa a de teste."""
+        with self._lock:
+            if self._estado == ABERTO and time.monotonic() - self._aberto_em >= DISJUNTOR_ABERTO:
+                self._estado = MEIO_ABERTO
+            if self._estado == FECHADO:
+                return True
+            if self._estado == MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            self.contadores["recusadas_pelo_disjuntor"] += 1
+            return False
+
+    def registrar(self, duracao: float, falhou: bool) -> None:
+        with self._lock:
+            self.contadores["chamadas"] += 1
+            self._fichas = min(10.0, self._fichas + HEDGE_ORCAMENTO)
+            self._teste_em_andamento = False
+            if not falhou:
+                self._latencias.append(duracao)
+                self._falhas_seguidas = 0
+                self._estado = FECHADO
+                return
+            self.contadores["falhas"] += 1
+            self._falhas_seguidas += 1
+            if self._estado == MEIO_ABERTO or self._falhas_seguidas >= DISJUNTOR_FALHAS:
+                if self._estado != ABERTO:
+                    self.contadores["aberturas"] += 1
+                self._estado = ABERTO
+                self._aberto_em = time.monotonic()
+
+    def cancelar(self) -> None:
+        """A chamada permitida nem saiu (prazo esgotado): libera a vaga da chamada de teste."""
+        with self._lock:
+            self._teste_em_andamento = False
+
+    # --- Hedging ---
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencias) < _AMOSTRAS_MINIMAS:
+                return None
+            ordenadas = sorted(self._latencias)
+        return ordenadas[int(0.95 * (len(ordenadas) - 1))]
+
+    def atraso_hedge(self) -> float:
+        p95 = self.p95()
+        return max(HEDGE_ATRASO_MINIMO, HEDGE_ATRASO_INICIAL if p95 is None else p95)
+
+    def gastar_ficha(self) -> bool:
+        """Reserva uma segunda tentativa, se o orçamento e o disjuntor permitirem."""
+        with self._lock:
+            if HEDGE_ORCAMENTO <= 0 or self._estado != FECHADO or self._fichas < 1.0:
+                return False
+            self._fichas -= 1.0
+            self.contadores["hedges"] += 1
+            return True
+
+    def contar_hedge_vencedor(self) -> None:
+        with self._lock:
+            self.contadores["hedges_vencedores"] += 1
+
+    def metricas(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "falhas_seguidas": self._falhas_seguidas,
+                "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+                **self.contadores,
+            }
+
+
+class Resiliencia:
+    """Registro dos upstreams e execução das chamadas protegidas."""
+
+    def __init__(self, workers: int = HEDGE_WORKERS):
+        self._lock = threading.Lock()
+        self._upstreams: Dict[str, Upstream] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+
+    def upstream(self, url: str) -> Upstream:
+        nome = _tabela_da_url(url)
+        with self._lock:
+            upstream = self._upstreams.get(nome)
+            if upstream is None:
+                upstream = self._upstreams[nome] = Upstream(nome)
+            return upstream
+
+    def _tentar(self, upstream: Upstream, funcao: Callable[..., requests.Response],
+                url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        inicio = time.monotonic()
+        try:
+            response = funcao(url, **kwargs)
+        except prazo.PrazoEsgotado:
+            # O prazo acabou antes de uma tentativa (ex.: a volta da réplica ao primário): não é falha do upstream
+            upstream.cancelar()
+            raise
+        except requests.exceptions.RequestException:
+            upstream.registrar(time.monotonic() - inicio, True)
+            raise
+        upstream.registrar(time.monotonic() - inicio, _falhou(response))
+        return response
+
+    def executar(self, url: str, funcao: Callable[..., requests.Response], **kwargs) -> requests.Response:
+        """
+        Chama 'funcao(url, **kwargs)' (ex.: requests.post) protegida pelo
+        disjuntor da tabela, sem hedge (para escritas).
+
+        Raises:
+            CircuitoAberto: Se o circuito da tabela estiver aberto.
+            prazo.PrazoEsgotado: Se o prazo da requisição já acabou.
+        """
+        kwargs["timeout"] = prazo.limitar_timeout(kwargs.get("timeout"))
+        upstream = self.upstream(url)
+        if not upstream.permitir():
+            raise CircuitoAberto(f"Supabase indisponível para '{upstream.nome}' (circuito aberto).")
+        # Daqui em diante a escrita pode chegar ao banco: a chave de idempotência não pode ser liberada
+        idempotencia.marcar_escrita_enviada()
+        return self._tentar(upstream, funcao, url, kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Como 'requests.get', com disjuntor e hedge: se a resposta demorar mais
+        que o p95 recente da tabela (ou falhar antes disso), dispara uma
+        segunda tentativa e devolve a primeira resposta sem falha.
+
+        Raises:
+            CircuitoAberto: Se o circuito da tabela estiver aberto.
+            prazo.PrazoEsgotado: Se o prazo da requisição acabar antes de uma resposta.
+            requests.exceptions.RequestException: Se todas as tentativas falharem.
+        """
+        kwargs["timeout"] = prazo.limitar_timeout(kwargs.get("timeout"))
+        fim_do_prazo = prazo.atual()
+        ler = replicas.roteador.ler if replicas.pode_ler_de_replica() else requests.get
+        upstream = self.upstream(url)
+        if not upstream.permitir():
+            raise CircuitoAberto(f"Supabase indisponível para '{upstream.nome}' (circuito aberto).")
+
+        def tentar() -> Future:
+            # As tentativas rodam em outras threads, com uma cópia do contexto: a réplica que
+            # falha cai no primário só com o que resta do prazo
+            contexto = contextvars.copy_context()
+            return self._executor.submit(contexto.run, self._tentar, upstream, ler, url, kwargs)
+
+        primeira = tentar()
+        pendentes = {primeira}
+        segunda_tentativa = False
+        ultima: Optional[Future] = None
+        while pendentes:
+            espera = None if segunda_tentativa else upstream.atraso_hedge()
+            if fim_do_prazo is not None:
+                resta = max(0.0, fim_do_prazo - time.monotonic())
+                espera = resta if espera is None else min(espera, resta)
+            concluidas, pendentes = wait(pendentes, timeout=espera, return_when=FIRST_COMPLETED)
+            if not concluidas and fim_do_prazo is not None and time.monotonic() >= fim_do_prazo:
+                # As tentativas seguem até o próprio timeout, mas ninguém mais espera por elas
+                raise prazo.PrazoEsgotado("O prazo da requisição se esgotou esperando o Supabase.")
+            if not concluidas:
+                # Passou do p95 sem resposta: dispara o hedge
+                segunda_tentativa = True
+                if upstream.gastar_ficha():
+                    pendentes.add(tentar())
+                continue
+            for tentativa in concluidas:
+                ultima = tentativa
+                if tentativa.exception() is None and not _falhou(tentativa.result()):
+                    if tentativa is not primeira:
+                        upstream.contar_hedge_vencedor()
+                    return tentativa.result()
+            if not pendentes and not segunda_tentativa:
+                # Falhou antes do atraso do hedge: tenta mais uma vez
+                segunda_tentativa = True
+                if upstream.gastar_ficha():
+                    pendentes.add(tentar())
+        # Todas falharam: devolve a última resposta 5xx ou relança o último erro
+        return ultima.result()
+
+    def metricas(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            upstreams = list(self._upstreams.values())
+        return {upstream.nome: upstream.metricas() for upstream in upstreams}
+
+
+resiliencia = Resiliencia()
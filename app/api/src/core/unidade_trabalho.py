@@ -0,0 +1,290 @@
+# Unidade de trabalho por requisição: deduplica leituras e agrupa escritas
+import functools
+import json
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from fastapi import HTTPException, status
+
+from app.api.src.core import prazo
+from app.api.src.core.resiliencia import resiliencia
+
+
+def _tabela_da_url(url: str) -> str:
+    """Extrai o nome da tabela de uma URL do PostgREST ('.../rest/v1/<tabela>?...')."""
+    return urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+def _resposta_local(status_code: int, corpo: Optional[Any]) -> requests.Response:
+    """Monta uma resposta no formato do 'requests' para uma escrita adiada."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b"" if corpo is None else json.dumps(corpo).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+class EscritasParciais(requests.exceptions.RequestException):
+    """Uma escrita falhou depois de outras da mesma unidade já terem sido gravadas."""
+
+    def __init__(self, confirmadas: List[str], falhou: str, causa: requests.exceptions.RequestException):
+        self.confirmadas = confirmadas
+        self.falhou = falhou
+        self.causa = causa
+        super().__init__(
+            f"Gravadas em {', '.join(confirmadas)}; a escrita em '{falhou}' falhou: {causa}",
+            response=getattr(causa, "response", None),
+        )
+
+
+class UnidadeTrabalho:
+    """
+    Acumula o trabalho com o Supabase feito durante uma requisição.
+
+    - Leituras (GET) idênticas são feitas uma única vez; a mesma resposta é
+      reaproveitada.
+    - Escritas (POST) são enfileiradas e enviadas em 'confirmar', agrupadas
+      em uma requisição por tabela (o PostgREST aceita uma lista de linhas).
+      Upserts para a mesma chave de conflito são fundidos, valendo o último.
+    - Uma leitura numa tabela com escritas pendentes confirma as escritas
+      antes, para que a requisição sempre leia o que acabou de escrever.
+
+    A resposta de uma escrita enfileirada é um 201 local: com
+    'return=representation' o corpo é o próprio payload, SEM as colunas
+    geradas pelo banco (id, created_at, defaults). Quem precisa da linha
+    gravada usa 'post(..., imediato=True)'.
+
+    Os efeitos colaterais das escritas (eventos, caches) são registrados com
+    'apos_escrita' e só executam depois que as escritas são confirmadas.
+
+    O prazo da requisição só é conferido antes da primeira escrita: depois
+    que ela sai, as demais são enviadas com o próprio timeout, para o prazo
+    não interromper a confirmação no meio.
+
+    Atenção: as escritas em tabelas diferentes não são atômicas entre si; se
+    uma falhar, as anteriores já terão sido gravadas ('EscritasParciais').
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._leituras: Dict[Tuple[str, str, Tuple], requests.Response] = {}
+        # (url, prefer) -> {"headers", "timeout", "linhas": {chave: linha}}
+        self._escritas: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._callbacks: List[Callable[[], None]] = []
+
+    # --- Leituras ---
+
+    def get(self, url: str, params: Optional[Any] = None, **kwargs) -> requests.Response:
+        tabela = _tabela_da_url(url)
+        # params como dicionário ou lista de pares (core/postgrest.py)
+        pares = params.items() if isinstance(params, dict) else (params or [])
+        chave = (tabela, url, tuple(sorted(pares)))
+        with self._lock:
+            if any(_tabela_da_url(u) == tabela for u, _ in self._escritas):
+                self.confirmar_escritas()
+            response = self._leituras.get(chave)
+            if response is not None:
+                return response
+
+        response = resiliencia.get(url, params=params, **kwargs)
+        if response.status_code < 400:
+            with self._lock:
+                self._leituras[chave] = response
+        return response
+
+    # --- Escritas ---
+
+    def post(self, url: str, json: Any = None, headers: Optional[Dict[str, str]] = None,
+             timeout: float = 15.0, imediato: bool = False, **kwargs) -> requests.Response:
+        """
+        Enfileira a escrita e devolve um 201 local (ver a docstring da classe).
+        Com 'imediato', envia as escritas pendentes e esta na hora, na ordem,
+        e devolve a resposta do Supabase.
+        """
+        headers = dict(headers or {})
+        prefer = headers.get("Prefer", "")
+        linhas = json if isinstance(json, list) else [json]
+        on_conflict = parse_qs(urlsplit(url).query).get("on_conflict", [None])[0]
+        colunas_conflito = on_conflict.split(",") if on_conflict else None
+        tabela = _tabela_da_url(url)
+
+        if imediato:
+            with self._lock:
+                # Confere o prazo uma vez; com as pendentes enviadas, esta também precisa sair
+                prazo.verificar()
+                with prazo.sem_prazo():
+                    self.confirmar_escritas()
+                    self._leituras = {k: v for k, v in self._leituras.items() if k[0] != tabela}
+                    return resiliencia.executar(
+                        url, requests.post, json=json, headers=headers, timeout=timeout, **kwargs
+                    )
+
+        with self._lock:
+            grupo = self._escritas.setdefault(
+                (url, prefer), {"headers": headers, "timeout": timeout, "linhas": {}}
+            )
+            grupo["timeout"] = max(grupo["timeout"], timeout)
+            for linha in linhas:
+                if colunas_conflito:
+                    chave = tuple(linha.get(c) for c in colunas_conflito)
+                else:
+                    chave = len(grupo["linhas"])
+                grupo["linhas"].pop(chave, None)
+                grupo["linhas"][chave] = linha
+            # Leituras anteriores desta tabela deixam de valer
+            self._leituras = {k: v for k, v in self._leituras.items() if k[0] != tabela}
+
+        corpo = linhas if "return=representation" in prefer else None
+        return _resposta_local(201, corpo)
+
+    def apos_escrita(self, callback: Callable[[], None]) -> None:
+        """Registra um efeito colateral para depois da confirmação das escritas."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def confirmar_escritas(self) -> None:
+        """
+        Envia as escritas pendentes, uma requisição por grupo (tabela + Prefer).
+
+        Raises:
+            prazo.PrazoEsgotado: Se o prazo acabou antes da primeira escrita (nada foi enviado).
+            EscritasParciais: Se uma escrita falhou depois de outras já gravadas.
+            requests.exceptions.RequestException: Se a primeira escrita falhou.
+        """
+        with self._lock:
+            if not self._escritas:
+                return
+            # Sem prazo, desiste antes de começar: nenhuma escrita é enviada
+            prazo.verificar()
+            escritas, self._escritas = self._escritas, {}
+            confirmadas: List[str] = []
+            with prazo.sem_prazo():
+                for (url, _), grupo in escritas.items():
+                    linhas = list(grupo["linhas"].values())
+                    # Com várias linhas, o PostgREST exige as mesmas colunas em todas
+                    colunas = list(dict.fromkeys(c for linha in linhas for c in linha))
+                    params = {"columns": ",".join(colunas)} if len(linhas) > 1 else None
+                    try:
+                        response = resiliencia.executar(
+                            url, requests.post, headers=grupo["headers"], params=params, json=linhas,
+                            timeout=grupo["timeout"]
+                        )
+                        response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        if confirmadas:
+                            raise EscritasParciais(confirmadas, _tabela_da_url(url), e) from e
+                        raise
+                    confirmadas.append(_tabela_da_url(url))
+
+    def confirmar(self) -> None:
+        """Confirma as escritas e executa os efeitos colaterais registrados."""
+        self.confirmar_escritas()
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+_unidade_atual: ContextVar[Optional[UnidadeTrabalho]] = ContextVar("unidade_trabalho", default=None)
+
+
+def unidade_atual() -> Optional[UnidadeTrabalho]:
+    return _unidade_atual.get()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Como 'requests.get' (com hedge e disjuntor), mas deduplicado dentro de uma unidade de trabalho."""
+    unidade = _unidade_atual.get()
+    if unidade is None:
+        return resiliencia.get(url, **kwargs)
+    return unidade.get(url, **kwargs)
+
+
+def post(url: str, imediato: bool = False, **kwargs) -> requests.Response:
+    """
+    Como 'requests.post', mas adiado para o fim da unidade de trabalho, se houver.
+
+    Adiada, a resposta é um 201 local com o payload ecoado, sem id/created_at;
+    'imediato=True' envia na hora e devolve a linha gravada.
+    """
+    unidade = _unidade_atual.get()
+    if unidade is None:
+        return resiliencia.executar(url, requests.post, **kwargs)
+    return unidade.post(url, imediato=imediato, **kwargs)
+
+
+def confirmar_escritas() -> None:
+    """
+    Envia já as escritas pendentes da unidade de trabalho atual (se houver),
+    para o que vem depois depender delas (ex.: a baixa do estoque, que o
+    coalescedor grava fora da unidade, só depois da venda gravada).
+
+    Raises:
+        HTTPException: Se as escritas não puderem ser confirmadas.
+    """
+    unidade = _unidade_atual.get()
+    if unidade is not None:
+        _com_erros_http(unidade.confirmar_escritas)
+
+
+def _com_erros_http(confirmar: Callable[[], None]) -> None:
+    """Executa 'confirmar', convertendo as falhas do Supabase em HTTPException."""
+    try:
+        confirmar()
+    except EscritasParciais as e:
+        # Não é 504 nem 503: parte das escritas foi gravada e o cliente precisa saber qual
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Escritas confirmadas só em parte: {e}"
+        )
+    except prazo.PrazoEsgotado as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Prazo esgotado; as escritas não foram confirmadas: {e}"
+        )
+    except requests.exceptions.HTTPError as e:
+        error_detail = e.response.text if e.response is not None else str(e)
+        raise HTTPException(
+            status_code=e.response.status_code if e.response is not None else 500,
+            detail=f"Erro do Supabase ao confirmar as escritas: {error_detail}"
+        )
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Erro de comunicação ao confirmar as escritas: {e}"
+        )
+
+
+def apos_escrita(callback: Callable[[], None]) -> None:
+    """Executa 'callback' agora ou, dentro de uma unidade de trabalho, após a confirmação."""
+    unidade = _unidade_atual.get()
+    if unidade is None:
+        callback()
+    else:
+        unidade.apos_escrita(callback)
+
+
+def unidade_de_trabalho(funcao: Callable) -> Callable:
+    """
+    Decorador para rotas com várias chamadas ao Supabase. Abre uma unidade de
+    trabalho (propagada por contextvars) durante a execução da rota e
+    confirma as escritas ao final. Se já houver uma unidade aberta, participa dela.
+    """
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        if _unidade_atual.get() is not None:
+            return funcao(*args, **kwargs)
+
+        unidade = UnidadeTrabalho()
+        token = _unidade_atual.set(unidade)
+        try:
+            resultado = funcao(*args, **kwargs)
+            _com_erros_http(unidade.confirmar)
+            return resultado
+        finally:
+            _unidade_atual.reset(token)
+
+    return wrapper
@@ -0,0 +1,105 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.src.core.admin import exigir_admin
+from app.api.src.core.memoria import rastreador_memoria
+from app.api.src.core.perfil import amostrador_perfil
+from app.api.src.schemas.admin import DiferencaMemoriaResponse, EstadoMemoriaResponse, PerfilResponse
+
+# Todas as rotas exigem o cabeçalho 'X-Admin-Token'
+router = APIRouter(dependencies=[Depends(exigir_admin)])
+
+
+def _resumo_perfil() -> dict:
+    return {
+        "intervalo_ms": amostrador_perfil.intervalo * 1000,
+        "amostras": amostrador_perfil.amostras,
+        "sessao_restante_s": round(amostrador_perfil.sessao_restante(), 1),
+        "rotas": amostrador_perfil.resumo(),
+    }
+
+
+# --- Profiler ---
+
+@router.get(
+    "/perfil",
+    response_model=PerfilResponse,
+    summary="Resumo do profiler por rota",
+    description="Amostras coletadas por rota desde a última limpeza."
+)
+def obter_perfil():
+    return _resumo_perfil()
+
+
+@router.post(
+    "/perfil/sessao",
+    response_model=PerfilResponse,
+    summary="Amostra todas as requisições por alguns segundos"
+)
+def iniciar_sessao_perfil(segundos: float = Query(30, gt=0, le=600)):
+    amostrador_perfil.iniciar_sessao(segundos)
+    return _resumo_perfil()
+
+
+@router.get(
+    "/perfil/grafico",
+    summary="Flame graph de uma rota",
+    description=(
+        "Com 'formato=speedscope', um JSON para abrir em https://www.speedscope.app; com "
+        "'formato=colapsado', pilhas colapsadas para flamegraph.pl/inferno."
+    )
+)
+def obter_grafico_perfil(
+    rota: str = Query(..., description="Rota como aparece no resumo, ex.: 'GET /api/v1/cobranca/pendentes'"),
+    formato: Literal["speedscope", "colapsado"] = Query("speedscope"),
+):
+    if rota not in {item["rota"] for item in amostrador_perfil.resumo()}:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Nenhuma amostra para a rota '{rota}'.")
+    if formato == "colapsado":
+        return PlainTextResponse(amostrador_perfil.colapsado(rota))
+    return JSONResponse(
+        amostrador_perfil.speedscope(rota),
+        headers={"Content-Disposition": 'attachment; filename="perfil.speedscope.json"'},
+    )
+
+
+@router.delete("/perfil", status_code=status.HTTP_204_NO_CONTENT, summary="Descarta as amostras")
+def limpar_perfil():
+    amostrador_perfil.limpar()
+
+
+# --- Memória (tracemalloc) ---
+
+@router.post(
+    "/memoria/base",
+    response_model=EstadoMemoriaResponse,
+    summary="Liga o tracemalloc e tira o snapshot de base"
+)
+def tirar_base_memoria():
+    return rastreador_memoria.tirar_base()
+
+
+@router.get(
+    "/memoria/diferenca",
+    response_model=DiferencaMemoriaResponse,
+    summary="Pontos de alocação que mais cresceram desde a base"
+)
+def obter_diferenca_memoria(
+    limite: int = Query(20, gt=0, le=500),
+    agrupar: Literal["lineno", "filename", "traceback"] = Query("lineno"),
+    atualizar_base: bool = Query(False, description="Usa o snapshot novo como base da próxima diferença"),
+):
+    try:
+        return rastreador_memoria.diferenca(limite=limite, agrupar=agrupar, atualizar_base=atualizar_base)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/memoria", response_model=EstadoMemoriaResponse, summary="Estado do tracemalloc")
+def obter_estado_memoria():
+    return rastreador_memoria.estado()
+
+
+@router.delete("/memoria", status_code=status.HTTP_204_NO_CONTENT, summary="Desliga o tracemalloc")
+def parar_memoria():
+    rastreador_memoria.parar()
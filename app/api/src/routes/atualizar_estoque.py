@@ -5,6 +5,8 @@ from typing import Dict, Any
 from pydantic import BaseModel, Field
 from fastapi import APIRouter
 from app.api.src.schemas.produto import Produto, ProdutoUpdateEstoque,ProdutoAddEstoque
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.resiliencia import resiliencia
 
 router = APIRouter()
 
@@ -72,11 +74,12 @@ def atualizar_estoque(categoria_produto: str, nova_quantidade: int) -> int:
     table_name = "Estoque"
     try:
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        params = {"categoria": f"eq.{categoria_produto}"}
+        consulta = Consulta(table_name).eq("categoria", categoria_produto)
         payload = {"quantidade": nova_quantidade}
 
-        response = requests.patch(url, headers=headers, params=params, json=payload, timeout=15.0)
+        response = resiliencia.executar(
+            consulta.url, requests.patch, headers=headers, params=consulta.params(), json=payload, timeout=15.0
+        )
 
         if response.status_code >= 400:
             try:
@@ -112,10 +115,9 @@ def add_to_stock(categoria_produto: str, quantidade_a_adicionar: int) -> int:
     table_name = "Estoque"
     try:
         headers = _get_headers()
-        get_url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        get_params = {"categoria": f"eq.{categoria_produto}", "select": "quantidade"}
+        consulta = Consulta(table_name).select("quantidade").eq("categoria", categoria_produto)
         
-        get_response = requests.get(get_url, headers=headers, params=get_params, timeout=15.0)
+        get_response = resiliencia.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
 
         if get_response.status_code >= 400:
             raise StandardHTTPException(detail=get_response.json(), status_code=get_response.status_code)
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+from fastapi import APIRouter, HTTPException, Request, status
+from dotenv import load_dotenv
+from app.api.src.schemas.batch import BatchRequest, BatchResponse, OperacaoBatch
+load_dotenv()
+# Limite de operações por chamada e de operações rodando ao mesmo tempo
+BATCH_MAX_OPERACOES = int(os.environ.get("BATCH_MAX_OPERACOES", "50"))
+BATCH_CONCORRENCIA = int(os.environ.get("BATCH_CONCORRENCIA", "8"))
+
+router = APIRouter()
+
+# Cabeçalhos da requisição externa que não fazem sentido nas operações internas.
+# A 'Idempotency-Key' do batch vira uma chave por operação ('<chave>:<id>'):
+# repassada igual, todas as operações colidiriam na mesma chave.
+_CABECALHOS_IGNORADOS = {
+    "content-length", "content-type", "transfer-encoding", "connection", "expect", "idempotency-key",
+}
+
+
+async def _executar(request: Request, prefixo: str, operacao: OperacaoBatch) -> Dict[str, Any]:
+    """
+    Executa uma operação chamando a própria aplicação ASGI, sem rede: passa
+    pelo mesmo roteamento, validação e tratamento de erros de uma chamada HTTP.
+    """
+    corpo = b"" if operacao.corpo is None else json.dumps(operacao.corpo).encode("utf-8")
+    caminho = prefixo + "/" + operacao.caminho.lstrip("/")
+    cabecalhos = [
+        (nome, valor) for nome, valor in request.scope["headers"]
+        if nome.decode("latin-1").lower() not in _CABECALHOS_IGNORADOS
+    ]
+    extras = {nome.lower(): valor for nome, valor in operacao.cabecalhos.items()}
+    chave_batch = request.headers.get("idempotency-key")
+    if chave_batch and "idempotency-key" not in extras:
+        extras["idempotency-key"] = f"{chave_batch}:{operacao.id}"
+    cabecalhos += [(nome.encode("latin-1"), valor.encode("latin-1")) for nome, valor in extras.items()]
+    cabecalhos += [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": operacao.metodo,
+        "scheme": request.scope.get("scheme", "http"),
+        "path": caminho,
+        "raw_path": caminho.encode("utf-8"),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": urlencode(operacao.query or {}, doseq=True).encode("utf-8"),
+        "headers": cabecalhos,
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+    }
+
+    pendente = [{"type": "http.request", "body": corpo, "more_body": False}]
+    terminou = asyncio.Event()
+    resposta: Dict[str, Any] = {"status_code": 500, "headers": [], "corpo": b""}
+
+    async def receive():
+        if pendente:
+            return pendente.pop()
+        await terminou.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(mensagem):
+        if mensagem["type"] == "http.response.start":
+            resposta["status_code"] = mensagem["status"]
+            resposta["headers"] = mensagem.get("headers", [])
+        elif mensagem["type"] == "http.response.body":
+            resposta["corpo"] += mensagem.get("body", b"")
+            if not mensagem.get("more_body", False):
+                terminou.set()
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception as e:
+        return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "corpo": {"detail": f"Erro inesperado: {e}"}}
+    finally:
+        terminou.set()
+
+    tipo = dict(resposta["headers"]).get(b"content-type", b"").decode("latin-1")
+    conteudo = resposta["corpo"]
+    if "json" in tipo and conteudo:
+        conteudo = json.loads(conteudo)
+    else:
+        conteudo = conteudo.decode("utf-8", errors="replace") or None
+    return {"status_code": resposta["status_code"], "corpo": conteudo}
+
+
+def _validar(operacoes: List[OperacaoBatch]) -> None:
+    """Confere limites, ids únicos e dependências apontando para operações anteriores."""
+    if len(operacoes) > BATCH_MAX_OPERACOES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"O batch aceita no máximo {BATCH_MAX_OPERACOES} operações."
+        )
+    vistos = set()
+    for posicao, operacao in enumerate(operacoes):
+        if operacao.id is None:
+            operacao.id = str(posicao)
+        if operacao.id in vistos:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Id de operação repetido: '{operacao.id}'."
+            )
+        desconhecidas = [d for d in operacao.depende_de if d not in vistos]
+        if desconhecidas:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"A operação '{operacao.id}' depende de operações inexistentes ou posteriores: {', '.join(desconhecidas)}."
+            )
+        if operacao.caminho.lstrip("/").split("/", 1)[0] == "batch":
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Operações de batch não podem chamar o próprio /batch."
+            )
+        vistos.add(operacao.id)
+
+
+@router.post(
+    "/",
+    response_model=BatchResponse,
+    summary="Executa várias operações da API em uma única requisição",
+    description=(
+        "Recebe uma lista ordenada de chamadas às rotas existentes (ex.: /vendas/vender, "
+        "/cobranca/pagar_cobranca, /estoque/adicionar_ao_estoque) e as executa no próprio servidor. "
+        "Operações sem dependência entre si rodam em paralelo; 'depende_de' ou 'sequencial' impõem ordem. "
+        "Uma operação cuja dependência falhou não é executada e retorna 424."
+    )
+)
+async def executar_batch(batch: BatchRequest, request: Request):
+    """
+    Endpoint de batch para clientes com alta latência (ex.: PDV móvel em 3G):
+    uma sincronização de turno vira uma única ida e volta.
+    """
+    operacoes = batch.operacoes
+    _validar(operacoes)
+    # '/api/v1/batch/' -> '/api/v1': as operações usam caminhos relativos à API
+    prefixo = request.url.path.rstrip("/").rsplit("/", 1)[0]
+    limite = asyncio.Semaphore(BATCH_CONCORRENCIA)
+    tarefas: Dict[str, asyncio.Task] = {}
+
+    async def rodar(operacao: OperacaoBatch, anterior: Optional[str]) -> Dict[str, Any]:
+        # Em modo sequencial a operação anterior só define a ordem; apenas as
+        # dependências declaradas impedem a execução quando falham
+        if batch.sequencial and anterior is not None:
+            await tarefas[anterior]
+        falhas = [d for d in operacao.depende_de if (await tarefas[d])["status_code"] >= 400]
+
+        inicio = time.monotonic()
+        if falhas:
+            resultado = {
+                "status_code": status.HTTP_424_FAILED_DEPENDENCY,
+                "corpo": {"detail": f"Não executada: a(s) operação(ões) {', '.join(falhas)} falharam."},
+            }
+        else:
+            async with limite:
+                resultado = await _executar(request, prefixo, operacao)
+        resultado["id"] = operacao.id
+        resultado["duracao_ms"] = round((time.monotonic() - inicio) * 1000, 1)
+        return resultado
+
+    anterior = None
+    for operacao in operacoes:
+        tarefas[operacao.id] = asyncio.ensure_future(rodar(operacao, anterior))
+        anterior = operacao.id
+
+    return {"resultados": [await tarefas[operacao.id] for operacao in operacoes]}
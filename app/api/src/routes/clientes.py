@@ -1,7 +1,11 @@
 # Continuação do seu arquivo principal da API (ex: main.py ou routers/clientes.py)
 import requests
 from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+from app.api.src.core.busca import IndiceBusca
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.core.postgrest import Consulta
 
 import os
 from dotenv import load_dotenv
@@ -12,6 +16,8 @@ router = APIRouter()
 load_dotenv()
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Intervalo da recarga completa do índice de busca; as mudanças chegam antes pelo consumidor
+BUSCA_TTL = float(os.environ.get("BUSCA_TTL", "600"))
 
 from typing import List, Dict, Any
 def _get_headers() -> dict:
@@ -63,10 +69,10 @@ def listar_clientes():
         
         # URL para buscar todos os dados da tabela 'Cliente'
         # O parâmetro 'select=*' (opcional, mas recomendado) garante que todas as colunas sejam retornadas
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}?select=*"
+        consulta = Consulta(table_name).select("*")
         
         # O método HTTP para leitura de dados é GET
-        response = requests.get(url, headers=headers, timeout=15.0)
+        response = resiliencia.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
         
         # Lança exceção se a resposta não for 2xx
         response.raise_for_status()
@@ -90,4 +96,67 @@ def listar_clientes():
     
     # O Pydantic (usado por FastAPI) irá validar a lista de dicionários
     # com base no modelo ClienteOutput antes de retornar a resposta.
-    return clientes_data
\ No newline at end of file
+    return clientes_data
+
+
+# --- Busca de Clientes (autocomplete) ---
+
+indice_clientes = IndiceBusca(ttl=BUSCA_TTL)
+
+
+def _aplicar_mudanca_cliente(mudanca: Mudanca) -> None:
+    """Mantém o índice de busca em dia com as mudanças na tabela 'Cliente'."""
+    registro = mudanca.registro or mudanca.antigo
+    if registro.get("id") is None:
+        return
+    if mudanca.tipo == "DELETE":
+        indice_clientes.remover(registro["id"])
+    elif registro.get("name") is not None:
+        indice_clientes.adicionar(registro["id"], registro["name"], registro)
+
+
+consumidor.registrar("Cliente", _aplicar_mudanca_cliente)
+
+
+def _carregar_indice_clientes():
+    """Busca todos os clientes no Supabase e os converte em entradas do índice."""
+    consulta = Consulta("Cliente").select("id", "name", "status")
+    response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+    response.raise_for_status()
+    return [(cliente["id"], cliente["name"], cliente) for cliente in response.json()]
+
+
+@router.get(
+    "/buscar",
+    response_model=List[ClienteOutput],
+    status_code=status.HTTP_200_OK,
+    summary="Busca clientes pelo nome (autocomplete)",
+    description=(
+        "Retorna os clientes cujo nome (ou alguma palavra do nome) começa com o termo "
+        "informado, ignorando acentos e tolerando pequenos erros de digitação."
+    )
+)
+def buscar_clientes(
+    q: str = Query(..., min_length=1, description="Termo digitado"),
+    limite: int = Query(10, gt=0, le=50, description="Número máximo de resultados"),
+):
+    """
+    Responde a partir de um índice em memória, sem consultar o Supabase a
+    cada tecla. O índice é carregado na primeira chamada e atualizado
+    incrementalmente pelo consumidor de mudanças.
+    """
+    try:
+        indice_clientes.garantir_carregado(_carregar_indice_clientes)
+    except requests.exceptions.HTTPError as e:
+        error_detail = e.response.text if e.response else str(e)
+        raise HTTPException(
+            status_code=e.response.status_code if e.response else 500,
+            detail=f"Erro do Supabase: {error_detail}"
+        )
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Erro de comunicação com o Supabase: {e}"
+        )
+
+    return indice_clientes.buscar(q, limite)
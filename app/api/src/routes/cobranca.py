@@ -1,25 +1,41 @@
 import requests
 from datetime import datetime,timezone, date
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+import heapq
 from typing import Optional
 import os
 from datetime import date, datetime, time, timedelta
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from app.api.src.routes.vender import Venda
+from app.api.src.core.eventos import barramento
+from app.api.src.core.cache import CacheTTL, AUSENTE
+from app.api.src.core.mudancas import cache_ttl_padrao, consumidor, Mudanca
+from app.api.src.core import unidade_trabalho
+from app.api.src.core import aging
+from app.api.src.core.resiliencia import resiliencia, CircuitoAberto
+from app.api.src.core.postgrest import Consulta
 from typing import List, Dict, Any
 TODAY = date.today() # Data de hoje (apenas a parte da data)
 router = APIRouter()
-from app.api.src.schemas.cobranca import CobrancaDetalheResponse, CobrancaPagaResponse, FinancialSummaryResponse, PagarCobrancaInput,PagarCobrancaResponse
+from app.api.src.schemas.cobranca import CobrancaDetalheResponse, CobrancaPagaResponse, FinancialSummaryResponse, PagarCobrancaInput,PagarCobrancaResponse, RecebiveisPorClienteResponse, AgingRecebiveisResponse
+from app.api.src.core.registro import obter_logger
 # --- Configuração do Supabase ---
 load_dotenv()
+logger = obter_logger("cobranca")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
+# TTL do cache de cobranças; longo só quando o consumidor de mudanças recebe as edições (core/mudancas.py)
+COBRANCA_CACHE_TTL = float(os.environ.get("COBRANCA_CACHE_TTL") or cache_ttl_padrao())
+
 # Validação das variáveis de ambiente
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL e SUPABASE_KEY devem estar configuradas no .env")
 
+# Chaves: True (pagas) e False (não pagas); cada valor é um dict id -> linha
+cache_cobrancas = CacheTTL(ttl=COBRANCA_CACHE_TTL)
+
 # --- Funções Auxiliares ---
 def _get_headers() -> dict:
     """
@@ -32,6 +48,58 @@ def _get_headers() -> dict:
         "Prefer": "return=representation"  # ✅ Header importante!
     }
 
+def _aplicar_mudanca_cobranca(mudanca: Mudanca) -> None:
+    """Atualiza, pelo id, as listas de cobranças guardadas no cache."""
+    registro = mudanca.registro or mudanca.antigo
+    id_cobranca = registro.get("id")
+    if id_cobranca is None or (mudanca.tipo != "DELETE" and "status_pagamento" not in registro):
+        # Sem o id ou o status não dá para saber em qual lista a linha está
+        cache_cobrancas.invalidar_tudo()
+        return
+
+    def remover(linhas: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        return {k: v for k, v in linhas.items() if k != id_cobranca}
+
+    def inserir(linhas: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        return {**linhas, id_cobranca: dict(mudanca.registro)}
+
+    if mudanca.tipo == "DELETE":
+        cache_cobrancas.atualizar(True, remover)
+        cache_cobrancas.atualizar(False, remover)
+        return
+
+    pago = bool(mudanca.registro["status_pagamento"])
+    cache_cobrancas.atualizar(not pago, remover)
+    cache_cobrancas.atualizar(pago, inserir)
+
+
+consumidor.registrar("Cobranca", _aplicar_mudanca_cobranca)
+
+
+def _buscar_cobrancas(pagas: bool) -> List[Dict[str, Any]]:
+    """
+    Retorna as linhas da tabela 'Cobranca' com o 'status_pagamento' informado,
+    usando o cache quando possível. Com o circuito do Supabase aberto, serve a
+    última lista conhecida, mesmo expirada.
+
+    Raises:
+        requests.exceptions.RequestException: Se a requisição ao Supabase falhar.
+    """
+    def carregar() -> Dict[int, Dict[str, Any]]:
+        consulta = Consulta("Cobranca").eq("status_pagamento", pagas)
+        response = resiliencia.get(consulta.url, headers=_get_headers(), params=consulta.params(), timeout=15.0)
+        response.raise_for_status()
+        return {linha["id"]: linha for linha in response.json()}
+
+    try:
+        return list(cache_cobrancas.obter_ou_carregar(pagas, carregar).values())
+    except CircuitoAberto:
+        linhas = cache_cobrancas.obter_vencido(pagas)
+        if linhas is AUSENTE:
+            raise
+        return list(linhas.values())
+
+
 # --- Modelo de Dados de Entrada ---
 class CobrancaInput(BaseModel):
     """
@@ -96,9 +164,11 @@ def adicionar_cobranca(cobranca: CobrancaInput):
     
     try:
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
+        url = Consulta(table_name).url
         
-        response = requests.post(url, headers=headers, json=payload, timeout=15.0)
+        # Dentro de uma unidade de trabalho (ex.: /vendas/vender) a resposta ecoa
+        # o payload, sem id/created_at; só os campos do payload são usados abaixo
+        response = unidade_trabalho.post(url, headers=headers, json=payload, timeout=15.0)
         
         # Para debug, você pode descomentar:
         # print(f"Status: {response.status_code}")
@@ -112,10 +182,11 @@ def adicionar_cobranca(cobranca: CobrancaInput):
     except requests.exceptions.HTTPError as e:
         # Captura erros HTTP específicos (400, 404, 500, etc.)
         error_detail = e.response.text if e.response else str(e)
-        # Log para debug
-        print(f"Erro HTTP Status: {e.response.status_code if e.response else 'N/A'}")
-        print(f"Payload enviado: {payload}")
-        print(f"Response do Supabase: {error_detail}")
+        logger.error("Erro do Supabase ao criar cobrança", extra={"campos": {
+            "status_supabase": e.response.status_code if e.response else None,
+            "payload": payload,
+            "resposta": error_detail,
+        }})
         raise HTTPException(
             status_code=e.response.status_code if e.response else 500,
             detail=f"Erro do Supabase: {error_detail}"
@@ -126,6 +197,16 @@ def adicionar_cobranca(cobranca: CobrancaInput):
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Erro de comunicação com o Supabase: {e}"
         )
+
+    def notificar():
+        for linha in data:
+            consumidor.aplicar(Mudanca(tabela=table_name, tipo="INSERT", registro=linha))
+
+        # Notifica os assinantes do stream de eventos
+        barramento.publicar("cobranca", {"acao": "criada", "cobrancas": data})
+
+    # Dentro de uma unidade de trabalho, só notifica depois que a escrita for confirmada
+    unidade_trabalho.apos_escrita(notificar)
     
     return {
         "message": f"Cobrança para o cliente '{cobranca.cliente}' adicionada com sucesso!",
@@ -145,16 +226,9 @@ def obter_relatorio_pendentes():
     Consulta a tabela 'Cobranca' e retorna um relatório com o total de
     cobranças pendentes, vencidas e o valor total a receber.
     """
-    table_name = "Cobranca"
-    
     # 1. Busca apenas as cobranças que não foram pagas
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}?status_pagamento=eq.false"
-    
     try:
-        headers = _get_headers()
-        response = requests.get(url, headers=headers, timeout=15.0)
-        response.raise_for_status()
-        cobrancas_nao_pagas = response.json()
+        cobrancas_nao_pagas = _buscar_cobrancas(pagas=False)
     except requests.exceptions.HTTPError as e:
         error_detail = e.response.text if e.response else str(e)
         raise HTTPException(
@@ -201,6 +275,152 @@ def obter_relatorio_pendentes():
     }
 
 
+# Critérios de ordenação aceitos pela rota /por_cliente
+ORDENACOES_POR_CLIENTE = {
+    "total_a_receber": lambda c: c["total_a_receber"],
+    "valor_vencidas": lambda c: c["vencidas"]["valor_total"],
+    "quantidade": lambda c: c["pendentes"]["quantidade"] + c["vencidas"]["quantidade"],
+    "vencimento_mais_antigo": lambda c: c["vencimento_mais_antigo"],
+    "cliente": lambda c: c["cliente"].casefold(),
+}
+
+
+def agrupar_por_cliente(cobrancas: List[Dict[str, Any]], agora: datetime) -> List[Dict[str, Any]]:
+    """
+    Agrupa as cobranças não pagas por cliente em uma única passada,
+    somando quantidade e valor de pendentes e vencidas.
+    """
+    grupos: Dict[str, Dict[str, Any]] = {}
+    for cobranca in cobrancas:
+        vencimento = datetime.fromisoformat(cobranca["vencimento"])
+        valor = float(cobranca["valor"])
+        cliente = cobranca.get("cliente", "N/A")
+
+        grupo = grupos.get(cliente)
+        if grupo is None:
+            grupo = grupos[cliente] = {
+                "cliente": cliente,
+                "pendentes": {"quantidade": 0, "valor_total": 0.0},
+                "vencidas": {"quantidade": 0, "valor_total": 0.0},
+                "total_a_receber": 0.0,
+                "vencimento_mais_antigo": vencimento,
+            }
+
+        situacao = grupo["pendentes"] if vencimento > agora else grupo["vencidas"]
+        situacao["quantidade"] += 1
+        situacao["valor_total"] += valor
+        grupo["total_a_receber"] += valor
+        if vencimento < grupo["vencimento_mais_antigo"]:
+            grupo["vencimento_mais_antigo"] = vencimento
+
+    return list(grupos.values())
+
+
+@router.get(
+    "/por_cliente",
+    response_model=RecebiveisPorClienteResponse,
+    summary="Saldo a receber agrupado por cliente"
+)
+def obter_recebiveis_por_cliente(
+    pagina: int = Query(1, gt=0, description="O número da página para retornar"),
+    itens_por_pagina: int = Query(20, gt=0, le=500, description="Clientes por página"),
+    ordenar_por: str = Query("total_a_receber", description=f"Um de: {', '.join(ORDENACOES_POR_CLIENTE)}"),
+    ordem: str = Query("desc", pattern="^(asc|desc)$", description="'asc' ou 'desc'"),
+    top: int = Query(5, ge=0, le=100, description="Quantos maiores devedores retornar"),
+):
+    """
+    Retorna, para cada cliente com cobranças não pagas, a quantidade e a soma
+    das cobranças pendentes e vencidas, o vencimento mais antigo e a lista dos
+    maiores devedores.
+
+    O agrupamento é feito sobre as cobranças não pagas em cache, sem que o
+    front-end precise baixar todas as linhas de '/pendentes'.
+    """
+    chave_ordenacao = ORDENACOES_POR_CLIENTE.get(ordenar_por)
+    if chave_ordenacao is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"'ordenar_por' deve ser um de: {', '.join(ORDENACOES_POR_CLIENTE)}"
+        )
+
+    try:
+        cobrancas_nao_pagas = _buscar_cobrancas(pagas=False)
+    except requests.exceptions.HTTPError as e:
+        error_detail = e.response.text if e.response else str(e)
+        raise HTTPException(
+            status_code=e.response.status_code if e.response else 500,
+            detail=f"Erro do Supabase: {error_detail}"
+        )
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Erro de comunicação com o Supabase: {e}"
+        )
+
+    try:
+        clientes = agrupar_por_cliente(cobrancas_nao_pagas, datetime.now(timezone.utc))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar os dados recebidos do Supabase. Campo faltando ou tipo inválido: {e}"
+        )
+
+    clientes.sort(key=chave_ordenacao, reverse=(ordem == "desc"))
+    inicio = (pagina - 1) * itens_por_pagina
+
+    return {
+        "total_clientes": len(clientes),
+        "pagina": pagina,
+        "itens_por_pagina": itens_por_pagina,
+        "clientes": clientes[inicio:inicio + itens_por_pagina],
+        "maiores_devedores": heapq.nlargest(top, clientes, key=lambda c: c["total_a_receber"]),
+    }
+
+
+@router.get(
+    "/aging",
+    response_model=AgingRecebiveisResponse,
+    summary="Aging das cobranças não pagas por faixa de atraso"
+)
+def obter_aging_recebiveis(
+    faixas: Optional[str] = Query(
+        None, description="Limites das faixas em dias, separados por vírgula (padrão: AGING_FAIXAS, '30,60,90')"
+    ),
+):
+    """
+    Retorna, no total e por cliente, a quantidade e a soma das cobranças não
+    pagas a vencer e em cada faixa de dias de atraso (0-30, 31-60, 61-90, 90+).
+
+    As datas e valores são processados em lote com NumPy (ver core/aging.py).
+    """
+    try:
+        limites = aging.limites_de_texto(faixas if faixas is not None else aging.AGING_FAIXAS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    try:
+        cobrancas_nao_pagas = _buscar_cobrancas(pagas=False)
+    except requests.exceptions.HTTPError as e:
+        error_detail = e.response.text if e.response else str(e)
+        raise HTTPException(
+            status_code=e.response.status_code if e.response else 500,
+            detail=f"Erro do Supabase: {error_detail}"
+        )
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Erro de comunicação com o Supabase: {e}"
+        )
+
+    try:
+        return aging.aging_de_cobrancas(cobrancas_nao_pagas, limites=limites)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar os dados recebidos do Supabase. Campo faltando ou tipo inválido: {e}"
+        )
+
+
 @router.get(
     "/cobrancas_ativas",
     response_model=List[CobrancaDetalheResponse],
@@ -225,16 +445,9 @@ def listar_cobrancas_ativas():
     hoje = date.today()
     cobrancas_formatadas = []
 
-    table_name = "Cobranca"
-    
     # 1. Busca apenas as cobranças que não foram pagas
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}?status_pagamento=eq.false"
     try:
-        headers = _get_headers()
-        response = requests.get(url, headers=headers, timeout=15.0)
-        response.raise_for_status()
-
-        cobrancas_ativas = response.json()
+        cobrancas_ativas = _buscar_cobrancas(pagas=False)
 
         # ✅ Itera sobre os resultados para formatar a resposta
         for cobranca in cobrancas_ativas:
@@ -298,17 +511,10 @@ def listar_cobrancas_pagas():
         HTTPException: Se ocorrer um erro na comunicação com o Supabase.
     """
     cobrancas_formatadas = []
-    table_name = "Cobranca"
-    
-    # ✅ Altera o filtro para buscar cobranças com status_pagamento igual a TRUE
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}?status_pagamento=eq.true"
     
+    # ✅ Busca as cobranças com status_pagamento igual a TRUE
     try:
-        headers = _get_headers()
-        response = requests.get(url, headers=headers, timeout=15.0)
-        response.raise_for_status()
-
-        cobrancas_pagas = response.json()
+        cobrancas_pagas = _buscar_cobrancas(pagas=True)
 
         # Itera sobre os resultados para formatar a resposta
         for cobranca in cobrancas_pagas:
@@ -371,19 +577,22 @@ def pagar_cobranca(cobranca_info: PagarCobrancaInput):
     start_of_day = datetime.combine(cobranca_info.vencimento, time.min)
     end_of_day = start_of_day + timedelta(days=1)
     
-    params = {
-        "cliente": f"eq.{cobranca_info.cliente}",
-        "valor": f"eq.{cobranca_info.valor}",
-        "vencimento": f"gte.{start_of_day.isoformat()}", # gte = Greater Than or Equal
-        "vencimento": f"lt.{end_of_day.isoformat()}",   # lt = Less Than
-    }
+    # Os dois limites do intervalo vão na query (num dicionário, o 'lt' apagava o 'gte')
+    consulta = (
+        Consulta(table_name)
+        .eq("cliente", cobranca_info.cliente)
+        .eq("valor", cobranca_info.valor)
+        .entre("vencimento", start_of_day, end_of_day)
+        .retorno("representation")
+    )
 
     try:
-        headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
+        headers = consulta.headers(_get_headers())
         
         # Usamos o método PATCH para atualizar dados existentes
-        response = requests.patch(url, headers=headers, params=params, json=payload, timeout=15.0)
+        response = resiliencia.executar(
+            consulta.url, requests.patch, headers=headers, params=consulta.params(), json=payload, timeout=15.0
+        )
         
         response.raise_for_status()
         
@@ -407,6 +616,12 @@ def pagar_cobranca(cobranca_info: PagarCobrancaInput):
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Erro de comunicação com o Supabase: {e}"
         )
+
+    for linha in data:
+        consumidor.aplicar(Mudanca(tabela=table_name, tipo="UPDATE", registro=linha))
+
+    # Notifica os assinantes do stream de eventos
+    barramento.publicar("cobranca", {"acao": "paga", "cobrancas": data})
         
     return {
         "message": f"Pagamento da cobrança para '{cobranca_info.cliente}' registrado com sucesso!",
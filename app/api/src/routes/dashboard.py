@@ -0,0 +1,94 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, status
+from dotenv import load_dotenv
+from app.api.src.routes.estoque_atual import estoque_por_categoria, get_categorias_estoque
+from app.api.src.routes.cobranca import obter_relatorio_pendentes
+from app.api.src.routes.clientes import listar_clientes
+from app.api.src.schemas.dashboard import DashboardResponse
+load_dotenv()
+# Tempo máximo (s) de cada componente; quem passar disso vira uma falha 504
+DASHBOARD_TIMEOUT = float(os.environ.get("DASHBOARD_TIMEOUT", "5"))
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", "8"))
+
+router = APIRouter()
+
+# Nome do componente -> (função da rota equivalente, timeout em segundos)
+COMPONENTES: Dict[str, Tuple[Callable[[], Any], float]] = {
+    "estoque": (estoque_por_categoria, DASHBOARD_TIMEOUT),
+    "cobrancas": (obter_relatorio_pendentes, DASHBOARD_TIMEOUT),
+    "clientes": (listar_clientes, DASHBOARD_TIMEOUT),
+    "categorias": (get_categorias_estoque, DASHBOARD_TIMEOUT),
+}
+
+# Compartilhado entre as requisições; um componente que estourou o tempo
+# continua rodando aqui até terminar, sem segurar a resposta
+_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
+
+def _falha(e: BaseException) -> Dict[str, Any]:
+    """Converte a exceção de uma rota (HTTPException ou StandardHTTPException) em marcador de falha."""
+    return {
+        "status_code": getattr(e, "status_code", status.HTTP_500_INTERNAL_SERVER_ERROR),
+        "detail": getattr(e, "detail", None) or str(e),
+    }
+
+
+@router.get(
+    "/",
+    response_model=DashboardResponse,
+    summary="Dados da tela inicial em uma única chamada",
+    description=(
+        "Busca em paralelo o estoque, o resumo das cobranças, os clientes e as categorias. "
+        "Componentes que falharem ou passarem do tempo aparecem em 'falhas', sem derrubar os demais."
+    )
+)
+def obter_dashboard(
+    componentes: Optional[str] = Query(
+        None, description=f"Componentes separados por vírgula (padrão: todos). Um de: {', '.join(COMPONENTES)}"
+    ),
+):
+    """
+    Endpoint composto da tela inicial. O tempo de resposta fica limitado pelo
+    componente mais lento (ou pelo seu timeout), e não pela soma de todos.
+    """
+    nomes = [n.strip() for n in componentes.split(",") if n.strip()] if componentes else list(COMPONENTES)
+    desconhecidos = [n for n in nomes if n not in COMPONENTES]
+    if desconhecidos:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Componentes desconhecidos: {', '.join(desconhecidos)}. Use: {', '.join(COMPONENTES)}"
+        )
+
+    inicio = time.monotonic()
+    # Cada componente roda numa cópia do contexto da requisição: prazo, roteamento
+    # para réplicas e id da requisição nos logs valem também nas threads do executor
+    futuros = {
+        nome: _executor.submit(contextvars.copy_context().run, COMPONENTES[nome][0])
+        for nome in nomes
+    }
+
+    dados: Dict[str, Any] = {}
+    falhas: Dict[str, Dict[str, Any]] = {}
+    for nome, futuro in futuros.items():
+        # Todos começaram juntos: o prazo de cada um conta a partir do início
+        restante = max(0.0, inicio + COMPONENTES[nome][1] - time.monotonic())
+        try:
+            dados[nome] = futuro.result(timeout=restante)
+        except FuturesTimeoutError:
+            falhas[nome] = {
+                "status_code": status.HTTP_504_GATEWAY_TIMEOUT,
+                "detail": f"O componente '{nome}' não respondeu em {COMPONENTES[nome][1]:g} s.",
+            }
+        except Exception as e:
+            falhas[nome] = _falha(e)
+
+    return {
+        "componentes": dados,
+        "falhas": falhas,
+        "parcial": bool(falhas),
+        "duracao_ms": round((time.monotonic() - inicio) * 1000, 1),
+    }
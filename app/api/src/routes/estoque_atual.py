@@ -1,16 +1,103 @@
 from typing import List
 from app.api.src.schemas.produto import EstoqueRequest,AtualizarEstoqueRequest,PrecoUnitarioRequest
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime
 import json
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from fastapi import APIRouter
+from app.api.src.core.eventos import barramento
+from app.api.src.core.cache import CacheTTL, AUSENTE
+from app.api.src.core.mudancas import cache_ttl_padrao, consumidor, Mudanca
+from app.api.src.core.busca import IndiceBusca
+from app.api.src.core import unidade_trabalho
+from app.api.src.core.coalescedor import CoalescedorEscritas
+from app.api.src.core import movimentos
+from app.api.src.core.precos import preco_vigente
+from app.api.src.core.resiliencia import resiliencia, CircuitoAberto
+from app.api.src.routes.movimentos import registrar_e_calcular
+from app.api.src.schemas.movimento import MovimentoEstoqueCreate
 import os
 from dotenv import load_dotenv
+from app.api.src.core.registro import obter_logger
+from app.api.src.core.postgrest import Consulta
 load_dotenv()
+logger = obter_logger("estoque")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# TTL do cache de estoque; longo só quando o consumidor de mudanças recebe as edições (core/mudancas.py)
+ESTOQUE_CACHE_TTL = float(os.environ.get("ESTOQUE_CACHE_TTL") or cache_ttl_padrao())
+# Intervalo da recarga completa do índice de busca; as mudanças chegam antes pelo consumidor
+BUSCA_TTL = float(os.environ.get("BUSCA_TTL", "600"))
+# Janela (ms) em que deltas de estoque da mesma categoria são somados; 0 desliga
+ESTOQUE_COALESCER_JANELA_MS = float(os.environ.get("ESTOQUE_COALESCER_JANELA_MS", "5"))
 router = APIRouter()
+
+# Chaves: ("quantidade", categoria), ("preco", categoria), "lista" e "categorias"
+cache_estoque = CacheTTL(ttl=ESTOQUE_CACHE_TTL)
+
+
+def _aplicar_mudanca_estoque(mudanca: Mudanca) -> None:
+    """Atualiza as entradas do cache referentes à categoria alterada."""
+    registro = mudanca.registro or mudanca.antigo
+    categoria = registro.get("categoria")
+    if categoria is None:
+        # Sem a chave da linha não dá para saber o que mudou
+        cache_estoque.invalidar_tudo()
+        return
+
+    if mudanca.tipo == "DELETE":
+        cache_estoque.invalidar(("quantidade", categoria))
+        cache_estoque.invalidar(("preco", categoria))
+    else:
+        if "quantidade" in registro:
+            cache_estoque.definir(("quantidade", categoria), registro["quantidade"])
+        if "preco_unitario" in registro:
+            cache_estoque.definir(("preco", categoria), registro["preco_unitario"])
+
+    # Se a categoria for renomeada, a chave antiga também deixa de valer
+    categoria_antiga = mudanca.antigo.get("categoria")
+    if categoria_antiga is not None and categoria_antiga != categoria:
+        cache_estoque.invalidar(("quantidade", categoria_antiga))
+        cache_estoque.invalidar(("preco", categoria_antiga))
+
+    cache_estoque.invalidar("lista")
+    cache_estoque.invalidar("categorias")
+
+
+consumidor.registrar("Estoque", _aplicar_mudanca_estoque)
+
+def _notificar_mudanca_estoque(registro: Dict[str, Any], delta: Optional[int], origem: str) -> None:
+    """Atualiza os caches locais e publica o evento de uma escrita no 'Estoque'."""
+    consumidor.aplicar(Mudanca(tabela="Estoque", tipo="UPDATE", registro=registro))
+
+    # Notifica os assinantes do stream de eventos
+    barramento.publicar("estoque", {
+        "categoria": registro["categoria"],
+        "quantidade": registro["quantidade"],
+        "delta": delta,
+        "origem": origem,
+    })
+
+
+# Índice de busca das categorias (id e texto são a própria categoria)
+indice_categorias = IndiceBusca(ttl=BUSCA_TTL)
+
+
+def _aplicar_mudanca_indice_categorias(mudanca: Mudanca) -> None:
+    """Mantém o índice de categorias em dia com as mudanças na tabela 'Estoque'."""
+    categoria_antiga = mudanca.antigo.get("categoria")
+    categoria = mudanca.registro.get("categoria")
+    if categoria_antiga is not None and categoria_antiga != categoria:
+        indice_categorias.remover(categoria_antiga)
+    if mudanca.tipo == "DELETE":
+        if categoria_antiga is not None:
+            indice_categorias.remover(categoria_antiga)
+    elif categoria is not None:
+        indice_categorias.adicionar(categoria, categoria, categoria)
+
+
+consumidor.registrar("Estoque", _aplicar_mudanca_indice_categorias)
 class StandardHTTPException(Exception):
     """
     Exceção aprimorada para encapsular erros de requisição HTTP,
@@ -76,13 +163,11 @@ def estoque_por_categoria() -> List[Dict[str, Any]]:
     table_name = "Estoque"
     try:
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        
         # Modificação: Seleciona as colunas 'categoria' e 'quantidade' para todos os registros.
         # Não há filtro por uma categoria específica.
-        params = {"select": "categoria,quantidade"}
+        consulta = Consulta(table_name).select("categoria", "quantidade")
         
-        response = requests.get(url, headers=headers, params=params, timeout=15.0)
+        response = resiliencia.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
 
         if response.status_code >= 400:
             try:
@@ -101,15 +186,31 @@ def estoque_por_categoria() -> List[Dict[str, Any]]:
             raise
         raise StandardHTTPException(detail={"message": f"Erro inesperado: {e}"}, status_code=500)
 
-def obter_estoque(categoria_produto: str) -> int:
-    """Obtém a quantidade em estoque de uma categoria de produto."""
+def obter_estoque(categoria_produto: str, usar_cache: bool = True) -> int:
+    """
+    Obtém a quantidade em estoque de uma categoria de produto.
+
+    Use 'usar_cache=False' quando o valor for base para uma escrita
+    (leitura-modificação-escrita), para sempre ler o valor do Supabase.
+    Com ESTOQUE_MODO=movimentos, a quantidade é o saldo do livro de movimentos.
+    """
     table_name = "Estoque"
+    if usar_cache:
+        quantidade = cache_estoque.obter(("quantidade", categoria_produto))
+        if quantidade is not AUSENTE:
+            return quantidade
+    geracao = cache_estoque.geracao()
     try:
+        if movimentos.ativo():
+            # O livro é a fonte da verdade: a coluna do 'Estoque' só acompanha a compactação
+            quantidade = movimentos.saldo(categoria_produto)["quantidade"]
+            cache_estoque.definir(("quantidade", categoria_produto), quantidade, geracao=geracao)
+            return quantidade
+
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        params = {"categoria": f"eq.{categoria_produto}", "select": "quantidade"}
+        consulta = Consulta(table_name).select("quantidade").eq("categoria", categoria_produto)
         
-        response = requests.get(url, headers=headers, params=params, timeout=15.0)
+        response = unidade_trabalho.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
 
         if response.status_code >= 400:
             try:
@@ -124,9 +225,16 @@ def obter_estoque(categoria_produto: str) -> int:
                 detail={"message": f"A categoria de produto '{categoria_produto}' não foi encontrada."},
                 status_code=404
             )
-            
+
+        cache_estoque.definir(("quantidade", categoria_produto), data[0]['quantidade'], geracao=geracao)
         return data[0]['quantidade']
 
+    except CircuitoAberto as req_err:
+        # Supabase fora do ar: para leitura serve o último valor conhecido
+        quantidade = cache_estoque.obter_vencido(("quantidade", categoria_produto)) if usar_cache else AUSENTE
+        if quantidade is not AUSENTE:
+            return quantidade
+        raise StandardHTTPException(detail={"message": f"Erro de conexão: {req_err}"}, status_code=503)
     except requests.exceptions.RequestException as req_err:
         raise StandardHTTPException(detail={"message": f"Erro de conexão: {req_err}"}, status_code=503)
     except Exception as e:
@@ -149,24 +257,36 @@ def obter_estoque_atual(
 
 
 
-def _obter_ultimo_preco_unitario(categoria: str) -> Optional[float]:
+def _obter_ultimo_preco_unitario(categoria: str, momento: Optional[datetime] = None) -> Optional[float]:
     """
-    Busca o último 'preco_unitario' conhecido para a categoria no Supabase.
+    Resolve o 'preco_unitario' da categoria vigente em 'momento' (padrão: agora)
+    pelo índice de preços versionado. Sem histórico para a categoria, usa o
+    último preço conhecido na tabela 'Estoque'.
     """
     table_name = "Estoque"
+    preco = preco_vigente(categoria, momento)
+    if preco is not None:
+        return preco
+
+    preco = cache_estoque.obter(("preco", categoria))
+    if preco is not AUSENTE:
+        return preco
+
+    geracao = cache_estoque.geracao()
     headers = _get_headers()
     try:
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}?categoria=eq.{categoria}&select=preco_unitario"
-        response = requests.get(url, headers=headers, timeout=10.0)
+        consulta = Consulta(table_name).select("preco_unitario").eq("categoria", categoria)
+        response = unidade_trabalho.get(consulta.url, headers=headers, params=consulta.params(), timeout=10.0)
         response.raise_for_status()
         data = response.json()
         
         if data:
+            cache_estoque.definir(("preco", categoria), data[0].get("preco_unitario"), geracao=geracao)
             return data[0].get("preco_unitario")
         return None
 
     except requests.exceptions.RequestException as e:
-        print(f"Alerta: Falha ao buscar preço unitário no Supabase: {e}")
+        logger.warning("Falha ao buscar preço unitário no Supabase: %s", e)
         return None
 
 @router.post(
@@ -193,13 +313,13 @@ def atualizar_estoque_por_categoria(req: AtualizarEstoqueRequest):
     }
 
     try:
-        headers = _get_headers()
-        headers["Prefer"] = "resolution=merge-duplicates"
-
-        # ✅ Adiciona on_conflict na URL
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}?on_conflict=categoria"
+        # UPSERT pela categoria (on_conflict vai na URL, que a unidade de trabalho usa para agrupar).
+        # Numa unidade de trabalho, 'data' é o payload ecoado, não a linha gravada.
+        consulta = Consulta(table_name).upsert("categoria")
 
-        response = requests.post(url, headers=headers, json=payload, timeout=15.0)
+        response = unidade_trabalho.post(
+            consulta.url_completa(), headers=consulta.headers(_get_headers()), json=payload, timeout=15.0
+        )
         response.raise_for_status()
 
         try:
@@ -207,6 +327,21 @@ def atualizar_estoque_por_categoria(req: AtualizarEstoqueRequest):
         except ValueError:
             data = None
 
+        if movimentos.ativo():
+            # O livro é a fonte da verdade: registra a diferença como ajuste
+            atual = movimentos.saldo(req.categoria)["quantidade"]
+            if req.quantidade != atual:
+                registrar_e_calcular(MovimentoEstoqueCreate(
+                    categoria=req.categoria,
+                    tipo="ajuste",
+                    quantidade=req.quantidade - atual,
+                    observacao="Atualizacao de estoque"
+                ))
+
+        unidade_trabalho.apos_escrita(
+            lambda: _notificar_mudanca_estoque(payload, delta=None, origem="atualizar_estoque")
+        )
+
         return {
             "message": f"Estoque da categoria '{req.categoria}' atualizado com sucesso.",
             "data": data
@@ -224,6 +359,69 @@ def atualizar_estoque_por_categoria(req: AtualizarEstoqueRequest):
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Erro de comunicação: {e}"
         )
+def _aplicar_deltas_estoque(categoria: str, deltas: List[int]) -> Tuple[int, Any]:
+    """
+    Soma os deltas ao estoque atual da categoria com uma única leitura e um
+    único UPSERT no Supabase.
+
+    Returns:
+        A nova quantidade e o corpo retornado pelo Supabase (se houver).
+    """
+    table_name = "Estoque"
+    delta_total = sum(deltas)
+
+    # Tenta obter o estoque atual. Se não encontrar (404), considera como 0.
+    try:
+        estoque_atual = obter_estoque(categoria, usar_cache=False)
+    except StandardHTTPException as e:
+        if e.status_code == 404:
+            estoque_atual = 0
+        else:
+            raise  # Propaga outros erros
+
+    nova_quantidade = estoque_atual + delta_total
+    preco_unitario_existente = _obter_ultimo_preco_unitario(categoria)
+    preco_para_uso = preco_unitario_existente if preco_unitario_existente is not None else 0.0
+
+    observacao = f"Adicao de {delta_total} unidade(s) ao estoque"
+    if len(deltas) > 1:
+        observacao += f" ({len(deltas)} movimentos)"
+
+    payload = {
+        "categoria": categoria,
+        "quantidade": nova_quantidade,
+        "preco_unitario": preco_para_uso,
+        "observacao": observacao
+    }
+
+    # UPSERT pela categoria (on_conflict vai na URL, que a unidade de trabalho usa para agrupar)
+    consulta = Consulta(table_name).upsert("categoria")
+
+    response = unidade_trabalho.post(
+        consulta.url_completa(), headers=consulta.headers(_get_headers()), json=payload, timeout=15.0
+    )
+    response.raise_for_status()
+    data = None
+    if response.status_code != 204 and response.text:
+        try:
+            data = response.json()
+        except json.JSONDecodeError:
+            # ✅ TRATA RESPOSTA INVÁLIDA DE FORMA MAIS CLARA
+            raise HTTPException(
+                status_code=500,
+                detail=f"A API externa respondeu com um corpo não-JSON. Conteúdo: {response.text}"
+            )
+
+    unidade_trabalho.apos_escrita(
+        lambda: _notificar_mudanca_estoque(payload, delta=delta_total, origem="adicionar_ao_estoque")
+    )
+    return nova_quantidade, data
+
+
+# Vendas simultâneas da mesma categoria viram um único UPSERT com o delta líquido
+coalescedor_estoque = CoalescedorEscritas(_aplicar_deltas_estoque, janela=ESTOQUE_COALESCER_JANELA_MS / 1000)
+
+
 @router.post(
     "/adicionar_ao_estoque",
     status_code=status.HTTP_200_OK,
@@ -233,52 +431,33 @@ def atualizar_estoque_por_categoria(req: AtualizarEstoqueRequest):
 def adicionar_ao_estoque(req: AtualizarEstoqueRequest):
     """
     Endpoint para ADICIONAR uma quantidade ao estoque de uma categoria no Supabase.
+
+    Chamadas concorrentes para a mesma categoria, dentro de uma janela de
+    ESTOQUE_COALESCER_JANELA_MS, são somadas e gravadas de uma só vez; todas
+    recebem a quantidade resultante. Com ESTOQUE_MODO=movimentos, a escrita é
+    um INSERT no livro de movimentos (core/movimentos.py).
     """
-    table_name = "Estoque"
     try:
-        # Tenta obter o estoque atual. Se não encontrar (404), considera como 0.
-        try:
-            estoque_atual = obter_estoque(req.categoria)
-        except StandardHTTPException as e:
-            if e.status_code == 404:
-                estoque_atual = 0
-            else:
-                raise  # Propaga outros erros
-
-        nova_quantidade = estoque_atual + req.quantidade
-        preco_unitario_existente = _obter_ultimo_preco_unitario(req.categoria)
-        preco_para_uso = preco_unitario_existente if preco_unitario_existente is not None else 0.0
-
-        payload = {
-            "categoria": req.categoria,
+        if movimentos.ativo():
+            # Sem disputa pela linha da categoria: apenas um INSERT no livro
+            resultado = registrar_e_calcular(MovimentoEstoqueCreate(
+                categoria=req.categoria,
+                tipo="venda" if req.quantidade < 0 else "reposicao",
+                quantidade=req.quantidade,
+                observacao=f"Adicao de {req.quantidade} unidade(s) ao estoque"
+            ))
+            return {
+                "message": f"Estoque da categoria '{req.categoria}' incrementado com sucesso.",
+                "quantidade": resultado.quantidade,
+                "data": [resultado.movimento.model_dump(mode="json")]
+            }
+
+        nova_quantidade, data = coalescedor_estoque.adicionar(req.categoria, req.quantidade)
+        return {
+            "message": f"Estoque da categoria '{req.categoria}' incrementado com sucesso.",
             "quantidade": nova_quantidade,
-            "preco_unitario": preco_para_uso,
-            "observacao": f"Adicao de {req.quantidade} unidade(s) ao estoque"
+            "data": data
         }
-
-        headers = _get_headers()
-        headers["Prefer"] = "resolution=merge-duplicates"
-
-        # ✅ Adiciona on_conflict na URL
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}?on_conflict=categoria"
-
-        response = requests.post(url, headers=headers, json=payload, timeout=15.0)
-        
-
-        
-        response.raise_for_status()
-        data = None
-        if response.status_code != 204 and response.text:
-            try:
-                data = response.json()
-            except json.JSONDecodeError:
-                # ✅ TRATA RESPOSTA INVÁLIDA DE FORMA MAIS CLARA
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"A API externa respondeu com um corpo não-JSON. Conteúdo: {response.text}"
-                )
-        
-        return {"message": f"Estoque da categoria '{req.categoria}' incrementado com sucesso.", "data": data}
     except requests.exceptions.HTTPError as e:
         error_detail = e.response.text if e.response else str(e)
         raise HTTPException(status_code=e.response.status_code if e.response else 500, detail=f"Erro do Supabase ao adicionar ao estoque: {error_detail}")
@@ -296,17 +475,21 @@ def get_categorias_estoque():
     Endpoint para buscar todas as categorias de produtos no estoque.
     """
     table_name = "Estoque"
+    categorias = cache_estoque.obter("categorias")
+    if categorias is not AUSENTE:
+        return categorias
+    geracao = cache_estoque.geracao()
     try:
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        params = {"select": "categoria"}
+        consulta = Consulta(table_name).select("categoria")
         
-        response = requests.get(url, headers=headers, params=params, timeout=15.0)
+        response = resiliencia.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
         response.raise_for_status()
         
         data = response.json()
         categorias = [item['categoria'] for item in data]
         
+        cache_estoque.definir("categorias", categorias, geracao=geracao)
         return categorias
 
     except requests.exceptions.HTTPError as e:
@@ -316,6 +499,27 @@ def get_categorias_estoque():
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Erro de comunicação: {req_err}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro inesperado: {e}")
+@router.get(
+    "/categorias_estoque/buscar",
+    summary="Busca categorias do estoque (autocomplete)",
+    description=(
+        "Retorna as categorias cujo nome começa com o termo informado, ignorando "
+        "acentos e tolerando pequenos erros de digitação."
+    ),
+    response_model=List[str]
+)
+def buscar_categorias_estoque(
+    q: str = Query(..., min_length=1, description="Termo digitado"),
+    limite: int = Query(10, gt=0, le=50, description="Número máximo de resultados"),
+):
+    """
+    Responde a partir de um índice em memória carregado com
+    'get_categorias_estoque' e atualizado pelo consumidor de mudanças.
+    """
+    indice_categorias.garantir_carregado(
+        lambda: [(categoria, categoria, categoria) for categoria in get_categorias_estoque()]
+    )
+    return indice_categorias.buscar(q, limite)
 @router.get('/estoque')
 def estoque_por_categoria() -> List[Dict[str, Any]]:
     """
@@ -326,15 +530,17 @@ def estoque_por_categoria() -> List[Dict[str, Any]]:
         e a 'quantidade' em estoque. Ex: [{'categoria': 'Brownie', 'quantidade': 50}]
     """
     table_name = "Estoque"
+    lista = cache_estoque.obter("lista")
+    if lista is not AUSENTE:
+        return lista
+    geracao = cache_estoque.geracao()
     try:
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        
         # Modificação: Seleciona as colunas 'categoria' e 'quantidade' para todos os registros.
         # Não há filtro por uma categoria específica.
-        params = {"select": "categoria,quantidade"}
+        consulta = Consulta(table_name).select("categoria", "quantidade")
         
-        response = requests.get(url, headers=headers, params=params, timeout=15.0)
+        response = resiliencia.get(consulta.url, headers=headers, params=consulta.params(), timeout=15.0)
 
         if response.status_code >= 400:
             try:
@@ -344,8 +550,21 @@ def estoque_por_categoria() -> List[Dict[str, Any]]:
             raise StandardHTTPException(detail=detail, status_code=response.status_code)
         
         # A API já retorna uma lista de dicionários no formato desejado.
-        return response.json()
-
+        lista = response.json()
+        if movimentos.ativo():
+            # O livro é a fonte da verdade: a coluna do 'Estoque' só acompanha a compactação
+            lista = [
+                {**linha, "quantidade": movimentos.saldo(linha["categoria"])["quantidade"]}
+                for linha in lista
+            ]
+        cache_estoque.definir("lista", lista, geracao=geracao)
+        return lista
+
+    except CircuitoAberto as req_err:
+        lista = cache_estoque.obter_vencido("lista")
+        if lista is not AUSENTE:
+            return lista
+        raise StandardHTTPException(detail={"message": f"Erro de conexão: {req_err}"}, status_code=503)
     except requests.exceptions.RequestException as req_err:
         raise StandardHTTPException(detail={"message": f"Erro de conexão: {req_err}"}, status_code=503)
     except Exception as e:
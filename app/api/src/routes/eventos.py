@@ -0,0 +1,75 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from app.api.src.core.eventos import barramento, LimiteAssinantesExcedido
+
+router = APIRouter()
+
+TIPOS_EVENTO = {"estoque", "cobranca"}
+
+
+@router.get(
+    "/stream",
+    summary="Stream (SSE) de mudanças de estoque e cobranças",
+    description=(
+        "Mantém uma conexão 'text/event-stream' aberta e envia um evento a cada "
+        "alteração de estoque ou de cobrança feita pela API. Envie o cabeçalho "
+        "'Last-Event-ID' (ou o parâmetro 'ultimo_id') para retomar de onde parou."
+    )
+)
+async def stream_eventos(
+    tipos: Optional[str] = Query(None, description="Tipos separados por vírgula: estoque,cobranca"),
+    ultimo_id: Optional[int] = Query(None, ge=0, description="Retoma a partir deste id de evento"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Endpoint SSE que substitui o polling de '/estoque/estoque' e '/cobranca/pendentes'.
+
+    Eventos enviados:
+    - **estoque**: categoria, nova quantidade e delta aplicado.
+    - **cobranca**: cobrança criada ou paga.
+    - **reset**: o cliente ficou para trás; deve recarregar o estado completo.
+    """
+    filtro = None
+    if tipos:
+        filtro = {t.strip() for t in tipos.split(",") if t.strip()}
+        desconhecidos = filtro - TIPOS_EVENTO
+        if desconhecidos:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Tipos de evento desconhecidos: {', '.join(sorted(desconhecidos))}"
+            )
+
+    # O cabeçalho enviado pelo EventSource na reconexão tem precedência
+    if last_event_id is not None:
+        try:
+            ultimo_id = int(last_event_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="O cabeçalho 'Last-Event-ID' deve ser um número inteiro."
+            )
+
+    try:
+        # Registra a assinatura antes de responder, para devolver 503 se estiver cheio
+        assinatura = barramento.assinar(ultimo_id=ultimo_id, tipos=filtro)
+    except LimiteAssinantesExcedido as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    async def gerar():
+        # Sugere ao navegador o intervalo de reconexão (ms)
+        yield "retry: 3000\n\n"
+        try:
+            async for evento in assinatura:
+                yield ": keep-alive\n\n" if evento is None else evento.formatar_sse()
+        finally:
+            assinatura.fechar()
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Garante a remoção mesmo se o stream não chegar a começar
+        background=BackgroundTask(assinatura.fechar),
+    )
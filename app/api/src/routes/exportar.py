@@ -0,0 +1,66 @@
+from datetime import date
+from itertools import chain
+from typing import Literal, Optional
+import requests
+from fastapi import APIRouter, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from app.api.src.core import exportacao
+from app.api.src.core.erros import erro_supabase
+
+router = APIRouter()
+
+TIPOS_CONTEUDO = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+@router.get(
+    "/{nome}",
+    summary="Exporta vendas ou cobranças em CSV ou Parquet (streaming)",
+    description=(
+        "Baixa a tabela 'Venda' ('vendas', filtrada por data_venda) ou 'Cobranca' ('cobrancas', "
+        "filtrada por vencimento) página a página, sem carregar tudo em memória."
+    ),
+    response_class=StreamingResponse,
+)
+def exportar_tabela(
+    nome: Literal["vendas", "cobrancas"] = Path(..., description="Tabela a exportar"),
+    inicio: Optional[date] = Query(None, description="Data inicial (inclusive)"),
+    fim: Optional[date] = Query(None, description="Data final (inclusive)"),
+    formato: Literal["csv", "parquet"] = Query("csv", description="Formato do arquivo"),
+):
+    """
+    Endpoint de exportação para a contabilidade. A primeira página é lida antes
+    de a resposta começar, para que erros do Supabase virem um status HTTP;
+    um erro no meio do download interrompe o arquivo.
+    """
+    if inicio is not None and fim is not None and inicio > fim:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'inicio' deve ser anterior ou igual a 'fim'."
+        )
+    if formato == "parquet" and not exportacao.parquet_disponivel():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Exportação em Parquet indisponível: instale o pacote 'pyarrow'."
+        )
+
+    definicao = exportacao.TABELAS_EXPORTAVEIS[nome]
+    colunas = definicao["colunas"]
+    filtros = exportacao.filtros_de_data(definicao["coluna_data"], inicio, fim)
+    paginas = exportacao.paginar(definicao["tabela"], [c for c, _ in colunas], filtros)
+    try:
+        primeira = next(paginas, None)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    paginas = chain([primeira], paginas) if primeira is not None else iter(())
+
+    if formato == "csv":
+        conteudo = exportacao.gerar_csv(paginas, [c for c, _ in colunas])
+    else:
+        conteudo = exportacao.gerar_parquet(paginas, colunas)
+
+    periodo = f"_{inicio or 'inicio'}_{fim or 'hoje'}" if inicio or fim else ""
+    return StreamingResponse(
+        conteudo,
+        media_type=TIPOS_CONTEUDO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}{periodo}.{formato}"'},
+    )
@@ -0,0 +1,51 @@
+from typing import List, Literal, Optional
+import requests
+from fastapi import APIRouter, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from app.api.src.core import extratos
+from app.api.src.core.erros import erro_supabase
+
+router = APIRouter()
+
+
+@router.get(
+    "/{ano}/{mes}",
+    summary="Extratos mensais dos clientes (ZIP em streaming)",
+    description=(
+        "Gera um extrato por cliente com as vendas do mês e as cobranças do mês (pagas e em aberto), "
+        "mais as que seguem em aberto de meses anteriores, em HTML, CSV ou PDF, num arquivo ZIP."
+    ),
+    response_class=StreamingResponse,
+)
+def gerar_extratos(
+    ano: int = Path(..., ge=2000, le=2100, description="Ano do extrato"),
+    mes: int = Path(..., ge=1, le=12, description="Mês do extrato (1 a 12)"),
+    formato: Literal["html", "csv", "pdf"] = Query("html", description="Formato de cada extrato"),
+    cliente: Optional[List[str]] = Query(None, description="Só estes clientes (pode repetir; padrão: todos)"),
+):
+    """
+    Endpoint do fechamento do mês. Os dados do mês são lidos de uma vez antes
+    de a resposta começar (erros do Supabase viram um status HTTP); os
+    extratos são renderizados em paralelo e entram no ZIP conforme ficam prontos.
+    """
+    if formato == "pdf" and not extratos.pdf_disponivel():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Extratos em PDF indisponíveis: instale o pacote 'reportlab'."
+        )
+    try:
+        por_cliente = extratos.carregar_mes(ano, mes, cliente)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    if not por_cliente:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nenhuma venda ou cobrança encontrada em {mes:02d}/{ano}."
+        )
+
+    arquivos = extratos.gerador_extratos.renderizar(por_cliente, formato, ano, mes)
+    return StreamingResponse(
+        extratos.gerar_zip(arquivos, ano, mes, formato),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="extratos_{ano}-{mes:02d}_{formato}.zip"'},
+    )
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from typing import Dict, Any, List
 import requests, json
 from app.api.src.schemas.venda import Venda,CategoriaSchema
+from app.api.src.core.replica_vendas import replica_vendas
 from datetime import datetime
 router = APIRouter()
 
@@ -53,33 +54,34 @@ def _get_headers() -> dict:
     }
 
 def obter_historico(categoria: str) -> List[Venda]:
-    """Retorna o histórico de vendas para uma categoria de produto específica."""
-    table_name = "Venda"
-    try:
-        headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-        params = {"categoria_produto": f"eq.{categoria}", "select": "*"}
+    """
+    Retorna o histórico de vendas para uma categoria de produto específica.
+    A leitura é feita na réplica local de 'Venda' (core/replica_vendas.py).
+    """
+    fotografia, indices = _indices_historico(categoria)
+    return [Venda(**fotografia.linha(i).como_dict()) for i in indices]
 
-        response = requests.get(url, headers=headers, params=params, timeout=15.0)
-
-        if response.status_code >= 400:
-            try:
-                detail = response.json()
-            except json.JSONDecodeError:
-                detail = {"message": response.text}
-            raise StandardHTTPException(detail=detail, status_code=response.status_code)
-        
-        data = response.json()
-        
-        # Converte cada item do dicionário JSON em um objeto Venda
-        return [Venda(**item) for item in data]
 
+def _indices_historico(categoria: str):
+    """
+    Sincroniza a réplica, se preciso, e retorna a fotografia lida e as posições
+    das vendas da categoria nela (as posições só valem para essa fotografia).
+    """
+    try:
+        replica_vendas.garantir_atualizada()
+    except requests.exceptions.HTTPError as http_err:
+        response = http_err.response
+        try:
+            detail = response.json() if response is not None else {"message": str(http_err)}
+        except json.JSONDecodeError:
+            detail = {"message": response.text}
+        raise StandardHTTPException(detail=detail, status_code=response.status_code if response is not None else 500)
     except requests.exceptions.RequestException as req_err:
         raise StandardHTTPException(detail={"message": f"Erro de conexão: {req_err}"}, status_code=503)
     except Exception as e:
-        if isinstance(e, StandardHTTPException):
-            raise
         raise StandardHTTPException(detail={"message": f"Erro inesperado: {e}"}, status_code=500)
+    fotografia = replica_vendas.fotografia()
+    return fotografia, fotografia.indices_categoria(categoria)
 
 
 
@@ -98,10 +100,10 @@ def obter_historico_de_vendas(
     Endpoint para obter o histórico de vendas de forma paginada,
     filtrado por uma categoria enviada no corpo da requisição.
     """
-    historico_completo = obter_historico(categoria_dto.categoria)
+    fotografia, indices = _indices_historico(categoria_dto.categoria)
     
-    # Lógica de paginação
+    # Lógica de paginação: só as vendas da página viram objetos Venda
     inicio = (pagina - 1) * ITENS_POR_PAGINA
     fim = pagina * ITENS_POR_PAGINA
     
-    return historico_completo[inicio:fim]
\ No newline at end of file
+    return [Venda(**fotografia.linha(i).como_dict()) for i in indices[inicio:fim]]
\ No newline at end of file
@@ -0,0 +1,57 @@
+import io
+import os
+import tempfile
+from typing import Literal, Optional
+import requests
+from fastapi import APIRouter, HTTPException, Path, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from app.api.src.core.importacao import importar_csv
+from app.api.src.core.erros import erro_supabase
+from app.api.src.schemas.importacao import ResultadoImportacao
+load_dotenv()
+# Até este tamanho (bytes) o upload fica em memória; acima disso vai para disco
+IMPORTACAO_MEMORIA = int(os.environ.get("IMPORTACAO_MEMORIA", str(8 * 1024 * 1024)))
+
+router = APIRouter()
+
+
+@router.post(
+    "/{tipo}",
+    response_model=ResultadoImportacao,
+    summary="Importa um CSV de vendas, clientes ou estoque",
+    description=(
+        "Envie o arquivo CSV como corpo da requisição (Content-Type: text/csv). O cabeçalho usa os "
+        "campos dos schemas 'Venda', 'ClienteCreate' ('nome') ou 'AtualizarEstoqueRequest' "
+        "('categoria', 'quantidade'). As linhas válidas são gravadas em lotes; as inválidas "
+        "aparecem em 'erros' com o número da linha."
+    )
+)
+async def importar(
+    request: Request,
+    tipo: Literal["vendas", "clientes", "estoque"] = Path(..., description="O que o CSV contém"),
+    lote: Optional[int] = Query(None, gt=0, le=5000, description="Linhas por upsert (padrão: IMPORTACAO_LOTE)"),
+    validar_apenas: bool = Query(False, description="Só valida as linhas, sem gravar nada"),
+):
+    """
+    Endpoint de importação em massa. O upload é recebido em streaming para um
+    arquivo temporário e processado linha a linha, sem ficar inteiro em memória.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORTACAO_MEMORIA) as arquivo:
+        async for parte in request.stream():
+            arquivo.write(parte)
+        arquivo.seek(0)
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+        try:
+            return await run_in_threadpool(importar_csv, tipo, texto, lote, validar_apenas)
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="O arquivo deve ser um CSV em UTF-8."
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        except requests.exceptions.RequestException as e:
+            raise erro_supabase(e)
+        finally:
+            texto.detach()
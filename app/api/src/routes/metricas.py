@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from app.api.src.core.admissao import controle_admissao
+from app.api.src.core.registro import registro
+from app.api.src.core.replicas import roteador
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.schemas.metricas import MetricasResponse
+
+router = APIRouter()
+
+
+@router.get(
+    "/",
+    response_model=MetricasResponse,
+    summary="Métricas de resiliência",
+    description=(
+        "Estado do disjuntor, p95 e contadores de hedge por tabela do Supabase, e a "
+        "ocupação do controle de admissão por classe de operação, a fila de logs e as réplicas de leitura."
+    )
+)
+def obter_metricas():
+    return {
+        "upstreams": resiliencia.metricas(),
+        "admissao": controle_admissao.estado(),
+        "logs": registro.estado(),
+        "replicas": roteador.estado(),
+    }
@@ -0,0 +1,107 @@
+from typing import List
+import requests
+from fastapi import APIRouter, HTTPException, Query, status
+from app.api.src.core import movimentos
+from app.api.src.core import unidade_trabalho
+from app.api.src.core.erros import erro_supabase
+from app.api.src.core.unidade_trabalho import unidade_de_trabalho
+from app.api.src.core.eventos import barramento
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.schemas.movimento import (
+    MovimentoEstoque, MovimentoEstoqueCreate, MovimentoRegistradoResponse, SaldoEstoqueResponse
+)
+
+router = APIRouter()
+
+
+def registrar_e_calcular(movimento_in: MovimentoEstoqueCreate) -> MovimentoRegistradoResponse:
+    """
+    Registra o movimento e calcula o saldo resultante. Os caches e o stream de
+    eventos são atualizados depois que o INSERT for confirmado.
+    """
+    movimento = movimentos.registrar_movimento(
+        movimento_in.categoria, movimento_in.tipo, movimento_in.quantidade, movimento_in.observacao
+    )
+    quantidade = movimentos.saldo(movimento_in.categoria)["quantidade"]
+
+    def notificar():
+        registro = {"categoria": movimento_in.categoria, "quantidade": quantidade}
+        consumidor.aplicar(Mudanca(tabela="Estoque", tipo="UPDATE", registro=registro))
+        barramento.publicar("estoque", {
+            **registro,
+            "delta": movimento_in.quantidade,
+            "origem": f"movimento:{movimento_in.tipo}",
+        })
+
+    unidade_trabalho.apos_escrita(notificar)
+    return MovimentoRegistradoResponse(movimento=MovimentoEstoque(**movimento), quantidade=quantidade)
+
+
+@router.post(
+    "/",
+    response_model=MovimentoRegistradoResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Registra um movimento de estoque",
+    description="Insere uma venda, reposição ou ajuste no livro de movimentos e retorna o saldo resultante."
+)
+@unidade_de_trabalho
+def registrar_movimento(movimento_in: MovimentoEstoqueCreate):
+    """
+    Endpoint para registrar um movimento. Movimentos são apenas inseridos,
+    nunca alterados, então não disputam a linha da categoria no 'Estoque'.
+    Só aceito com ESTOQUE_MODO=movimentos: no modo upsert o saldo do livro não
+    é o estoque, e gravá-lo no cache ou no 'Estoque' apagaria o valor real.
+    """
+    if not movimentos.ativo():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O livro de movimentos só aceita escritas com ESTOQUE_MODO=movimentos."
+        )
+    try:
+        return registrar_e_calcular(movimento_in)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+
+
+@router.get(
+    "/{categoria}",
+    response_model=List[MovimentoEstoque],
+    summary="Lista os movimentos de uma categoria (trilha de auditoria)"
+)
+def listar_movimentos(
+    categoria: str,
+    desde_id: int = Query(0, ge=0, description="Retorna os movimentos com id maior que este"),
+    limite: int = Query(100, gt=0, le=1000, description="Número máximo de movimentos"),
+):
+    """Endpoint para consultar o histórico de movimentos em ordem de registro."""
+    try:
+        return movimentos.movimentos_desde(categoria, desde_id, limite=limite)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+
+
+@router.get(
+    "/{categoria}/saldo",
+    response_model=SaldoEstoqueResponse,
+    summary="Saldo de estoque calculado pelo livro de movimentos"
+)
+def obter_saldo(categoria: str):
+    """Endpoint que retorna o último snapshot mais os movimentos posteriores."""
+    try:
+        return movimentos.saldo(categoria)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+
+
+@router.post(
+    "/compactar",
+    summary="Compacta os movimentos em novos snapshots",
+    description="Executa agora a compactação que a tarefa de fundo faz periodicamente."
+)
+def compactar_movimentos():
+    """Endpoint para forçar a criação de snapshots de todas as categorias."""
+    try:
+        criados = movimentos.compactar_todas()
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    return {"message": f"{criados} snapshot(s) criado(s)."}
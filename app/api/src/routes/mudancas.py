@@ -0,0 +1,44 @@
+import hmac
+from typing import Any, Dict, List, Optional, Union
+from fastapi import APIRouter, Header, HTTPException, status
+from app.api.src.core.mudancas import MUDANCAS_WEBHOOK_SEGREDO, consumidor, mudanca_de_payload
+
+router = APIRouter()
+
+
+@router.post(
+    "/webhook",
+    status_code=status.HTTP_200_OK,
+    summary="Recebe mudanças de linhas do Supabase (Database Webhook)",
+    description=(
+        "Aplica inserções, edições e remoções feitas fora da API (ex.: pelo painel "
+        "do Supabase) aos caches em memória. Aceita um payload ou uma lista de payloads."
+    )
+)
+def receber_mudancas(
+    payload: Union[Dict[str, Any], List[Dict[str, Any]]],
+    x_webhook_secret: Optional[str] = Header(None),
+):
+    """
+    Endpoint chamado pelo Supabase a cada mudança em 'Estoque', 'Cobranca' etc.
+
+    O cabeçalho 'X-Webhook-Secret' deve conter o valor de MUDANCAS_WEBHOOK_SEGREDO.
+    """
+    if not MUDANCAS_WEBHOOK_SEGREDO:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="O webhook de mudanças não está configurado (MUDANCAS_WEBHOOK_SEGREDO)."
+        )
+    if not x_webhook_secret or not hmac.compare_digest(x_webhook_secret, MUDANCAS_WEBHOOK_SEGREDO):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Segredo do webhook inválido.")
+
+    payloads = payload if isinstance(payload, list) else [payload]
+    try:
+        mudancas = [mudanca_de_payload(p) for p in payloads]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    for mudanca in mudancas:
+        consumidor.aplicar(mudanca, externa=True)
+
+    return {"message": f"{len(mudancas)} mudança(s) aplicada(s)."}
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+import requests
+from fastapi import APIRouter, HTTPException, Query, status
+from app.api.src.core import precos
+from app.api.src.core.mudancas import consumidor, Mudanca
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.resiliencia import resiliencia
+from app.api.src.core.erros import erro_supabase
+from app.api.src.schemas.preco import PrecoCreate, PrecoVigenteResponse, VersaoPreco
+
+router = APIRouter()
+
+
+def _sincronizar_preco_estoque(categoria: str, preco_unitario: float) -> None:
+    """Mantém a coluna 'preco_unitario' do 'Estoque' com o preço vigente."""
+    consulta = Consulta("Estoque").eq("categoria", categoria)
+    response = resiliencia.executar(
+        consulta.url, requests.patch, headers=precos._get_headers(), params=consulta.params(),
+        json={"preco_unitario": preco_unitario}, timeout=15.0
+    )
+    response.raise_for_status()
+    consumidor.aplicar(Mudanca(
+        tabela="Estoque", tipo="UPDATE", registro={"categoria": categoria, "preco_unitario": preco_unitario}
+    ))
+
+
+@router.post(
+    "/",
+    response_model=VersaoPreco,
+    status_code=status.HTTP_201_CREATED,
+    summary="Registra uma nova versão de preço",
+    description="Adiciona um preço ao histórico da categoria a partir da data de vigência informada."
+)
+def registrar_preco(preco_in: PrecoCreate):
+    """
+    Endpoint para alterar o preço de uma categoria. Vendas anteriores à
+    vigência continuam resolvendo o preço antigo.
+    """
+    try:
+        versao = precos.registrar_preco(preco_in.categoria, preco_in.preco_unitario, preco_in.vigente_desde)
+        # O 'Estoque' recebe o preço vigente agora, que pode não ser o registrado
+        # (vigência futura ou retroativa anterior a uma versão mais nova)
+        atual = precos.preco_vigente(preco_in.categoria)
+        if atual is not None:
+            _sincronizar_preco_estoque(preco_in.categoria, atual)
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    return versao
+
+
+@router.get(
+    "/{categoria}",
+    response_model=List[VersaoPreco],
+    summary="Histórico de preços de uma categoria"
+)
+def listar_precos(categoria: str):
+    """Endpoint que lista as versões de preço em ordem de vigência."""
+    try:
+        precos.indice_precos.garantir_carregado()
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    return precos.indice_precos.historico(categoria)
+
+
+@router.get(
+    "/{categoria}/vigente",
+    response_model=PrecoVigenteResponse,
+    summary="Preço vigente de uma categoria em um instante"
+)
+def obter_preco_vigente(
+    categoria: str,
+    em: Optional[datetime] = Query(None, description="Instante consultado (padrão: agora)"),
+):
+    """Endpoint que resolve o preço da categoria em qualquer data, inclusive passada."""
+    em = precos.para_utc(em) if em is not None else datetime.now(timezone.utc)
+    try:
+        precos.indice_precos.garantir_carregado()
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    preco_unitario = precos.indice_precos.preco_em(categoria, em)
+    if preco_unitario is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nenhum preço vigente para a categoria '{categoria}' em {em.isoformat()}."
+        )
+    return PrecoVigenteResponse(categoria=categoria, em=em, preco_unitario=preco_unitario)
@@ -0,0 +1,56 @@
+from datetime import date
+from typing import Literal, Optional
+import requests
+from fastapi import APIRouter, HTTPException, Query, status
+from app.api.src.core.agregados import agregados_vendas, carregar_vendas
+from app.api.src.core.replica_vendas import replica_vendas
+from app.api.src.core.erros import erro_supabase
+from app.api.src.schemas.relatorio import AgregadosVendasResponse
+
+router = APIRouter()
+
+
+@router.get(
+    "/vendas",
+    response_model=AgregadosVendasResponse,
+    summary="Unidades e receita por período",
+    description="Totais de vendas por dia, semana ou mês, por categoria ou por cliente, a partir dos agregados em memória."
+)
+def obter_agregados_vendas(
+    granularidade: Literal["dia", "semana", "mes"] = Query("mes", description="Tamanho do período"),
+    dimensao: Literal["categoria", "cliente"] = Query("categoria", description="Agrupar por categoria ou por cliente"),
+    chave: Optional[str] = Query(None, description="Uma categoria ou cliente específico (padrão: todos)"),
+    inicio: Optional[date] = Query(None, description="Data inicial (inclui o período que a contém)"),
+    fim: Optional[date] = Query(None, description="Data final (inclusive)"),
+):
+    """
+    Endpoint para gráficos de vendas. Não lê a tabela 'Venda': os totais são
+    mantidos a cada venda registrada e reconstruídos periodicamente.
+    """
+    if inicio is not None and fim is not None and inicio > fim:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'inicio' deve ser anterior ou igual a 'fim'."
+        )
+    try:
+        agregados_vendas.garantir_carregado()
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    totais = agregados_vendas.consultar(granularidade, dimensao, chave, inicio, fim)
+    return AgregadosVendasResponse(granularidade=granularidade, dimensao=dimensao, totais=totais)
+
+
+@router.post(
+    "/vendas/reconstruir",
+    summary="Reconstrói os agregados de vendas",
+    description="Recarrega a réplica local de 'Venda' e recalcula os agregados (ex.: após correções manuais no banco)."
+)
+def reconstruir_agregados_vendas():
+    """Endpoint para forçar a reconstrução completa dos agregados."""
+    try:
+        replica_vendas.recarregar()
+        vendas = carregar_vendas()
+    except requests.exceptions.RequestException as e:
+        raise erro_supabase(e)
+    agregados_vendas.substituir(vendas)
+    return {"message": f"Agregados reconstruídos a partir de {len(vendas)} venda(s)."}
@@ -1,6 +1,6 @@
 # src/brownie_api/api/v1/endpoints/vendas.py
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, HTTPException, status
 router = APIRouter()
 import requests
 from typing import Dict, Any
@@ -10,9 +10,16 @@ from app.api.src.routes.estoque_atual import adicionar_ao_estoque
 from app.api.src.schemas.venda import Venda
 from app.api.src.routes.cobranca import criar_cobranca_de_venda,adicionar_cobranca
 from app.api.src.routes.estoque_atual import _obter_ultimo_preco_unitario
+from app.api.src.core import prazo, unidade_trabalho
+from app.api.src.core.unidade_trabalho import unidade_de_trabalho
+from app.api.src.core.agregados import agregados_vendas
+from app.api.src.core.replica_vendas import replica_vendas
+from app.api.src.core.postgrest import Consulta
 import os
 from dotenv import load_dotenv
+from app.api.src.core.registro import obter_logger
 load_dotenv()
+logger = obter_logger("vendas")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
@@ -76,18 +83,21 @@ def registrar_nova_venda(venda: Venda) -> Dict[str, Any]:
     """
     table_name = "Venda"
     if not venda.valor_unitario:
-        venda.valor_unitario = _obter_ultimo_preco_unitario(venda.categoria_produto)
+        venda.valor_unitario = _obter_ultimo_preco_unitario(venda.categoria_produto, venda.data_venda)
     try:
         # 1. Reutiliza a função para obter os cabeçalhos de autenticação
         headers = _get_headers()
-        url = f"{SUPABASE_URL}/rest/v1/{table_name}"
+        url = Consulta(table_name).url
 
         # 2. Converte o objeto 'venda' em um dicionário para o payload JSON.
         #    A API do Supabase espera uma lista de registros para inserção.
         payload = [venda.model_dump(mode="json")]
 
         
-        response = requests.post(url, headers=headers, json=payload, timeout=15.0)
+        # Enfileirada na unidade de trabalho: a resposta ecoa o payload (sem id/created_at)
+        response = unidade_trabalho.post(url, headers=headers, json=payload, timeout=15.0)
+        unidade_trabalho.apos_escrita(lambda: agregados_vendas.registrar(payload[0]))
+        unidade_trabalho.apos_escrita(replica_vendas.marcar_desatualizada)
         cobranca = criar_cobranca_de_venda(venda)
         adicionar_cobranca(cobranca)
 
@@ -100,7 +110,8 @@ def registrar_nova_venda(venda: Venda) -> Dict[str, Any]:
             raise StandardHTTPException(detail=detail, status_code=response.status_code)
 
         # 5. A API, com o header "Prefer: return=representation", retorna uma lista
-        #    contendo os registros que foram criados.
+        #    contendo os registros que foram criados. Dentro da unidade de trabalho
+        #    é o payload ecoado: a venda ainda não tem id.
         created_data = response.json()
         
         # Retorna o primeiro (e único) registro do resultado
@@ -120,6 +131,7 @@ def registrar_nova_venda(venda: Venda) -> Dict[str, Any]:
     summary="Registrar uma Nova Venda",
     description="Cria um novo registro de venda e atualiza o estoque do produto correspondente."
 )
+@unidade_de_trabalho
 def registrar_venda(
     venda_in: Venda
 ):
@@ -131,9 +143,24 @@ def registrar_venda(
     - **unidades**: Quantidade vendida (deve ser maior que 0).
     - **prazo_dias**: Prazo em dias para o pagamento.
     - **valor_unitario**: Preço do produto no momento da venda.
+
+    As leituras repetidas são feitas uma só vez e as escritas da Venda e da
+    Cobranca são enviadas juntas pela unidade de trabalho. A baixa do estoque
+    vem só depois que elas foram gravadas (o coalescedor grava o estoque na
+    hora, fora da unidade): uma venda recusada não mexe no estoque. Com a
+    venda gravada, a baixa sai mesmo que o prazo da requisição acabe; se ela
+    falhar, a venda já está gravada e o erro diz isso.
     """
-    print(venda_in)
+    logger.debug("Venda recebida", extra={"campos": {"venda": venda_in}})
     registrar_nova_venda(venda_in)
+    unidade_trabalho.confirmar_escritas()
     req = AtualizarEstoqueRequest(categoria=venda_in.categoria_produto,quantidade=-venda_in.qtd_unidades)
-    adicionar_ao_estoque(req)
+    try:
+        with prazo.sem_prazo():
+            adicionar_ao_estoque(req)
+    except HTTPException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"A venda e a cobrança foram registradas, mas a baixa do estoque falhou: {e.detail}"
+        )
 
@@ -0,0 +1,38 @@
+# Admin schema (profiler e memória)
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class RotaPerfil(BaseModel):
+    rota: str = Field(..., description="'MÉTODO /caminho', ou '(fastapi: ...)' para trabalho fora da função da rota.")
+    amostras: int
+    tempo_amostrado_ms: float
+
+
+class PerfilResponse(BaseModel):
+    intervalo_ms: float
+    amostras: int = Field(..., description="Rodadas de amostragem desde a última limpeza.")
+    sessao_restante_s: float
+    rotas: List[RotaPerfil]
+
+
+class EstadoMemoriaResponse(BaseModel):
+    rastreando: bool
+    base_em: Optional[float] = Field(None, description="Instante (epoch) do snapshot de base.")
+    memoria_rastreada_bytes: int
+    pico_bytes: int
+
+
+class ItemDiferencaMemoria(BaseModel):
+    local: List[str] = Field(..., description="Quadros 'arquivo:linha' do ponto de alocação.")
+    diferenca_bytes: int
+    total_bytes: int
+    diferenca_blocos: int
+    total_blocos: int
+
+
+class DiferencaMemoriaResponse(BaseModel):
+    base_em: float
+    segundos_desde_a_base: float
+    diferenca_total_bytes: int
+    itens: List[ItemDiferencaMemoria]
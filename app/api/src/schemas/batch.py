@@ -0,0 +1,33 @@
+# Batch schema
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+
+class OperacaoBatch(BaseModel):
+    """Uma chamada a uma rota existente da API, executada dentro do /batch."""
+    id: Optional[str] = Field(None, description="Identificador da operação (padrão: a posição na lista).")
+    metodo: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = Field(..., description="Método HTTP.")
+    caminho: str = Field(..., description="Caminho relativo à API, ex.: '/vendas/vender'.")
+    query: Optional[Dict[str, Any]] = Field(None, description="Parâmetros de query string.")
+    corpo: Optional[Any] = Field(None, description="Corpo JSON da requisição.")
+    cabecalhos: Dict[str, str] = Field(default_factory=dict, description="Cabeçalhos extras desta operação.")
+    depende_de: List[str] = Field(
+        default_factory=list, description="Ids de operações anteriores que precisam terminar antes desta."
+    )
+
+
+class BatchRequest(BaseModel):
+    operacoes: List[OperacaoBatch] = Field(..., min_length=1)
+    sequencial: bool = Field(False, description="Executa as operações uma por vez, na ordem da lista.")
+
+
+class ResultadoOperacao(BaseModel):
+    id: str
+    status_code: int
+    corpo: Any = None
+    duracao_ms: float
+
+
+class BatchResponse(BaseModel):
+    """Resultados na mesma ordem das operações recebidas."""
+    resultados: List[ResultadoOperacao]
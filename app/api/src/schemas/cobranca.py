@@ -23,7 +23,7 @@ class CobrancaSummaryInput(BaseModel):
     status_pagamento: bool = False
 
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List
 
 # --- Response Model para a Rota: GET /pendentes ---
 
@@ -110,4 +110,41 @@ class CobrancaData(BaseModel):
 class PagarCobrancaResponse(BaseModel):
     """Schema para a resposta de sucesso da rota."""
     message: str
-    data: List[CobrancaData]
\ No newline at end of file
+    data: List[CobrancaData]
+
+# --- Response Model para a Rota: GET /por_cliente ---
+
+class RecebiveisCliente(BaseModel):
+    """Saldo a receber de um cliente, separado entre pendente e vencido."""
+    cliente: str = Field(..., description="Nome do cliente/empresa.")
+    pendentes: StatusSummary = Field(..., description="Cobranças a vencer.")
+    vencidas: StatusSummary = Field(..., description="Cobranças com vencimento no passado ou hoje.")
+    total_a_receber: float = Field(..., description="Soma de pendentes e vencidas.")
+    vencimento_mais_antigo: datetime = Field(..., description="Vencimento mais antigo entre as cobranças não pagas.")
+
+class RecebiveisPorClienteResponse(BaseModel):
+    """Resposta paginada da rota de recebíveis por cliente."""
+    total_clientes: int = Field(..., description="Número de clientes com cobranças não pagas.")
+    pagina: int
+    itens_por_pagina: int
+    clientes: List[RecebiveisCliente]
+    maiores_devedores: List[RecebiveisCliente] = Field(..., description="Clientes com maior valor total a receber.")
+
+# --- Response Model para a Rota: GET /aging ---
+
+class AgingCliente(BaseModel):
+    """Cobranças não pagas de um cliente, por faixa de dias de atraso."""
+    cliente: str = Field(..., description="Nome do cliente/empresa.")
+    faixas: Dict[str, StatusSummary] = Field(..., description="Quantidade e valor por faixa ('a_vencer', '0-30', ...).")
+    total_a_receber: float
+
+class AgingRecebiveisResponse(BaseModel):
+    """Resposta da rota de aging de recebíveis."""
+    faixas: List[str] = Field(..., description="Rótulos das faixas, na ordem.")
+    gerado_em: datetime = Field(..., description="Instante usado como referência para o atraso.")
+    totais: Dict[str, StatusSummary]
+    total_a_receber: float
+    sem_vencimento: StatusSummary = Field(
+        ..., description="Cobranças não pagas sem data de vencimento, fora das faixas e dos totais."
+    )
+    clientes: List[AgingCliente] = Field(..., description="Clientes em ordem decrescente de valor a receber.")
@@ -0,0 +1,17 @@
+# Dashboard schema
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+
+class FalhaComponente(BaseModel):
+    """Marca um componente do dashboard que não pôde ser carregado."""
+    status_code: int = Field(..., description="504 para tempo esgotado; senão o status do erro original.")
+    detail: Any = Field(..., description="Mensagem ou corpo do erro.")
+
+
+class DashboardResponse(BaseModel):
+    """Resposta composta da tela inicial: os componentes que deram certo e as falhas."""
+    componentes: Dict[str, Any] = Field(..., description="Dados de cada componente carregado, pelo nome.")
+    falhas: Dict[str, FalhaComponente] = Field(default_factory=dict, description="Componentes que falharam ou estouraram o tempo.")
+    parcial: bool = Field(..., description="True se algum componente falhou.")
+    duracao_ms: Optional[float] = Field(None, description="Tempo total para montar a resposta.")
@@ -0,0 +1,20 @@
+# Importação schema
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class ErroLinha(BaseModel):
+    linha: int = Field(..., description="Número da linha no arquivo CSV (o cabeçalho é a linha 1).")
+    erros: List[str]
+
+
+class ResultadoImportacao(BaseModel):
+    """Resumo de uma importação de CSV."""
+    tipo: str
+    validar_apenas: bool = Field(..., description="True se as linhas só foram validadas, sem gravar.")
+    total_linhas: int
+    importadas: int
+    rejeitadas: int
+    duplicadas: int = Field(0, description="Linhas já gravadas por uma importação anterior, ignoradas.")
+    erros: List[ErroLinha] = Field(..., description="Erros por linha (limitado por IMPORTACAO_MAX_ERROS).")
+    erros_omitidos: int = Field(..., description="Erros contados mas não listados.")
@@ -0,0 +1,46 @@
+# Métricas schema
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+
+class MetricasUpstream(BaseModel):
+    estado: str = Field(..., description="Estado do disjuntor: 'fechado', 'aberto' ou 'meio_aberto'.")
+    falhas_seguidas: int
+    p95_ms: Optional[float] = Field(None, description="p95 das latências recentes (None com poucas amostras).")
+    chamadas: int
+    falhas: int
+    recusadas_pelo_disjuntor: int
+    hedges: int = Field(..., description="Segundas tentativas disparadas.")
+    hedges_vencedores: int = Field(..., description="Segundas tentativas que responderam antes da primeira.")
+    aberturas: int
+
+
+class EstadoAdmissao(BaseModel):
+    ativas: int
+    na_fila: int
+    limite: int
+    recusadas: int
+
+
+class EstadoLogs(BaseModel):
+    na_fila: int = Field(..., description="Registros esperando a escrita.")
+    descartados: int = Field(..., description="Registros descartados com a fila cheia.")
+
+
+class EstadoReplica(BaseModel):
+    saudavel: bool
+    leituras: int
+    falhas: int
+
+
+class EstadoReplicas(BaseModel):
+    leituras_primario: int = Field(..., description="Leituras de rotas GET que foram ao primário por falta de réplica saudável.")
+    sessoes_no_primario: int = Field(..., description="Sessões lendo do primário após uma escrita recente.")
+    replicas: Dict[str, EstadoReplica] = Field(..., description="Por URL de réplica.")
+
+
+class MetricasResponse(BaseModel):
+    upstreams: Dict[str, MetricasUpstream] = Field(..., description="Por tabela do Supabase.")
+    admissao: Dict[str, EstadoAdmissao] = Field(..., description="Por classe de operação.")
+    logs: EstadoLogs
+    replicas: EstadoReplicas
@@ -0,0 +1,36 @@
+# Movimento de estoque schema
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal, List, Optional
+
+
+class MovimentoEstoqueCreate(BaseModel):
+    """Schema para registrar um movimento no livro de estoque."""
+    categoria: str = Field(..., description="Categoria do produto")
+    tipo: Literal["venda", "reposicao", "ajuste"] = Field(..., description="Tipo do movimento")
+    quantidade: int = Field(..., description="Delta de unidades (negativo para saídas)")
+    observacao: Optional[str] = Field(None, description="Texto livre para auditoria")
+
+
+class MovimentoEstoque(MovimentoEstoqueCreate):
+    """Uma linha da tabela 'MovimentoEstoque'."""
+    id: int
+    created_at: datetime
+
+
+class SnapshotEstoque(BaseModel):
+    quantidade: int
+    ultimo_movimento_id: int
+
+
+class SaldoEstoqueResponse(BaseModel):
+    """Estoque calculado a partir do último snapshot e dos movimentos posteriores."""
+    categoria: str
+    quantidade: int = Field(..., description="Saldo atual da categoria")
+    snapshot: SnapshotEstoque
+    movimentos_pendentes: int = Field(..., description="Movimentos ainda não compactados")
+
+
+class MovimentoRegistradoResponse(BaseModel):
+    movimento: MovimentoEstoque
+    quantidade: int = Field(..., description="Saldo após o movimento")
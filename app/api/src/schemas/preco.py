@@ -0,0 +1,24 @@
+# Histórico de preços schema
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+
+class PrecoCreate(BaseModel):
+    """Schema para registrar uma nova versão de preço de uma categoria."""
+    categoria: str = Field(..., description="Categoria do produto")
+    preco_unitario: float = Field(..., gt=0, description="Novo preço unitário")
+    vigente_desde: Optional[datetime] = Field(None, description="Início da vigência (padrão: agora)")
+
+
+class VersaoPreco(BaseModel):
+    """Uma versão de preço do histórico."""
+    categoria: str
+    preco_unitario: float
+    vigente_desde: datetime
+
+
+class PrecoVigenteResponse(BaseModel):
+    categoria: str
+    em: datetime = Field(..., description="Instante consultado")
+    preco_unitario: float
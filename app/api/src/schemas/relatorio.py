@@ -0,0 +1,18 @@
+# Relatórios schema
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import List, Literal
+
+
+class TotalPeriodo(BaseModel):
+    """Unidades e receita de uma chave (categoria ou cliente) em um período."""
+    chave: str = Field(..., description="Categoria ou cliente")
+    periodo: date = Field(..., description="Primeiro dia do período")
+    unidades: int
+    receita: float
+
+
+class AgregadosVendasResponse(BaseModel):
+    granularidade: Literal["dia", "semana", "mes"]
+    dimensao: Literal["categoria", "cliente"]
+    totais: List[TotalPeriodo]
@@ -0,0 +1,81 @@
+# Benchmark do relatório de aging: laço por linha x NumPy vetorizado
+#
+# Uso (na raiz do repositório):
+#     python -m app.benchmarks.aging            # 1.000.000 de cobranças
+#     python -m app.benchmarks.aging 200000
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from app.api.src.core.aging import aging_de_cobrancas, limites_de_texto, nomes_faixas, FAIXA_A_VENCER
+
+
+def gerar_cobrancas(n: int, n_clientes: int = 2000, semente: int = 42) -> List[Dict[str, Any]]:
+    """Cobranças não pagas no formato retornado pelo PostgREST."""
+    aleatorio = random.Random(semente)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    clientes = [f"Cliente {i}" for i in range(n_clientes)]
+    return [
+        {
+            "cliente": aleatorio.choice(clientes),
+            "vencimento": (base + timedelta(minutes=aleatorio.randrange(0, 60 * 24 * 400))).isoformat(),
+            "valor": round(aleatorio.uniform(5, 500), 2),
+        }
+        for _ in range(n)
+    ]
+
+
+def aging_em_laco(cobrancas: List[Dict[str, Any]], agora: datetime, limites: List[int]) -> Dict[str, Any]:
+    """Mesmo cálculo com o laço de 'datetime.fromisoformat' usado em '/pendentes'."""
+    faixas = [FAIXA_A_VENCER] + nomes_faixas(limites)
+    por_cliente: Dict[str, Dict[str, List[float]]] = {}
+    for cobranca in cobrancas:
+        vencimento = datetime.fromisoformat(cobranca["vencimento"])
+        atraso = agora - vencimento
+        if atraso.total_seconds() < 0:
+            faixa = faixas[0]
+        else:
+            indice = next((i for i, limite in enumerate(limites) if atraso.days <= limite), len(limites))
+            faixa = faixas[indice + 1]
+        cliente = por_cliente.setdefault(cobranca["cliente"], {f: [0, 0.0] for f in faixas})
+        cliente[faixa][0] += 1
+        cliente[faixa][1] += float(cobranca["valor"])
+    return por_cliente
+
+
+def medir(funcao, *args) -> float:
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de aging: laço por linha x NumPy vetorizado.")
+    parser.add_argument("n", nargs="?", type=int, default=1_000_000,
+                        help="Quantidade de cobranças geradas (padrão %(default)s).")
+    n = parser.parse_args().n
+    limites = limites_de_texto("30,60,90")
+    agora = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    print(f"Gerando {n} cobranças...")
+    cobrancas = gerar_cobrancas(n)
+
+    laco = medir(aging_em_laco, cobrancas, agora, limites)
+    vetorizado = medir(aging_de_cobrancas, cobrancas, agora, limites)
+
+    # Os dois caminhos precisam chegar aos mesmos totais
+    esperado = aging_em_laco(cobrancas[:10000], agora, limites)
+    obtido = aging_de_cobrancas(cobrancas[:10000], agora, limites)
+    for cliente in obtido["clientes"]:
+        for faixa, resumo in cliente["faixas"].items():
+            assert resumo["quantidade"] == esperado[cliente["cliente"]][faixa][0], (cliente["cliente"], faixa)
+
+    print(f"Laço por linha:  {laco:8.3f} s")
+    print(f"NumPy:           {vetorizado:8.3f} s")
+    print(f"Ganho:           {laco / vetorizado:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
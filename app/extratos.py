@@ -0,0 +1,56 @@
+# Gera os extratos mensais de todos os clientes num ZIP (sem passar pela API).
+#
+# Uso (na raiz do repositório, com SUPABASE_URL e SUPABASE_KEY definidos):
+#     python -m app.extratos 2026 9
+#     python -m app.extratos 2026 9 --formato pdf --processos 8 --saida fechamento.zip
+import argparse
+import sys
+import time
+
+import requests
+
+from app.api.src.core.extratos import FORMATOS, GeradorExtratos, carregar_mes, gerar_zip, pdf_disponivel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extratos mensais por cliente (HTML, CSV ou PDF) num ZIP.")
+    parser.add_argument("ano", type=int, help="Ano do extrato")
+    parser.add_argument("mes", type=int, choices=range(1, 13), metavar="mes", help="Mês do extrato (1 a 12)")
+    parser.add_argument("--formato", choices=FORMATOS, default="html", help="Formato de cada extrato")
+    parser.add_argument("--cliente", action="append", help="Só este cliente (pode repetir; padrão: todos)")
+    parser.add_argument("--processos", type=int, default=None, help="Processos de renderização (padrão: EXTRATOS_PROCESSOS)")
+    parser.add_argument("--saida", default=None, help="Arquivo ZIP (padrão: extratos_<ano>-<mes>_<formato>.zip)")
+    args = parser.parse_args()
+
+    if args.formato == "pdf" and not pdf_disponivel():
+        print("Erro: extratos em PDF precisam do pacote 'reportlab'.", file=sys.stderr)
+        sys.exit(2)
+    saida = args.saida or f"extratos_{args.ano}-{args.mes:02d}_{args.formato}.zip"
+    gerador = GeradorExtratos() if args.processos is None else GeradorExtratos(processos=args.processos)
+
+    inicio = time.perf_counter()
+    try:
+        por_cliente = carregar_mes(args.ano, args.mes, args.cliente)
+    except requests.exceptions.RequestException as e:
+        print(f"Erro ao ler o Supabase: {e}", file=sys.stderr)
+        sys.exit(1)
+    leitura = time.perf_counter() - inicio
+
+    try:
+        with open(saida, "wb") as arquivo:
+            for parte in gerar_zip(gerador.renderizar(por_cliente, args.formato, args.ano, args.mes),
+                                   args.ano, args.mes, args.formato):
+                arquivo.write(parte)
+    finally:
+        gerador.parar()
+    duracao = time.perf_counter() - inicio
+
+    print(
+        f"{len(por_cliente)} extrato(s) em {saida}: {duracao:.2f} s "
+        f"(leitura {leitura:.2f} s, {gerador.processos} processo(s))",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Importa um CSV de vendas, clientes ou estoque direto no Supabase (sem passar pela API).
+#
+# Uso (na raiz do repositório, com SUPABASE_URL e SUPABASE_KEY definidos):
+#     python -m app.importar vendas planilha_vendas.csv
+#     python -m app.importar estoque estoque.csv --lote 1000 --validar-apenas
+import argparse
+import json
+import sys
+import time
+
+from app.api.src.core.importacao import TIPOS_IMPORTACAO, importar_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação em massa de CSV para o Supabase.")
+    parser.add_argument("tipo", choices=list(TIPOS_IMPORTACAO), help="O que o CSV contém")
+    parser.add_argument("arquivo", help="Caminho do arquivo CSV (UTF-8, com cabeçalho)")
+    parser.add_argument("--lote", type=int, default=None, help="Linhas por upsert (padrão: IMPORTACAO_LOTE)")
+    parser.add_argument("--validar-apenas", action="store_true", help="Só valida as linhas, sem gravar")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with open(args.arquivo, encoding="utf-8-sig", newline="") as arquivo:
+        try:
+            resultado = importar_csv(args.tipo, arquivo, lote=args.lote, validar_apenas=args.validar_apenas)
+        except ValueError as e:
+            print(f"Erro: {e}", file=sys.stderr)
+            sys.exit(2)
+    duracao = time.perf_counter() - inicio
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(
+        f"{resultado['total_linhas']} linha(s) em {duracao:.2f} s "
+        f"({resultado['total_linhas'] / duracao if duracao else 0:.0f} linhas/s)",
+        file=sys.stderr,
+    )
+    sys.exit(1 if resultado["rejeitadas"] else 0)
+
+
+if __name__ == "__main__":
+    main()
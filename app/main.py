@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, FastAPI # Import FastAPI
 # NOTE: Adjust the import path for your endpoints based on your actual file structure
 from app.api.src.routes.atualizar_estoque import router as atualizar_estoque_router
@@ -7,6 +8,27 @@ from app.api.src.routes.historico import router as historico_router
 from app.api.src.routes.estoque_atual import router as estoque_atual_router
 from app.api.src.routes.cobranca import router as cobranca_router
 from app.api.src.routes.clientes import router as clientes_router
+from app.api.src.routes.eventos import router as eventos_router
+from app.api.src.routes.mudancas import router as mudancas_router
+from app.api.src.routes.movimentos import router as movimentos_router
+from app.api.src.routes.precos import router as precos_router
+from app.api.src.routes.relatorios import router as relatorios_router
+from app.api.src.routes.dashboard import router as dashboard_router
+from app.api.src.routes.batch import router as batch_router
+from app.api.src.routes.exportar import router as exportar_router
+from app.api.src.routes.importar import router as importar_router
+from app.api.src.routes.metricas import router as metricas_router
+from app.api.src.routes.admin import router as admin_router
+from app.api.src.routes.extratos import router as extratos_router
+from app.api.src.core.mudancas import consumidor as consumidor_mudancas
+from app.api.src.core.movimentos import compactador as compactador_movimentos
+from app.api.src.core.extratos import gerador_extratos
+from app.api.src.core.admissao import MiddlewareAdmissao
+from app.api.src.core.prazo import MiddlewarePrazo
+from app.api.src.core.idempotencia import MiddlewareIdempotencia
+from app.api.src.core.perfil import MiddlewarePerfil
+from app.api.src.core.registro import MiddlewareIdRequisicao
+from app.api.src.core.replicas import MiddlewareReplicas
 # 1. Create the top-level API router for v1
 api_router = APIRouter()
 
@@ -18,14 +40,53 @@ api_router.include_router(historico_router, prefix="/historico", tags=["Históri
 api_router.include_router(estoque_atual_router, prefix="/estoque", tags=["Estoque"])
 api_router.include_router(cobranca_router,prefix='/cobranca',tags=['Cobrança'])
 api_router.include_router(clientes_router,prefix='/clientes',tags=['Clientes'])
-# 3. Create the main FastAPI application instance
+api_router.include_router(eventos_router,prefix='/eventos',tags=['Eventos'])
+api_router.include_router(mudancas_router,prefix='/mudancas',tags=['Mudanças'])
+api_router.include_router(movimentos_router,prefix='/movimentos',tags=['Movimentos de Estoque'])
+api_router.include_router(precos_router,prefix='/precos',tags=['Preços'])
+api_router.include_router(relatorios_router,prefix='/relatorios',tags=['Relatórios'])
+api_router.include_router(dashboard_router,prefix='/dashboard',tags=['Dashboard'])
+api_router.include_router(batch_router,prefix='/batch',tags=['Batch'])
+api_router.include_router(exportar_router,prefix='/exportar',tags=['Exportação'])
+api_router.include_router(importar_router,prefix='/importar',tags=['Importação'])
+api_router.include_router(metricas_router,prefix='/metricas',tags=['Métricas'])
+api_router.include_router(admin_router,prefix='/admin',tags=['Admin'])
+api_router.include_router(extratos_router,prefix='/extratos',tags=['Extratos'])
+# 3. Background tasks started and stopped with the application
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Polling fallback for the change feed (disabled unless MUDANCAS_POLLING_INTERVALO > 0)
+    consumidor_mudancas.iniciar_polling()
+    # Periodic stock ledger compaction (disabled unless MOVIMENTOS_COMPACTACAO_INTERVALO > 0)
+    compactador_movimentos.iniciar()
+    yield
+    # Statement rendering process pool (created on first use)
+    gerador_extratos.parar()
+    compactador_movimentos.parar()
+    consumidor_mudancas.parar_polling()
+
+# 4. Create the main FastAPI application instance
 app = FastAPI(
     title="Brownie API",
     version="1.0.0",
-    description="API for managing Bonobrownie sales and inventory."
+    description="API for managing Bonobrownie sales and inventory.",
+    lifespan=lifespan
 )
 
-# 4. Include the v1 router into the main application, usually with a prefix
+# Admission control: bounded concurrency per operation class, fast 503 when the queues are full
+app.add_middleware(MiddlewareAdmissao)
+# Idempotency-Key on sale and receivable creation; replays skip admission control
+app.add_middleware(MiddlewareIdempotencia)
+# Read-replica routing for GET requests (SUPABASE_REPLICAS); sessions that just wrote stay on the primary
+app.add_middleware(MiddlewareReplicas)
+# Sampling profiler for a fraction of requests (PERFIL_AMOSTRAGEM) or on demand
+app.add_middleware(MiddlewarePerfil)
+# Deadline budget per request (X-Prazo-Ms header or route default)
+app.add_middleware(MiddlewarePrazo)
+# Request id (X-Request-Id) for log correlation; added last so it wraps everything else
+app.add_middleware(MiddlewareIdRequisicao)
+
+# 5. Include the v1 router into the main application, usually with a prefix
 app.include_router(api_router, prefix="/api/v1") 
 
 # Optional: Add a root endpoint for health check/discovery
@@ -0,0 +1,135 @@
+# Microbenchmarks dos trechos de CPU puro das rotas, com a rede substituída
+"""
+Mede, em conjuntos sintéticos de linhas:
+
+    relatorio_pendentes   laço de classificação de 'obter_relatorio_pendentes'
+    cobrancas_ativas      formatação de 'listar_cobrancas_ativas'
+    cobrancas_pagas       formatação de 'listar_cobrancas_pagas'
+    cobranca_de_venda     'criar_cobranca_de_venda'
+    venda_de_linha        'Venda(**item)' de 'obter_historico'
+
+A busca no Supabase ('_buscar_cobrancas') é trocada por uma função que
+devolve as linhas geradas, então só o processamento em Python é medido.
+
+Os casos têm o marcador 'benchmark' e ficam fora da execução padrão. Ao
+rodá-los, o pytest-benchmark compara com a última base gravada em
+tests/benchmarks/base e falha se algum caso ficar mais de 25% mais lento
+(opções em 'addopts', no pyproject.toml):
+
+    pytest -m benchmark
+    BENCHMARK_TAMANHOS=1000,1000000 pytest -m benchmark -k cobrancas_ativas
+
+A base é por máquina (pasta com o nome da plataforma e do Python). Para
+gravar uma nova, depois de uma melhoria ou numa máquina sem base:
+
+    pytest -m benchmark --benchmark-save=base
+
+Em máquinas compartilhadas (VMs, CI) o ruído entre execuções passa com
+facilidade dos 25%; ali, grave a base e compare na mesma sessão, ou afrouxe
+o limite na linha de comando (--benchmark-compare-fail=min:60%).
+"""
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+# 'vender' antes de 'cobranca', como no main.py (os dois módulos se importam)
+from app.api.src.routes import vender  # noqa: F401
+from app.api.src.routes import cobranca
+from app.api.src.schemas.venda import Venda
+
+TAMANHOS = [int(t) for t in os.environ.get("BENCHMARK_TAMANHOS", "1000,10000,100000").split(",") if t.strip()]
+
+# Rodadas até somar ~1 s por caso (no mínimo 5): o mínimo delas sofre pouco com o ruído da máquina
+pytestmark = pytest.mark.benchmark(group="caminhos_quentes", min_rounds=5, max_time=1.0)
+
+
+def gerar_cobrancas(n: int, pagas: bool = False, n_clientes: int = 2000, semente: int = 42) -> List[Dict[str, Any]]:
+    """Linhas de 'Cobranca' no formato retornado pelo PostgREST."""
+    aleatorio = random.Random(semente)
+    base = datetime.now(timezone.utc) - timedelta(days=200)
+    clientes = [f"Cliente {i}" for i in range(n_clientes)]
+    linhas = []
+    for i in range(n):
+        venda = base + timedelta(minutes=aleatorio.randrange(0, 60 * 24 * 300))
+        linhas.append({
+            "id": i + 1,
+            "cliente": aleatorio.choice(clientes),
+            "vencimento": (venda + timedelta(days=aleatorio.choice((0, 7, 15, 30)))).isoformat(),
+            "data_venda": venda.isoformat(),
+            "valor": round(aleatorio.uniform(5, 500), 2),
+            "status_pagamento": pagas,
+        })
+    return linhas
+
+
+def gerar_vendas(n: int, n_clientes: int = 2000, semente: int = 42) -> List[Dict[str, Any]]:
+    """Linhas de 'Venda' no formato retornado pelo PostgREST."""
+    aleatorio = random.Random(semente)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    categorias = ["Brownie", "Bolo", "Cookie", "Torta", "Pão de mel"]
+    linhas = []
+    for _ in range(n):
+        venda = base + timedelta(minutes=aleatorio.randrange(0, 60 * 24 * 300))
+        unidades = aleatorio.randint(1, 50)
+        unitario = round(aleatorio.uniform(3, 20), 2)
+        linhas.append({
+            "cliente": f"Cliente {aleatorio.randrange(n_clientes)}",
+            "categoria_produto": aleatorio.choice(categorias),
+            "qtd_unidades": unidades,
+            "valor_unitario": unitario,
+            "status_pagamento": aleatorio.random() < 0.5,
+            "data_venda": venda.isoformat(),
+            "data_vencimento": (venda + timedelta(days=30)).isoformat(),
+            "valor_total": round(unidades * unitario, 2),
+        })
+    return linhas
+
+
+def _rota_sem_rede(rota: Callable[[], Any], pagas: bool) -> Tuple[Callable[[int], Any], Callable[[Any], Any]]:
+    def preparar(n: int):
+        return gerar_cobrancas(n, pagas=pagas)
+
+    def executar(linhas):
+        original = cobranca._buscar_cobrancas
+        cobranca._buscar_cobrancas = lambda pagas: linhas
+        try:
+            return rota()
+        finally:
+            cobranca._buscar_cobrancas = original
+
+    return preparar, executar
+
+
+def _preparar_vendas(n: int) -> List[Venda]:
+    return [Venda(**item) for item in gerar_vendas(n)]
+
+
+def _cobrancas_de_vendas(vendas: List[Venda]):
+    criar = cobranca.criar_cobranca_de_venda
+    return [criar(venda) for venda in vendas]
+
+
+def _vendas_de_linhas(linhas: List[Dict[str, Any]]):
+    return [Venda(**item) for item in linhas]
+
+
+# caso -> (preparar(n) -> dados, executar(dados))
+CASOS: Dict[str, Tuple[Callable[[int], Any], Callable[[Any], Any]]] = {
+    "relatorio_pendentes": _rota_sem_rede(cobranca.obter_relatorio_pendentes, pagas=False),
+    "cobrancas_ativas": _rota_sem_rede(cobranca.listar_cobrancas_ativas, pagas=False),
+    "cobrancas_pagas": _rota_sem_rede(cobranca.listar_cobrancas_pagas, pagas=True),
+    "cobranca_de_venda": (_preparar_vendas, _cobrancas_de_vendas),
+    "venda_de_linha": (gerar_vendas, _vendas_de_linhas),
+}
+
+
+@pytest.mark.parametrize("n", TAMANHOS)
+@pytest.mark.parametrize("caso", list(CASOS))
+def test_caminho_quente(benchmark, caso, n):
+    preparar, executar = CASOS[caso]
+    dados = preparar(n)
+    benchmark.extra_info["linhas"] = n
+    benchmark(executar, dados)
@@ -0,0 +1,82 @@
+# Fixtures dos testes: um PostgREST falso em memória no lugar do Supabase
+"""
+Os testes sobem a aplicação inteira (com todos os middlewares) num
+TestClient e apontam SUPABASE_URL para um servidor HTTP local que imita o
+PostgREST (tests/supabase_falso.py). Falhas e atrasos por tabela são
+configurados em 'supabase.falhas' e 'supabase.atrasos'.
+
+As variáveis de ambiente são definidas antes de importar a aplicação, já
+que os módulos as leem na importação.
+"""
+import os
+from typing import Any, Dict
+
+import pytest
+
+from supabase_falso import SupabaseFalso, iniciar
+
+_banco, _url = iniciar()
+os.environ["SUPABASE_URL"] = _url
+os.environ["SUPABASE_KEY"] = "chave-de-teste"
+os.environ["SUPABASE_REPLICAS"] = ""
+# Sem janela no coalescedor: cada baixa de estoque é gravada na hora
+os.environ.setdefault("ESTOQUE_COALESCER_JANELA_MS", "0")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Gravando uma nova base dos benchmarks (--benchmark-save), uma piora não reprova
+    if getattr(config.option, "benchmark_save", None):
+        config.option.benchmark_compare_fail = None
+
+
+@pytest.fixture
+def supabase() -> SupabaseFalso:
+    """O PostgREST falso, vazio no começo de cada teste."""
+    _banco.limpar()
+    yield _banco
+    _banco.limpar()
+
+
+@pytest.fixture(autouse=True)
+def estado_limpo():
+    """Zera o estado em memória da aplicação que passa de um teste para outro."""
+    # A aplicação primeiro: importar as rotas soltas esbarra em importações circulares
+    import app.main  # noqa: F401
+    from app.api.src.core.idempotencia import registro_idempotencia
+    from app.api.src.core.precos import indice_precos
+    from app.api.src.core.resiliencia import resiliencia
+    from app.api.src.routes.cobranca import cache_cobrancas
+    from app.api.src.routes.estoque_atual import cache_estoque
+
+    cache_estoque.invalidar_tudo()
+    cache_cobrancas.invalidar_tudo()
+    indice_precos.invalidar()
+    with registro_idempotencia._lock:
+        registro_idempotencia._entradas.clear()
+    with resiliencia._lock:
+        resiliencia._upstreams.clear()
+    yield
+
+
+@pytest.fixture
+def client(supabase):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def venda() -> Dict[str, Any]:
+    """Corpo válido de '/vendas/vender'."""
+    return {
+        "cliente": "ana",
+        "categoria_produto": "brownie",
+        "qtd_unidades": 2,
+        "valor_unitario": 5.0,
+        "status_pagamento": False,
+        "data_venda": "2026-01-10T12:00:00+00:00",
+        "data_vencimento": "2026-02-10T12:00:00+00:00",
+        "valor_total": 10.0,
+    }
@@ -0,0 +1,191 @@
+# PostgREST falso em memória, usado no lugar do Supabase (e das réplicas) nos testes
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+
+class SupabaseFalso:
+    """Tabelas em memória e o registro das requisições recebidas."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tabelas: Dict[str, List[Dict[str, Any]]] = {}
+        self.requisicoes: List[Tuple[str, str, Any]] = []
+        # tabela -> status HTTP devolvido aos POSTs
+        self.falhas: Dict[str, int] = {}
+        # (método, tabela) -> segundos de espera antes de responder
+        self.atrasos: Dict[Tuple[str, str], float] = {}
+        # Com True, todo GET responde 503
+        self.fora_do_ar = False
+        self._ids = itertools.count(1)
+
+    def limpar(self) -> None:
+        with self.lock:
+            self.tabelas.clear()
+            self.requisicoes.clear()
+            self.falhas.clear()
+            self.atrasos.clear()
+            self.fora_do_ar = False
+
+    def linhas(self, tabela: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [dict(linha) for linha in self.tabelas.get(tabela, [])]
+
+    def inserir(self, tabela: str, **linha) -> Dict[str, Any]:
+        with self.lock:
+            linha.setdefault("id", next(self._ids))
+            linha.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+            self.tabelas.setdefault(tabela, []).append(linha)
+            return dict(linha)
+
+    def escritas(self, tabela: str) -> List[Tuple[str, str, Any]]:
+        """Requisições de escrita recebidas para a tabela, na ordem."""
+        return [r for r in self.requisicoes if r[0] != "GET" and r[1] == tabela]
+
+
+_PARAMETROS_ESPECIAIS = {"select", "order", "limit", "offset", "on_conflict", "columns", "and", "or"}
+
+
+def _comparar(valor: Any, operador: str, texto: str) -> bool:
+    if operador == "eq":
+        return (str(valor).lower() if isinstance(valor, bool) else str(valor)) == texto
+    if operador == "neq":
+        return str(valor) != texto
+    if operador == "in":
+        return str(valor) in [v.strip('"') for v in texto.strip("()").split(",")]
+    if operador == "is":
+        return valor is None if texto == "null" else str(valor).lower() == texto
+    if operador in ("gt", "gte", "lt", "lte"):
+        if valor is None:
+            return False
+        try:
+            a, b = float(valor), float(texto)
+        except (TypeError, ValueError):
+            a, b = str(valor), texto
+        return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[operador]
+    return True
+
+
+def _criar_handler(banco: SupabaseFalso):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _requisicao(self) -> Tuple[str, List[Tuple[str, str]]]:
+            partes = urllib.parse.urlsplit(self.path)
+            return partes.path.rsplit("/", 1)[-1], urllib.parse.parse_qsl(partes.query, keep_blank_values=True)
+
+        def _corpo(self) -> Any:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(tamanho) or b"null")
+
+        def _responder(self, status_code: int, corpo: Any, headers: Dict[str, str] = None) -> None:
+            dados = json.dumps(corpo, default=str).encode()
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            for nome, valor in (headers or {}).items():
+                self.send_header(nome, valor)
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _filtrar(self, tabela: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+            filtros = [(c, *v.partition(".")[::2]) for c, v in params if c not in _PARAMETROS_ESPECIAIS]
+            return [
+                linha for linha in banco.tabelas.get(tabela, [])
+                if all(_comparar(linha.get(c), op, texto) for c, op, texto in filtros)
+            ]
+
+        def _esperar(self, metodo: str, tabela: str) -> None:
+            atraso = banco.atrasos.get((metodo, tabela), 0.0)
+            if atraso:
+                time.sleep(atraso)
+
+        def do_GET(self):
+            tabela, params = self._requisicao()
+            banco.requisicoes.append(("GET", tabela, params))
+            self._esperar("GET", tabela)
+            if banco.fora_do_ar:
+                self._responder(503, {"message": "fora do ar"})
+                return
+            opcoes = dict(params)
+            with banco.lock:
+                linhas = [dict(l) for l in self._filtrar(tabela, params)]
+            for ordem in reversed(opcoes.get("order", "").split(",") if opcoes.get("order") else []):
+                coluna, _, direcao = ordem.partition(".")
+                linhas.sort(key=lambda l: (l.get(coluna) is None, str(l.get(coluna))),
+                            reverse=direcao.startswith("desc"))
+            total = len(linhas)
+            inicio = int(opcoes.get("offset", 0))
+            fim = inicio + int(opcoes["limit"]) if "limit" in opcoes else None
+            linhas = linhas[inicio:fim]
+            if opcoes.get("select", "*") != "*":
+                colunas = [c.split(":")[0] for c in opcoes["select"].split(",")]
+                linhas = [{c: l.get(c) for c in colunas} for l in linhas]
+            self._responder(200, linhas, {"Content-Range": f"{inicio}-{inicio + len(linhas) - 1}/{total}"})
+
+        def do_POST(self):
+            tabela, params = self._requisicao()
+            corpo = self._corpo()
+            banco.requisicoes.append(("POST", tabela, corpo))
+            self._esperar("POST", tabela)
+            if tabela in banco.falhas:
+                self._responder(banco.falhas[tabela], {"message": "falha simulada"})
+                return
+            conflito = dict(params).get("on_conflict")
+            ignorar = "ignore-duplicates" in (self.headers.get("Prefer") or "")
+            gravadas = []
+            with banco.lock:
+                linhas = banco.tabelas.setdefault(tabela, [])
+                for nova in corpo if isinstance(corpo, list) else [corpo]:
+                    existente = None
+                    if conflito:
+                        colunas = conflito.split(",")
+                        existente = next(
+                            (l for l in linhas if all(l.get(c) == nova.get(c) for c in colunas)), None
+                        )
+                    if existente is not None:
+                        if not ignorar:
+                            existente.update(nova)
+                            gravadas.append(dict(existente))
+                        continue
+                    nova = dict(nova)
+                    nova.setdefault("id", next(banco._ids))
+                    nova.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    linhas.append(nova)
+                    gravadas.append(dict(nova))
+            self._responder(201, gravadas)
+
+        def do_PATCH(self):
+            tabela, params = self._requisicao()
+            corpo = self._corpo()
+            banco.requisicoes.append(("PATCH", tabela, corpo))
+            with banco.lock:
+                linhas = self._filtrar(tabela, params)
+                for linha in linhas:
+                    linha.update(corpo)
+                gravadas = [dict(l) for l in linhas]
+            self._responder(200, gravadas)
+
+        def do_DELETE(self):
+            tabela, params = self._requisicao()
+            banco.requisicoes.append(("DELETE", tabela, params))
+            with banco.lock:
+                removidas = self._filtrar(tabela, params)
+                banco.tabelas[tabela] = [l for l in banco.tabelas.get(tabela, []) if l not in removidas]
+            self._responder(200, removidas)
+
+    return Handler
+
+
+def iniciar() -> Tuple[SupabaseFalso, str]:
+    """Sobe um servidor numa porta livre; retorna o banco e a URL base."""
+    banco = SupabaseFalso()
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _criar_handler(banco))
+    threading.Thread(target=servidor.serve_forever, name="supabase-falso", daemon=True).start()
+    return banco, f"http://127.0.0.1:{servidor.server_address[1]}"
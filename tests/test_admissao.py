@@ -0,0 +1,95 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.src.core.admissao import ControleAdmissao, MiddlewareAdmissao
+
+
+def _app_lenta(controle: ControleAdmissao, liberar: threading.Event) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MiddlewareAdmissao, controle=controle)
+
+    @app.post("/api/v1/vendas/vender")
+    def vender():
+        liberar.wait(5)
+        return {"ok": True}
+
+    @app.get("/api/v1/relatorios/lento")
+    def relatorio():
+        liberar.wait(5)
+        return {"ok": True}
+
+    @app.get("/api/v1/metricas/")
+    def metricas():
+        return {"ok": True}
+
+    return app
+
+
+def test_classificacao_das_rotas():
+    middleware = MiddlewareAdmissao(None, controle=ControleAdmissao())
+    assert middleware.classificar("POST", "/api/v1/vendas/vender") == "escrita"
+    assert middleware.classificar("GET", "/api/v1/estoque/estoque") == "leitura"
+    assert middleware.classificar("POST", "/api/v1/historico/historico/1") == "leitura"
+    assert middleware.classificar("GET", "/api/v1/relatorios/vendas") == "relatorio"
+    assert middleware.classificar("POST", "/api/v1/batch/") is None
+    assert middleware.classificar("GET", "/") is None
+
+
+def test_fila_cheia_recusa_com_503_e_retry_after():
+    controle = ControleAdmissao(concorrencia=4, limites={"relatorio": 1}, fila=0, espera=0.1)
+    liberar = threading.Event()
+    client = TestClient(_app_lenta(controle, liberar))
+
+    primeira = threading.Thread(target=client.get, args=("/api/v1/relatorios/lento",))
+    primeira.start()
+    try:
+        for _ in range(100):
+            if controle.estado()["relatorio"]["ativas"] == 1:
+                break
+            time.sleep(0.01)
+        recusada = client.get("/api/v1/relatorios/lento")
+        assert recusada.status_code == 503
+        assert int(recusada.headers["retry-after"]) >= 1
+
+        # As escritas têm vagas próprias e não esperam pelos relatórios
+        escrita = threading.Thread(target=client.post, args=("/api/v1/vendas/vender",))
+        escrita.start()
+        for _ in range(100):
+            if controle.estado()["escrita"]["ativas"] == 1:
+                break
+            time.sleep(0.01)
+        assert controle.estado()["escrita"]["ativas"] == 1
+    finally:
+        liberar.set()
+        primeira.join()
+        escrita.join()
+    assert controle.estado()["relatorio"]["recusadas"] == 1
+
+
+def test_rotas_livres_nao_passam_pelo_controle():
+    controle = ControleAdmissao(concorrencia=1, fila=0, espera=0.0)
+    client = TestClient(_app_lenta(controle, threading.Event()))
+    assert client.get("/api/v1/metricas/").status_code == 200
+    assert all(c["ativas"] == 0 and c["recusadas"] == 0 for c in controle.estado().values())
+
+
+def test_espera_na_fila_e_atendida_quando_a_vaga_abre():
+    controle = ControleAdmissao(concorrencia=1, fila=4, espera=2.0)
+    liberar = threading.Event()
+    client = TestClient(_app_lenta(controle, liberar))
+    respostas = []
+
+    threads = [
+        threading.Thread(target=lambda: respostas.append(client.post("/api/v1/vendas/vender").status_code))
+        for _ in range(2)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    liberar.set()
+    for t in threads:
+        t.join()
+    assert respostas == [200, 200]
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+from app.api.src.core import aging
+
+
+def test_cobranca_sem_vencimento_fica_fora_das_faixas():
+    agora = datetime(2026, 1, 31, tzinfo=timezone.utc)
+    resultado = aging.calcular_aging(
+        ["Ana", "Ana", "Bia"],
+        ["2026-01-01T00:00:00+00:00", None, None],
+        [10.0, 20.0, 5.0],
+        agora,
+        [30, 60, 90],
+    )
+    assert resultado["sem_vencimento"] == {"quantidade": 2, "valor_total": 25.0}
+    assert resultado["totais"]["a_vencer"]["quantidade"] == 0
+    assert resultado["totais"]["0-30"] == {"quantidade": 1, "valor_total": 10.0}
+    assert resultado["total_a_receber"] == 10.0
+    assert [c["cliente"] for c in resultado["clientes"]] == ["Ana"]
+
+
+def test_rota_de_aging_informa_as_cobrancas_sem_vencimento(client, supabase):
+    supabase.inserir(
+        "Cobranca", cliente="Ana", vencimento=None, valor=12.5,
+        data_venda="2026-01-01T00:00:00+00:00", status_pagamento=False,
+    )
+    response = client.get("/api/v1/cobranca/aging")
+    assert response.status_code == 200
+    corpo = response.json()
+    assert corpo["sem_vencimento"] == {"quantidade": 1, "valor_total": 12.5}
+    assert corpo["totais"]["a_vencer"]["quantidade"] == 0
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from app.api.src.core.busca import IndiceBusca
+
+
+def test_mudancas_durante_a_recarga_nao_se_perdem():
+    indice = IndiceBusca(ttl=0)
+    indice.substituir([(1, "Padaria Central", "antigo"), (2, "Mercado Sul", "sul")])
+    lendo, liberar = threading.Event(), threading.Event()
+
+    def carregar():
+        # Leitura feita antes das mudanças abaixo
+        itens = [(1, "Padaria Central", "antigo"), (2, "Mercado Sul", "sul")]
+        lendo.set()
+        liberar.wait(2)
+        return itens
+
+    indice.garantir_carregado(carregar)
+    assert lendo.wait(2)
+    indice.adicionar(3, "Bar do Zé", "novo")
+    indice.adicionar(1, "Padaria Central", "atualizado")
+    indice.remover(2)
+    liberar.set()
+    for _ in range(100):
+        if not indice._recarregando:
+            break
+        time.sleep(0.01)
+
+    assert indice.buscar("bar") == ["novo"]
+    assert indice.buscar("padaria") == ["atualizado"]
+    assert indice.buscar("mercado") == []
+    assert len(indice) == 2
+
+
+def test_primeira_carga_acontece_uma_vez_so():
+    indice = IndiceBusca(ttl=300)
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        time.sleep(0.1)
+        return [(1, "Padaria Central", "padaria")]
+
+    threads = [threading.Thread(target=indice.garantir_carregado, args=(carregar,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(chamadas) == 1
+    assert indice.buscar("pad") == ["padaria"]
+
+
+def test_primeira_carga_com_falha_pode_ser_refeita():
+    indice = IndiceBusca(ttl=300)
+
+    def falhar():
+        raise RuntimeError("fora do ar")
+
+    with pytest.raises(RuntimeError):
+        indice.garantir_carregado(falhar)
+    indice.adicionar(1, "Padaria Central", "padaria")
+    indice.garantir_carregado(lambda: [(2, "Mercado Sul", "sul")])
+    assert indice._pendentes is None
+    assert indice.buscar("mercado") == ["sul"]
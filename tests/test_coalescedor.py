@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from app.api.src.core import idempotencia, prazo
+from app.api.src.core.coalescedor import CoalescedorEscritas
+
+
+def _em_paralelo(funcoes):
+    resultados, erros = {}, {}
+
+    def rodar(i, funcao):
+        try:
+            resultados[i] = funcao()
+        except Exception as e:
+            erros[i] = e
+
+    threads = [threading.Thread(target=rodar, args=(i, f)) for i, f in enumerate(funcoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados, erros
+
+
+def test_deltas_concorrentes_viram_uma_escrita():
+    chamadas = []
+
+    def aplicar(chave, deltas):
+        chamadas.append((chave, list(deltas)))
+        return sum(deltas)
+
+    coalescedor = CoalescedorEscritas(aplicar, janela=0.1)
+    resultados, erros = _em_paralelo([lambda d=d: coalescedor.adicionar("brownie", d) for d in (-1, -2, -3)])
+    assert not erros
+    assert len(chamadas) == 1 and sorted(chamadas[0][1]) == [-3, -2, -1]
+    assert set(resultados.values()) == {-6}
+
+
+def test_erro_da_escrita_chega_a_todos_os_chamadores():
+    def aplicar(chave, deltas):
+        raise RuntimeError("supabase fora")
+
+    coalescedor = CoalescedorEscritas(aplicar, janela=0.1)
+    _, erros = _em_paralelo([lambda: coalescedor.adicionar("brownie", -1) for _ in range(3)])
+    assert len(erros) == 3 and all(isinstance(e, RuntimeError) for e in erros.values())
+
+
+def test_escrita_roda_com_o_maior_prazo_e_marca_todos_os_chamadores():
+    vistos = {}
+
+    def aplicar(chave, deltas):
+        vistos["prazo"] = prazo.atual()
+        idempotencia.marcar_escrita_enviada()
+        return sum(deltas)
+
+    coalescedor = CoalescedorEscritas(aplicar, janela=0.1)
+    marcas = [idempotencia.MarcaEscritas() for _ in range(2)]
+
+    def chamar(marca, segundos):
+        idempotencia.definir_marca(marca)
+        prazo.definir(segundos)
+        return coalescedor.adicionar("brownie", -1)
+
+    inicio = time.monotonic()
+    _, erros = _em_paralelo([lambda: chamar(marcas[0], 5), lambda: chamar(marcas[1], 30)])
+    assert not erros
+    assert vistos["prazo"] >= inicio + 30
+    assert all(marca.enviada for marca in marcas)
+
+
+def test_chamador_sem_prazo_tira_o_prazo_da_escrita():
+    vistos = {}
+
+    def aplicar(chave, deltas):
+        vistos["prazo"] = prazo.atual()
+
+    coalescedor = CoalescedorEscritas(aplicar, janela=0.1)
+
+    def chamar(segundos):
+        prazo.definir(segundos)
+        coalescedor.adicionar("brownie", -1)
+
+    _em_paralelo([lambda: chamar(5), lambda: chamar(None)])
+    assert vistos["prazo"] is None
+
+
+@pytest.mark.parametrize("janela_ms", [0, 50])
+def test_baixa_do_estoque_pela_rota(client, supabase, monkeypatch, janela_ms):
+    from app.api.src.routes import estoque_atual
+
+    monkeypatch.setattr(estoque_atual.coalescedor_estoque, "janela", janela_ms / 1000)
+    supabase.inserir("Estoque", categoria="brownie", quantidade=50, preco_unitario=5.0)
+    corpo = {"categoria": "brownie", "quantidade": -1}
+    _, erros = _em_paralelo([
+        lambda: client.post("/api/v1/estoque/adicionar_ao_estoque", json=corpo) for _ in range(4)
+    ])
+    assert not erros
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 46
+    if janela_ms:
+        assert len(supabase.escritas("Estoque")) < 4
+
+
+def test_venda_recusada_nao_baixa_o_estoque(client, supabase, venda):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=50, preco_unitario=5.0)
+    supabase.falhas["Venda"] = 400
+    response = client.post("/api/v1/vendas/vender", json=venda)
+    assert response.status_code == 400
+    assert supabase.escritas("Estoque") == []
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 50
+
+
+def test_falha_na_baixa_do_estoque_diz_que_a_venda_foi_gravada(client, supabase, venda):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=50, preco_unitario=5.0)
+    supabase.falhas["Estoque"] = 400
+    response = client.post("/api/v1/vendas/vender", json=venda)
+    assert response.status_code >= 400
+    assert "venda e a cobrança foram registradas" in response.json()["detail"]
+    assert len(supabase.linhas("Venda")) == 1
+    assert len(supabase.linhas("Cobranca")) == 1
@@ -0,0 +1,71 @@
+def _estoque(supabase, quantidade=50):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=quantidade, preco_unitario=5.0)
+
+
+def test_repeticao_recebe_a_resposta_guardada(client, supabase, venda):
+    _estoque(supabase)
+    cabecalhos = {"Idempotency-Key": "pdv-1"}
+    primeira = client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos)
+    segunda = client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos)
+    assert primeira.status_code == segunda.status_code == 201
+    assert segunda.headers["idempotency-replayed"] == "true"
+    assert len(supabase.linhas("Venda")) == 1
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 48
+
+
+def test_mesma_chave_com_outro_corpo_e_recusada(client, supabase, venda):
+    _estoque(supabase)
+    cabecalhos = {"Idempotency-Key": "pdv-2"}
+    assert client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos).status_code == 201
+    outra = client.post("/api/v1/vendas/vender", json={**venda, "qtd_unidades": 3}, headers=cabecalhos)
+    assert outra.status_code == 422
+
+
+def test_5xx_depois_de_uma_escrita_fica_guardado(client, supabase, venda):
+    _estoque(supabase)
+    supabase.falhas["Cobranca"] = 500
+    cabecalhos = {"Idempotency-Key": "pdv-3"}
+    primeira = client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos)
+    assert primeira.status_code >= 500
+
+    supabase.falhas.clear()
+    repeticao = client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos)
+    assert repeticao.headers.get("idempotency-replayed") == "true"
+    assert repeticao.status_code == primeira.status_code
+    # A repetição não grava a venda de novo
+    assert len(supabase.linhas("Venda")) == 1
+
+
+def test_5xx_sem_escritas_libera_a_chave(client, supabase, venda):
+    _estoque(supabase)
+    supabase.atrasos[("GET", "HistoricoPreco")] = 0.3
+    supabase.atrasos[("GET", "Estoque")] = 0.3
+    cabecalhos = {"Idempotency-Key": "pdv-4"}
+    sem_preco = {**venda, "valor_unitario": None}
+    primeira = client.post("/api/v1/vendas/vender", json=sem_preco, headers={**cabecalhos, "X-Prazo-Ms": "100"})
+    assert primeira.status_code == 504
+    assert supabase.escritas("Venda") == []
+
+    supabase.atrasos.clear()
+    segunda = client.post("/api/v1/vendas/vender", json=sem_preco, headers=cabecalhos)
+    assert segunda.status_code == 201
+    assert "idempotency-replayed" not in segunda.headers
+    assert len(supabase.linhas("Venda")) == 1
+
+
+def test_batch_deriva_uma_chave_por_operacao(client, supabase, venda):
+    _estoque(supabase)
+    batch = {"operacoes": [
+        {"metodo": "POST", "caminho": "/vendas/vender", "corpo": venda},
+        {"metodo": "POST", "caminho": "/vendas/vender", "corpo": {**venda, "cliente": "bia"}},
+    ]}
+    cabecalhos = {"Idempotency-Key": "turno-7"}
+    primeira = client.post("/api/v1/batch/", json=batch, headers=cabecalhos)
+    assert [r["status_code"] for r in primeira.json()["resultados"]] == [201, 201]
+    assert len(supabase.linhas("Venda")) == 2
+
+    # O batch reenviado (ex.: depois de um timeout) não duplica as vendas
+    repeticao = client.post("/api/v1/batch/", json=batch, headers=cabecalhos)
+    assert [r["status_code"] for r in repeticao.json()["resultados"]] == [201, 201]
+    assert len(supabase.linhas("Venda")) == 2
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 46
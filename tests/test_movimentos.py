@@ -0,0 +1,78 @@
+import pytest
+
+from app.api.src.core import movimentos
+
+
+def _estoque(supabase, quantidade=50):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=quantidade, preco_unitario=5.0)
+
+
+@pytest.fixture
+def modo_movimentos(monkeypatch):
+    monkeypatch.setattr(movimentos, "ESTOQUE_MODO", "movimentos")
+
+
+def _estoque_atual(client):
+    return client.post("/api/v1/estoque/estoque_atual", json={"categoria": "brownie"}).json()
+
+
+def test_livro_recusa_escritas_no_modo_upsert(client, supabase):
+    _estoque(supabase)
+    response = client.post("/api/v1/movimentos/", json={"categoria": "brownie", "tipo": "reposicao", "quantidade": 3})
+    assert response.status_code == 409
+    assert supabase.linhas("MovimentoEstoque") == []
+    assert _estoque_atual(client) == 50
+
+
+def test_compactacao_no_modo_upsert_nao_mexe_no_estoque(client, supabase, monkeypatch):
+    _estoque(supabase)
+    supabase.inserir("MovimentoEstoque", categoria="brownie", tipo="reposicao", quantidade=3)
+    monkeypatch.setattr(movimentos, "MOVIMENTOS_MARGEM_SEGUNDOS", -60)
+    assert movimentos.compactar("brownie") is not None
+    assert supabase.escritas("Estoque") == []
+    assert _estoque_atual(client) == 50
+
+
+def test_primeiro_movimento_parte_do_estoque_existente(client, supabase, modo_movimentos):
+    _estoque(supabase)
+    corpo = {"categoria": "brownie", "tipo": "venda", "quantidade": -2}
+    response = client.post("/api/v1/movimentos/", json=corpo)
+    assert response.status_code == 201
+    assert response.json()["quantidade"] == 48
+    (semente,) = supabase.linhas("SnapshotEstoque")
+    assert semente["quantidade"] == 50 and semente["ultimo_movimento_id"] == 0
+
+    client.post("/api/v1/movimentos/", json=corpo)
+    assert len(supabase.linhas("SnapshotEstoque")) == 1
+    assert client.get("/api/v1/movimentos/brownie/saldo").json()["quantidade"] == 46
+
+
+def test_leituras_usam_o_saldo_do_livro(client, supabase, modo_movimentos):
+    from app.api.src.routes.estoque_atual import cache_estoque
+
+    _estoque(supabase)
+    client.post("/api/v1/movimentos/", json={"categoria": "brownie", "tipo": "reposicao", "quantidade": 3})
+    # Sem cache, a leitura não pode voltar para a coluna do 'Estoque' (ainda 50)
+    cache_estoque.invalidar_tudo()
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 50
+    assert _estoque_atual(client) == 53
+    assert client.get("/api/v1/estoque/estoque").json() == [{"categoria": "brownie", "quantidade": 53}]
+
+
+def test_venda_baixa_o_estoque_pelo_livro(client, supabase, venda, modo_movimentos):
+    _estoque(supabase)
+    assert client.post("/api/v1/vendas/vender", json=venda).status_code == 201
+    assert supabase.escritas("Estoque") == []
+    assert [m["quantidade"] for m in supabase.linhas("MovimentoEstoque")] == [-2]
+    assert _estoque_atual(client) == 48
+
+
+def test_compactacao_atualiza_o_estoque_no_modo_movimentos(client, supabase, modo_movimentos, monkeypatch):
+    _estoque(supabase)
+    client.post("/api/v1/movimentos/", json={"categoria": "brownie", "tipo": "venda", "quantidade": -5})
+    monkeypatch.setattr(movimentos, "MOVIMENTOS_MARGEM_SEGUNDOS", -60)
+    novo = movimentos.compactar("brownie")
+    assert novo["quantidade"] == 45
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 45
+    assert movimentos.saldo("brownie")["movimentos_pendentes"] == 0
+    assert _estoque_atual(client) == 45
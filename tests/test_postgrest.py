@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.api.src.core.postgrest import Consulta, _citar, e, em, eq, gte, ou
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("brownie", "brownie"),
+    (10, "10"),
+    (True, "true"),
+    (None, "null"),
+    ("Padaria, Central", '"Padaria, Central"'),
+    ("a.b", '"a.b"'),
+    ("(x)", '"(x)"'),
+    ("Zé Doce", '"Zé Doce"'),
+    ('diz "oi"', '"diz \\"oi\\""'),
+    ("barra\\final", '"barra\\\\final"'),
+    ("", '""'),
+])
+def test_citar(valor, esperado):
+    assert _citar(valor) == esperado
+
+
+def test_valores_de_in_sao_citados_um_a_um():
+    consulta = Consulta("Cliente", base="http://x").em("name", ["Ana", "Padaria, Central", 'O "Bar"', ""])
+    assert consulta.params() == [("name", 'in.(Ana,"Padaria, Central","O \\"Bar\\"","")')]
+
+
+def test_datas_dentro_de_or_ficam_entre_aspas():
+    momento = datetime(2026, 1, 10, 12, 30, tzinfo=timezone.utc)
+    consulta = Consulta("Venda", base="http://x").ou(eq("cliente", "Zé, Ltda"), gte("data_venda", momento))
+    assert consulta.params() == [
+        ("or", '(cliente.eq."Zé, Ltda",data_venda.gte."2026-01-10T12:30:00+00:00")')
+    ]
+
+
+def test_filtro_simples_nao_usa_aspas():
+    consulta = Consulta("Cliente", base="http://x").eq("name", "Padaria, Central")
+    assert consulta.params() == [("name", "eq.Padaria, Central")]
+
+
+def test_grupos_aninhados_citam_in_e_valores():
+    condicao = ou(eq("status", "ativo"), e(em("name", ["a,b", "c"]), eq("cidade", "São Paulo")))
+    assert condicao.como_param() == ("or", '(status.eq.ativo,and(name.in.("a,b",c),cidade.eq."São Paulo"))')
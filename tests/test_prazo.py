@@ -0,0 +1,79 @@
+import pytest
+
+from app.api.src.core import prazo
+
+
+def _estoque(supabase, quantidade=50):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=quantidade, preco_unitario=5.0)
+
+
+def test_limitar_timeout_usa_o_que_resta_do_prazo():
+    token = prazo.definir(0.5)
+    try:
+        assert prazo.limitar_timeout(15.0) <= 0.5
+        with prazo.sem_prazo():
+            assert prazo.limitar_timeout(15.0) == 15.0
+    finally:
+        prazo._prazo_atual.reset(token)
+
+    token = prazo.definir(-1)
+    try:
+        with pytest.raises(prazo.PrazoEsgotado):
+            prazo.limitar_timeout(15.0)
+    finally:
+        prazo._prazo_atual.reset(token)
+
+
+def test_cabecalho_invalido_responde_400(client):
+    response = client.get("/api/v1/estoque/estoque", headers={"X-Prazo-Ms": "abc"})
+    assert response.status_code == 400
+
+
+def test_prazo_esgotado_antes_das_escritas_nao_grava_nada(client, supabase, venda):
+    _estoque(supabase)
+    # Sem preço no corpo, a rota lê o Supabase antes de escrever; a leitura lenta gasta o prazo
+    supabase.atrasos[("GET", "HistoricoPreco")] = 0.3
+    supabase.atrasos[("GET", "Estoque")] = 0.3
+    response = client.post(
+        "/api/v1/vendas/vender", json={**venda, "valor_unitario": None}, headers={"X-Prazo-Ms": "100"}
+    )
+    assert response.status_code == 504
+    assert "não foram confirmadas" in response.json()["detail"]
+    assert supabase.escritas("Venda") == []
+    assert supabase.escritas("Cobranca") == []
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 50
+
+
+def test_escritas_comecadas_terminam_mesmo_com_o_prazo_esgotado(client, supabase, venda):
+    _estoque(supabase)
+    supabase.atrasos[("POST", "Venda")] = 0.5
+    response = client.post("/api/v1/vendas/vender", json=venda, headers={"X-Prazo-Ms": "300"})
+    assert response.status_code == 201
+    assert len(supabase.linhas("Venda")) == 1
+    assert len(supabase.linhas("Cobranca")) == 1
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 48
+
+
+def test_falha_depois_de_uma_escrita_gravada_responde_502(client, supabase, venda):
+    _estoque(supabase)
+    supabase.falhas["Cobranca"] = 400
+    response = client.post("/api/v1/vendas/vender", json=venda)
+    assert response.status_code == 502
+    detalhe = response.json()["detail"]
+    assert "Venda" in detalhe and "Cobranca" in detalhe
+    assert "não foram confirmadas" not in detalhe
+    assert len(supabase.linhas("Venda")) == 1
+    # A venda ficou sem cobrança: o estoque não é baixado
+    assert supabase.linhas("Estoque")[0]["quantidade"] == 50
+
+
+def test_escritas_fora_da_unidade_de_trabalho_respeitam_o_prazo(supabase):
+    from app.api.src.core import precos
+
+    token = prazo.definir(-1)
+    try:
+        with pytest.raises(prazo.PrazoEsgotado):
+            precos.registrar_preco("brownie", 6.0)
+    finally:
+        prazo._prazo_atual.reset(token)
+    assert supabase.escritas("HistoricoPreco") == []
@@ -0,0 +1,115 @@
+import itertools
+import time
+
+import pytest
+
+from app.api.src.core import cache, replicas
+from app.api.src.routes.estoque_atual import cache_estoque
+from supabase_falso import iniciar
+
+_replica, _url_replica = iniciar()
+
+
+@pytest.fixture
+def replica(monkeypatch, supabase):
+    """Liga o roteamento para uma réplica falsa (vazia no começo de cada teste)."""
+    _replica.limpar()
+    roteador = replicas.roteador
+    lista = [replicas.Replica(_url_replica)]
+    monkeypatch.setattr(roteador, "primario", replicas.SUPABASE_URL.rstrip("/"))
+    monkeypatch.setattr(roteador, "replicas", lista)
+    monkeypatch.setattr(roteador, "_rodizio", itertools.cycle(lista))
+    monkeypatch.setattr(roteador, "_escritas", type(roteador._escritas)())
+    yield _replica
+    _replica.limpar()
+
+
+def _estoque(banco, quantidade):
+    banco.inserir("Estoque", categoria="brownie", quantidade=quantidade, preco_unitario=5.0)
+
+
+def test_get_le_da_replica(client, supabase, replica):
+    _estoque(supabase, 50)
+    _estoque(replica, 7)
+    response = client.get("/api/v1/estoque/estoque", headers={"X-Sessao": "caixa-1"})
+    assert response.json() == [{"categoria": "brownie", "quantidade": 7}]
+    assert [r for r in supabase.requisicoes if r[0] == "GET"] == []
+
+
+def test_sessao_que_escreveu_le_do_primario(client, supabase, replica, venda):
+    _estoque(supabase, 50)
+    _estoque(replica, 7)
+    cabecalhos = {"X-Sessao": "caixa-2"}
+    assert client.post("/api/v1/vendas/vender", json=venda, headers=cabecalhos).status_code == 201
+    cache_estoque.invalidar_tudo()
+    response = client.get("/api/v1/estoque/estoque", headers=cabecalhos)
+    assert response.json() == [{"categoria": "brownie", "quantidade": 48}]
+
+
+def test_replica_com_falha_cai_para_o_primario(client, supabase, replica):
+    _estoque(supabase, 50)
+    replica.fora_do_ar = True
+    response = client.get("/api/v1/estoque/estoque", headers={"X-Sessao": "caixa-3"})
+    assert response.json() == [{"categoria": "brownie", "quantidade": 50}]
+    assert replicas.roteador.replicas[0].saudavel is False
+
+
+def test_leitura_da_replica_expira_rapido_no_cache(client, supabase, replica):
+    _estoque(replica, 7)
+    client.get("/api/v1/estoque/estoque", headers={"X-Sessao": "caixa-4"})
+    expira_em, _ = cache_estoque._entradas["lista"]
+    assert expira_em - time.monotonic() <= cache.CACHE_TTL_REPLICA
+
+
+def test_leitura_anterior_a_uma_invalidacao_nao_entra_no_cache():
+    c = cache.CacheTTL(ttl=300)
+    geracao = c.geracao()
+    # Uma escrita invalidou a chave enquanto a leitura estava em andamento
+    c.invalidar("lista")
+    c.definir("lista", ["antigo"], geracao=geracao)
+    assert c.obter("lista") is cache.AUSENTE
+
+    geracao = c.geracao()
+    c.definir("lista", ["novo"], geracao=geracao)
+    assert c.obter("lista") == ["novo"]
+
+
+def test_post_de_leitura_le_da_replica_e_nao_prende_a_sessao(client, supabase, replica):
+    _estoque(supabase, 50)
+    _estoque(replica, 7)
+    cabecalhos = {"X-Sessao": "caixa-5"}
+    response = client.post("/api/v1/estoque/estoque_atual", json={"categoria": "brownie"}, headers=cabecalhos)
+    assert response.json() == 7
+    assert replicas.roteador.escreveu_recentemente("s:caixa-5") is False
+
+
+def test_leitura_da_replica_respeita_o_prazo(client, supabase, replica):
+    _estoque(supabase, 50)
+    _estoque(replica, 7)
+    replica.atrasos[("GET", "Estoque")] = 1.0
+    inicio = time.monotonic()
+    response = client.get(
+        "/api/v1/estoque/categorias_estoque", headers={"X-Sessao": "caixa-6", "X-Prazo-Ms": "200"}
+    )
+    assert response.status_code in (503, 504)
+    assert time.monotonic() - inicio < 0.8
+
+
+def test_volta_ao_primario_usa_o_que_resta_do_prazo(supabase, replica, monkeypatch):
+    from app.api.src.core import prazo
+
+    replica.fora_do_ar = True
+    timeouts = []
+    get_original = replicas.requests.get
+
+    def get(url, **kwargs):
+        timeouts.append(kwargs["timeout"])
+        return get_original(url, **kwargs)
+
+    monkeypatch.setattr(replicas.requests, "get", get)
+    token = prazo.definir(0.5)
+    try:
+        replicas.roteador.ler(f"{replicas.SUPABASE_URL}/rest/v1/Estoque", timeout=15.0)
+    finally:
+        prazo._prazo_atual.reset(token)
+    assert len(timeouts) == 2 and all(t <= 0.5 for t in timeouts)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from app.api.src.core import resiliencia as modulo
+from app.api.src.core.resiliencia import ABERTO, FECHADO, CircuitoAberto, Resiliencia
+
+URL = "http://supabase.local/rest/v1/Estoque"
+
+
+def _resposta(status_code=200, corpo=b"[]"):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = corpo
+    return response
+
+
+@pytest.fixture
+def res():
+    instancia = Resiliencia(workers=4)
+    yield instancia
+    instancia._executor.shutdown(wait=False)
+
+
+def _falhar(url, **kwargs):
+    raise requests.exceptions.ConnectionError("recusada")
+
+
+def test_disjuntor_abre_depois_das_falhas_seguidas(res, monkeypatch):
+    monkeypatch.setattr(modulo, "DISJUNTOR_FALHAS", 3)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            res.executar(URL, _falhar)
+    assert res.upstream(URL).metricas()["estado"] == ABERTO
+
+    chamadas = []
+    with pytest.raises(CircuitoAberto):
+        res.executar(URL, lambda url, **kwargs: chamadas.append(url) or _resposta())
+    assert chamadas == []
+    assert res.upstream(URL).contadores["recusadas_pelo_disjuntor"] == 1
+
+
+def test_respostas_4xx_nao_abrem_o_circuito(res, monkeypatch):
+    monkeypatch.setattr(modulo, "DISJUNTOR_FALHAS", 2)
+    for _ in range(3):
+        assert res.executar(URL, lambda url, **kwargs: _resposta(409)).status_code == 409
+    assert res.upstream(URL).metricas()["estado"] == FECHADO
+
+
+def test_meio_aberto_deixa_passar_so_a_chamada_de_teste(res, monkeypatch):
+    monkeypatch.setattr(modulo, "DISJUNTOR_FALHAS", 1)
+    monkeypatch.setattr(modulo, "DISJUNTOR_ABERTO", 0.05)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        res.executar(URL, _falhar)
+    time.sleep(0.06)
+
+    upstream = res.upstream(URL)
+    assert upstream.permitir() is True
+    assert upstream.permitir() is False
+    # A chamada de teste falhou: o circuito abre de novo
+    upstream.registrar(0.01, True)
+    assert upstream.metricas()["estado"] == ABERTO
+
+    time.sleep(0.06)
+    assert res.executar(URL, lambda url, **kwargs: _resposta()).status_code == 200
+    assert upstream.metricas()["estado"] == FECHADO
+    assert upstream.contadores["aberturas"] == 2
+
+
+def test_hedge_devolve_a_tentativa_mais_rapida(res, monkeypatch):
+    monkeypatch.setattr(modulo, "HEDGE_ATRASO_INICIAL", 0.05)
+    monkeypatch.setattr(modulo, "HEDGE_ATRASO_MINIMO", 0.05)
+    chamadas = []
+    lock = threading.Lock()
+
+    def get(url, **kwargs):
+        with lock:
+            chamadas.append(url)
+            primeira = len(chamadas) == 1
+        if primeira:
+            time.sleep(0.5)
+            return _resposta(corpo=b'["lenta"]')
+        return _resposta(corpo=b'["rapida"]')
+
+    monkeypatch.setattr(modulo.requests, "get", get)
+    inicio = time.monotonic()
+    response = res.get(URL, timeout=5)
+    assert response.json() == ["rapida"]
+    assert time.monotonic() - inicio < 0.4
+    assert len(chamadas) == 2
+    contadores = res.upstream(URL).contadores
+    assert contadores["hedges"] == 1 and contadores["hedges_vencedores"] == 1
+
+
+def test_sem_orcamento_nao_ha_segunda_tentativa(res, monkeypatch):
+    monkeypatch.setattr(modulo, "HEDGE_ATRASO_INICIAL", 0.05)
+    monkeypatch.setattr(modulo, "HEDGE_ATRASO_MINIMO", 0.05)
+    monkeypatch.setattr(modulo, "HEDGE_ORCAMENTO", 0.0)
+    chamadas = []
+
+    def get(url, **kwargs):
+        chamadas.append(url)
+        time.sleep(0.2)
+        return _resposta()
+
+    monkeypatch.setattr(modulo.requests, "get", get)
+    assert res.get(URL, timeout=5).status_code == 200
+    assert len(chamadas) == 1
+    assert res.upstream(URL).contadores["hedges"] == 0
+
+
+def test_falha_rapida_ganha_uma_nova_tentativa(res, monkeypatch):
+    respostas = iter([_resposta(503), _resposta(corpo=b'["ok"]')])
+    monkeypatch.setattr(modulo.requests, "get", lambda url, **kwargs: next(respostas))
+    assert res.get(URL, timeout=5).json() == ["ok"]
+    upstream = res.upstream(URL)
+    assert upstream.contadores["falhas"] == 1 and upstream.metricas()["falhas_seguidas"] == 0
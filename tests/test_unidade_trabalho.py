@@ -0,0 +1,90 @@
+import pytest
+import requests
+
+from app.api.src.core import prazo, unidade_trabalho
+from app.api.src.core.postgrest import Consulta
+from app.api.src.core.unidade_trabalho import EscritasParciais, UnidadeTrabalho
+
+_HEADERS = {"apikey": "chave-de-teste", "Prefer": "return=representation"}
+
+
+@pytest.fixture
+def unidade(supabase):
+    unidade = UnidadeTrabalho()
+    token = unidade_trabalho._unidade_atual.set(unidade)
+    yield unidade
+    unidade_trabalho._unidade_atual.reset(token)
+
+
+def test_leituras_identicas_sao_feitas_uma_vez(unidade, supabase):
+    supabase.inserir("Estoque", categoria="brownie", quantidade=50)
+    consulta = Consulta("Estoque").eq("categoria", "brownie")
+    for _ in range(3):
+        unidade_trabalho.get(consulta.url, params=consulta.params(), headers=_HEADERS, timeout=5.0)
+    assert len([r for r in supabase.requisicoes if r[0] == "GET"]) == 1
+
+
+def test_escritas_saem_agrupadas_por_tabela_na_confirmacao(unidade, supabase):
+    url = Consulta("Venda").url
+    resposta = unidade_trabalho.post(url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    unidade_trabalho.post(url, json=[{"cliente": "bia"}], headers=_HEADERS)
+    # Adiada: 201 local com o payload ecoado, ainda sem id
+    assert resposta.status_code == 201 and "id" not in resposta.json()[0]
+    assert supabase.escritas("Venda") == []
+
+    unidade.confirmar()
+    assert len(supabase.escritas("Venda")) == 1
+    assert [l["cliente"] for l in supabase.linhas("Venda")] == ["ana", "bia"]
+
+
+def test_upserts_para_a_mesma_chave_sao_fundidos(unidade, supabase):
+    url = Consulta("Estoque").upsert("categoria").url_completa()
+    unidade_trabalho.post(url, json={"categoria": "brownie", "quantidade": 49}, headers=_HEADERS)
+    unidade_trabalho.post(url, json={"categoria": "brownie", "quantidade": 48}, headers=_HEADERS)
+    unidade.confirmar()
+    (_, _, corpo), = supabase.escritas("Estoque")
+    assert corpo == [{"categoria": "brownie", "quantidade": 48}]
+
+
+def test_leitura_depois_de_escrita_confirma_antes(unidade, supabase):
+    unidade_trabalho.post(Consulta("Venda").url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    consulta = Consulta("Venda").eq("cliente", "ana")
+    response = unidade_trabalho.get(consulta.url, params=consulta.params(), headers=_HEADERS, timeout=5.0)
+    assert len(response.json()) == 1
+
+
+def test_post_imediato_devolve_a_linha_gravada(unidade, supabase):
+    response = unidade_trabalho.post(
+        Consulta("MovimentoEstoque").url, json={"categoria": "brownie"}, headers=_HEADERS, imediato=True
+    )
+    assert "id" in response.json()[0] and "created_at" in response.json()[0]
+
+
+def test_efeitos_colaterais_so_depois_da_confirmacao(unidade, supabase):
+    chamados = []
+    unidade_trabalho.post(Consulta("Venda").url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    unidade_trabalho.apos_escrita(lambda: chamados.append(len(supabase.linhas("Venda"))))
+    assert chamados == []
+    unidade.confirmar()
+    assert chamados == [1]
+
+
+def test_prazo_esgotado_antes_da_confirmacao_nao_envia_nada(unidade, supabase):
+    unidade_trabalho.post(Consulta("Venda").url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    token = prazo.definir(-1)
+    try:
+        with pytest.raises(prazo.PrazoEsgotado):
+            unidade.confirmar_escritas()
+    finally:
+        prazo._prazo_atual.reset(token)
+    assert supabase.escritas("Venda") == []
+
+
+def test_falha_depois_de_uma_tabela_gravada_e_parcial(unidade, supabase):
+    supabase.falhas["Cobranca"] = 409
+    unidade_trabalho.post(Consulta("Venda").url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    unidade_trabalho.post(Consulta("Cobranca").url, json=[{"cliente": "ana"}], headers=_HEADERS)
+    with pytest.raises(EscritasParciais) as erro:
+        unidade.confirmar_escritas()
+    assert erro.value.confirmadas == ["Venda"] and erro.value.falhou == "Cobranca"
+    assert isinstance(erro.value, requests.exceptions.RequestException)